@@ -46,9 +46,9 @@ paster db init -c test-core.ini
 cd -
 
 echo "Adding PostGIS..."
-sudo apt-get install postgresql-9.2-postgis-2.3
-sudo -u postgres psql -d ckan_test -f /usr/share/postgresql/9.2/contrib/postgis-2.3/postgis.sql
-sudo -u postgres psql -d ckan_test -f /usr/share/postgresql/9.2/contrib/postgis-2.3/spatial_ref_sys.sql
+sudo apt-get install postgresql-$PGVERSION-postgis-2.3
+sudo -u postgres psql -d ckan_test -f /usr/share/postgresql/$PGVERSION/contrib/postgis-2.3/postgis.sql
+sudo -u postgres psql -d ckan_test -f /usr/share/postgresql/$PGVERSION/contrib/postgis-2.3/spatial_ref_sys.sql
 sudo -u postgres psql -d ckan_test -c 'ALTER VIEW geometry_columns OWNER TO ckan_default;'
 sudo -u postgres psql -d ckan_test -c 'ALTER TABLE spatial_ref_sys OWNER TO ckan_default;'
 
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+from ckan.common import config
+from ckan.lib.cli import CkanCommand
+from ckan.plugins.toolkit import asbool
+
+
+class NextGEOSSCommand(CkanCommand):
+    """
+    Commands for the NextGEOSS harvesters.
+
+    Usage:
+
+      nextgeoss initdb
+        - Create the database tables and indexes used by the harvesters.
+
+      nextgeoss noa_cleanup [--batch-size=N]
+        - Remove the NOA resources and metadata whose links have expired,
+          N datasets at a time (default: 100).
+
+      nextgeoss blob_cleanup [--days=N]
+        - Delete the shared contents that no harvest object references
+          anymore and that were stored more than N days ago (default: 1).
+
+      nextgeoss import_pool {job-id} [--workers=N] [--batch-size=N]
+        - Import the waiting objects of a harvest job with N worker
+          processes.
+
+      nextgeoss import_pool --consumer [--workers=N] [--batch-size=N]
+        - Keep importing the waiting objects of all running harvest jobs
+          with N worker processes (use it instead of the fetch consumer).
+    """
+    summary = __doc__.split('\n')[0]
+    usage = __doc__
+    max_args = 2
+    min_args = 1
+
+    def __init__(self, name):
+        super(NextGEOSSCommand, self).__init__(name)
+
+        self.parser.add_option('-w', '--workers', dest='workers',
+                               type='int', default=4,
+                               help='Number of worker processes')
+        self.parser.add_option('-b', '--batch-size', dest='batch_size',
+                               type='int', default=None,
+                               help='Number of objects/datasets per batch')
+        self.parser.add_option('-d', '--days', dest='days',
+                               type='int', default=1,
+                               help='Minimum age in days of deleted blobs')
+        self.parser.add_option('--consumer', dest='consumer',
+                               action='store_true', default=False,
+                               help='Keep importing objects of running jobs')
+
+    def command(self):
+        self._load_config()
+
+        cmd = self.args[0]
+        if cmd == 'initdb':
+            self.initdb()
+        elif cmd == 'noa_cleanup':
+            self.noa_cleanup()
+        elif cmd == 'blob_cleanup':
+            self.blob_cleanup()
+        elif cmd == 'import_pool':
+            self.import_pool()
+        else:
+            print 'Command {} not recognized'.format(cmd)
+            sys.exit(1)
+
+    def initdb(self):
+        from ckanext.nextgeossharvest.model import setup
+
+        setup()
+        print 'Database tables and indexes created'
+
+    def noa_cleanup(self):
+        from ckanext.nextgeossharvest.lib.noa_expiry import NOAExpirySweeper
+
+        sweeper = NOAExpirySweeper(batch_size=self.options.batch_size or 100)
+        removed = sweeper.run()
+        print 'Removed {} expired NOA resources'.format(removed)
+
+    def blob_cleanup(self):
+        from ckanext.nextgeossharvest.lib.content_blob import delete_unreferenced_blobs  # noqa: E501
+
+        deleted = delete_unreferenced_blobs(min_age_days=self.options.days)
+        print 'Deleted {} unreferenced contents'.format(deleted)
+
+    def import_pool(self):
+        from ckanext.nextgeossharvest.lib.import_pool import ImportPool
+
+        if len(self.args) == 2:
+            job_id = unicode(self.args[1])  # noqa: F821
+        elif self.options.consumer:
+            job_id = None
+        else:
+            print 'Please provide a job ID or use --consumer'
+            sys.exit(1)
+
+        if not asbool(config.get('ckanext.nextgeossharvest.import_pool',
+                                 False)):
+            print 'Warning: ckanext.nextgeossharvest.import_pool is not ' \
+                'enabled, so a fetch consumer may also import the objects'
+
+        pool = ImportPool(workers=self.options.workers,
+                          batch_size=self.options.batch_size or 10)
+        pool.run(job_id, consumer=self.options.consumer)
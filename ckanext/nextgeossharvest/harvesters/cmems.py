@@ -4,18 +4,19 @@ import os
 
 import json
 import logging
+from ftplib import all_errors
+from functools import partial
 from datetime import datetime, timedelta
 from monthdelta import monthdelta
 
-from ftplib import FTP
-
 from ckan.plugins.core import implements
-from ckan.model import Session
 
 
 from ckanext.harvest.interfaces import IHarvester
 from ckanext.harvest.model import HarvestObject
 from ckanext.nextgeossharvest.lib.cmems_base import CMEMSBase
+from ckanext.nextgeossharvest.lib.ftp import crawl, get_pool
+from ckanext.nextgeossharvest.lib.ftp_snapshot import FtpSnapshots
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
 
 from ckanext.harvest.model import HarvestObjectExtra as HOExtra
@@ -53,13 +54,19 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
         try:
             config_obj = json.loads(config)
 
-            if config_obj.get('harvester_type') not in {'sst',
-                                                        'sic_north',
-                                                        'sic_south',
-                                                        'ocn',
-                                                        'slv',
-                                                        'gpaf',
-                                                        'mog'}:
+            if 'harvester_types' in config_obj:
+                harvester_types = config_obj['harvester_types']
+                if not isinstance(harvester_types, list) or \
+                        not harvester_types or \
+                        not set(harvester_types) <= set(FTP_SOURCE_CONF):
+                    raise ValueError('harvester_types must be a list of "sst", "sic_north", "sic_south", "ocn", "slv", "gpaf" or "mog"')  # noqa: E501
+            elif config_obj.get('harvester_type') not in {'sst',
+                                                          'sic_north',
+                                                          'sic_south',
+                                                          'ocn',
+                                                          'slv',
+                                                          'gpaf',
+                                                          'mog'}:
                 raise ValueError('harvester type is required and must be "sst" or "sic_north" or "sic_south" or "ocn" or "slv" or "gpaf" or "mog"')  # noqa: E501
             if 'start_date' in config_obj:
                 try:
@@ -95,6 +102,12 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
                 raise ValueError('username is requred and must be a string')
             if type(config_obj.get('make_private', False)) != bool:
                 raise ValueError('make_private must be true or false')
+            if type(config_obj.get('use_snapshots', False)) != bool:
+                raise ValueError('use_snapshots must be true or false')
+            if 'max_connections' in config_obj:
+                max_connections = config_obj['max_connections']
+                if not isinstance(max_connections, int) or not max_connections > 0:  # noqa: E501
+                    raise ValueError('max_connections must be a positive integer')  # noqa: E501
         except ValueError as e:
             raise e
 
@@ -104,58 +117,106 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
         self.log = logging.getLogger(__file__)
         self.log.debug('CMEMS Harvester gather_stage for job: %r', harvest_job)
         config = self._get_config(harvest_job)
-        last_product_date = (
-            self._get_last_harvesting_date(harvest_job.source_id)
-        )
-        if last_product_date is not None:
-            start_date = last_product_date
-        else:
-            start_date = self._parse_date(config['start_date'])
-        end_date = min(start_date + self.interval,
-                       datetime.now(),
-                       self._parse_date(
-                           config.get('end_date')
-                           if config.get('end_date') is not None
-                           else
-                           self.convert_date_config(
-                               'TODAY').strftime("%Y-%m-%d")))
+        # Sources with a list of types restart each type from its own last
+        # harvested product.
+        multiple_types = 'harvester_types' in config
+        date_ranges = {}
+        for harvester_type in self._get_harvester_types(config):
+            last_product_date = self._get_last_harvesting_date(
+                harvest_job.source_id,
+                harvester_type if multiple_types else None)
+            if last_product_date is not None:
+                start_date = last_product_date
+            else:
+                start_date = self._parse_date(config['start_date'])
+            end_date = min(start_date + self.interval,
+                           datetime.now(),
+                           self._parse_date(
+                               config.get('end_date')
+                               if config.get('end_date') is not None
+                               else
+                               self.convert_date_config(
+                                   'TODAY').strftime("%Y-%m-%d")))
+            date_ranges[harvester_type] = (start_date, end_date)
         ids = (
-            self._gather(harvest_job,
-                         start_date, end_date, harvest_job.source_id, config)
+            self._gather(harvest_job, date_ranges,
+                         harvest_job.source_id, config)
         )
-        return ids
-
-    def _gather(self, job, start_date, end_date, source_id, config):
+        return self._get_ids_to_publish(ids)
+
+    def _get_harvester_types(self, config):
+        """Return the list of the types of products harvested by a source."""
+        if 'harvester_types' in config:
+            return config['harvester_types']
+        return [config['harvester_type']]
+
+    def _gather(self, job, date_ranges, source_id, config):
+        """
+        Create the harvest objects of the new files of each type in
+        `date_ranges`, a dictionary of (start_date, end_date) tuples by
+        harvester type.
+
+        The types hosted on the same server are listed together over the
+        same pooled connections. An error on one server doesn't prevent the
+        others from being harvested.
+        """
         ftp_user = config['username']
         ftp_passwd = config['password']
-        source_type = config['harvester_type']
-        ftp_source = create_ftp_source(source_type)
-        existing_files = (
-            ftp_source._get_ftp_urls(start_date,
-                                     end_date, ftp_user, ftp_passwd)
-        )
-        harvested_files = self._get_ckan_guids(start_date, end_date, source_id)
-        non_harvested_files = existing_files - harvested_files
+        if config.get('use_snapshots', False):
+            snapshots = FtpSnapshots(source_id)
+        else:
+            snapshots = None
+
+        types_by_domain = {}
+        for harvester_type in date_ranges:
+            domain = FTP_SOURCE_CONF[harvester_type]['domain']
+            types_by_domain.setdefault(domain, []).append(harvester_type)
+
         ids = []
-        for ftp_url in non_harvested_files:
-            size = 0
-            start_date = ftp_source.parse_date(ftp_url)
-            assert start_date
-            forecast_date = ftp_source.parse_forecast_date(ftp_url)
-            ids.append(self._gather_object(job,
-                                           ftp_url, size,
-                                           start_date, forecast_date))
+        for domain, harvester_types in sorted(types_by_domain.items()):
+            pool = get_pool(domain, ftp_user, ftp_passwd,
+                            config.get('max_connections', 4))
+            ftp_sources = [(harvester_type, create_ftp_source(harvester_type))
+                           for harvester_type in sorted(harvester_types)]
+            try:
+                existing_files = crawl_sources(pool, ftp_sources, date_ranges,
+                                               snapshots)
+            except all_errors as e:
+                self._save_gather_error('Error listing {}: {}'
+                                        .format(domain, e), job)
+                continue
+
+            for harvester_type, ftp_source in ftp_sources:
+                files = existing_files[harvester_type]
+                harvested_files = self._get_imported_guids(source_id, files)
+                non_harvested_files = set(files) - harvested_files
+                self.log.info('{}: {} new of {} files'.format(
+                    harvester_type, len(non_harvested_files), len(files)))
+                for ftp_url in non_harvested_files:
+                    size = files[ftp_url] or 0
+                    start_date = ftp_source.parse_date(ftp_url)
+                    assert start_date
+                    forecast_date = ftp_source.parse_forecast_date(ftp_url)
+                    ids.append(self._gather_object(job,
+                                                   ftp_url, size,
+                                                   start_date, forecast_date,
+                                                   harvester_type))
+        # Only update the snapshots once the objects exist, so that the files
+        # are listed again if the gather fails.
+        if snapshots:
+            snapshots.save()
         return ids
 
     def fetch_stage(self, harvest_object):
         return True
 
-    def _get_ckan_guids(self, start_date, end_date, source_id):
-        objects = self._get_imported_harvest_objects_by_source(source_id)
-        return set(obj.guid for obj in objects)
-
-    def _get_last_harvesting_date(self, source_id):
+    def _get_last_harvesting_date(self, source_id, harvester_type=None):
         objects = self._get_imported_harvest_objects_by_source(source_id)
+        if harvester_type is not None:
+            objects = objects.join(
+                HOExtra, HOExtra.harvest_object_id == HarvestObject.id
+            ).filter(HOExtra.key == 'harvester_type',
+                     HOExtra.value == harvester_type)
         sorted_objects = objects.order_by(desc(HarvestObject.import_finished))
         last_object = sorted_objects.limit(1).first()
         if last_object is not None:
@@ -164,11 +225,6 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
         else:
             return None
 
-    def _get_imported_harvest_objects_by_source(self, source_id):
-        return Session.query(HarvestObject).filter(
-            HarvestObject.harvest_source_id == source_id,
-            HarvestObject.import_finished is not None)
-
     def _get_config(self, harvest_job):
         return json.loads(harvest_job.source.config)
 
@@ -181,13 +237,15 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
         else:
             return None
 
-    def _gather_object(self, job, url, size, start_date, forecast_date):
+    def _gather_object(self, job, url, size, start_date, forecast_date,
+                       harvester_type):
         filename = parse_filename(url)
         filename_id = (
             filename.replace('-v02.0-fv02.0', '').replace('-fv02.0', '')
         )
-        print('gathering %s', filename)
-        extras = [HOExtra(key='status', value='new')]
+        self.log.debug('Gathering %s', filename)
+        extras = [HOExtra(key='status', value='new'),
+                  HOExtra(key='harvester_type', value=harvester_type)]
         assert start_date
         content = json.dumps({
             'identifier': filename_id,
@@ -195,7 +253,8 @@ class CMEMSHarvester(NextGEOSSHarvester, CMEMSBase):
             'size': size,
             'start_date': start_date,
             'forecast_date': forecast_date,
-            'restart_date': start_date
+            'restart_date': start_date,
+            'harvester_type': harvester_type
         }, default=str
         )
         obj = HarvestObject(job=job,
@@ -210,6 +269,47 @@ def create_ftp_source(source_type):
     return FtpSource(**FTP_SOURCE_CONF[source_type])
 
 
+def crawl_sources(pool, ftp_sources, date_ranges, snapshots=None):
+    """
+    List the directories of several sources on the same server in a single
+    crawl over the connections of `pool`.
+
+    `ftp_sources` is a list of (harvester_type, FtpSource) tuples and
+    `date_ranges` a dictionary of (start_date, end_date) tuples by harvester
+    type. Return a dictionary of the sizes of the files by URL for each
+    harvester type.
+    """
+    directories = {}
+    paths = []
+    accepts = {}
+    for harvester_type, ftp_source in ftp_sources:
+        start_date, end_date = date_ranges[harvester_type]
+        directories[harvester_type] = \
+            ftp_source._get_ftp_directories(start_date, end_date)
+        source_paths = ftp_source._get_ftp_paths(directories[harvester_type])
+        paths.extend(source_paths)
+        for path in source_paths:
+            accepts[path] = partial(ftp_source._accept, start_date=start_date,
+                                    end_date=end_date)
+
+    if snapshots:
+        # Only the files that are harvested are recorded in the snapshots.
+        def list_new(path):
+            return snapshots.list_new(pool, path, accepts[path])
+    else:
+        list_new = None
+    listings = iter(crawl(pool, paths, list_new))
+
+    ftp_urls = {}
+    for harvester_type, ftp_source in ftp_sources:
+        start_date, end_date = date_ranges[harvester_type]
+        source_directories = directories[harvester_type]
+        source_listings = [next(listings) for _ in source_directories]
+        ftp_urls[harvester_type] = ftp_source._filter_listings(
+            source_directories, source_listings, start_date, end_date)
+    return ftp_urls
+
+
 class FtpSource(object):
 
     def __init__(self, domain, path, fname_pattern, date_dir=True):
@@ -218,19 +318,50 @@ class FtpSource(object):
         self.path = path
         self.date_dir = date_dir
 
-    def _get_ftp_urls(self, start_date, end_date, user, passwd):
-        ftp_urls = set()
-        ftp = FTP(self._get_ftp_domain(), user, passwd)
-        for directory in self._get_ftp_directories(start_date, end_date):
-            ftp.cwd('/{}/{}'.format(self._get_ftp_path(), directory))
-            ftp_urls |= set(self._ftp_url(directory, fname)
-                            for fname in ftp.nlst()
-                            if self.fname_pattern.match(
-                                fname) and self._to_harvest(
-                                    fname, start_date, end_date)
-                            )
+    def _get_ftp_urls(self, start_date, end_date, user, passwd,
+                      snapshots=None, max_connections=4):
+        """
+        Return a dictionary of the sizes of the files by URL. If `snapshots`
+        is given, only the files that are new since the last snapshots are
+        included.
+
+        The directories are listed concurrently over up to
+        `max_connections` connections.
+        """
+        pool = get_pool(self._get_ftp_domain(), user, passwd,
+                        max_connections)
+        directories = self._get_ftp_directories(start_date, end_date)
+        accept = partial(self._accept, start_date=start_date,
+                         end_date=end_date)
+        list_new = partial(snapshots.list_new, pool, accept=accept) \
+            if snapshots else None
+        listings = crawl(pool, self._get_ftp_paths(directories), list_new)
+        return self._filter_listings(directories, listings,
+                                     start_date, end_date)
+
+    def _get_ftp_paths(self, directories):
+        return ['/{}/{}'.format(self._get_ftp_path(), directory)
+                for directory in directories]
+
+    def _filter_listings(self, directories, listings, start_date, end_date):
+        """
+        Return a dictionary of the sizes by URL of the files of the
+        directory listings that match the file name pattern and date range.
+        """
+        ftp_urls = {}
+        for directory, entries in zip(directories, listings):
+            for entry in entries:
+                if self._accept(entry.name, start_date, end_date):
+                    ftp_urls[self._ftp_url(directory, entry.name)] = entry.size  # noqa: E501
         return ftp_urls
 
+    def _accept(self, fname, start_date, end_date):
+        """
+        Return True if a file matches the file name pattern and date range.
+        """
+        return bool(self.fname_pattern.match(fname)) and \
+            self._to_harvest(fname, start_date, end_date)
+
     def _to_harvest(self, fname, start_date, end_date):
         date = self._parse_date(fname)
         return date >= start_date and date <= end_date
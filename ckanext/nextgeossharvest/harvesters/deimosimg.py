@@ -2,8 +2,7 @@
 import json
 import logging
 from datetime import datetime, timedelta
-
-from ftplib import FTP
+from functools import partial
 
 from ckan.plugins.core import implements
 
@@ -13,6 +12,8 @@ from ckan.model import Package
 from ckanext.harvest.interfaces import IHarvester
 from ckanext.harvest.model import HarvestObject
 from ckanext.nextgeossharvest.lib.deimosimg_base import DEIMOSIMGBase
+from ckanext.nextgeossharvest.lib.ftp import crawl, get_pool
+from ckanext.nextgeossharvest.lib.ftp_snapshot import FtpSnapshots
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
 
 from ckanext.harvest.model import HarvestObjectExtra as HOExtra
@@ -66,6 +67,14 @@ class DEIMOSIMGHarvester(NextGEOSSHarvester, DEIMOSIMGBase):
             if type(config_obj.get('make_private', False)) != bool:
                 raise ValueError('make_private must be true or false')
 
+            if type(config_obj.get('use_snapshots', False)) != bool:
+                raise ValueError('use_snapshots must be true or false')
+
+            if 'max_connections' in config_obj:
+                max_connections = config_obj['max_connections']
+                if not isinstance(max_connections, int) or not max_connections > 0:  # noqa: E501
+                    raise ValueError('max_connections must be a positive integer')  # noqa: E501
+
         except ValueError as e:
             raise e
 
@@ -128,7 +137,7 @@ class DEIMOSIMGHarvester(NextGEOSSHarvester, DEIMOSIMGBase):
         config = self._get_config(harvest_job)
 
         ids = self._gather(harvest_job, config)
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def _gather(self, job, config):
 
@@ -142,7 +151,13 @@ class DEIMOSIMGHarvester(NextGEOSSHarvester, DEIMOSIMGBase):
 
         self.provider = 'deimos_imaging'
 
-        existing_files = ftp_source._get_ftp_urls(ftp_user, ftp_passwd)
+        if config.get('use_snapshots', False):
+            snapshots = FtpSnapshots(job.source_id)
+        else:
+            snapshots = None
+        existing_files = ftp_source._get_ftp_urls(ftp_user, ftp_passwd,
+                                                  snapshots,
+                                                  config.get('max_connections', 3))  # noqa: E501
 
         metadata_dict = {}
         ids = []
@@ -204,6 +219,11 @@ class DEIMOSIMGHarvester(NextGEOSSHarvester, DEIMOSIMGBase):
             self.harvester_logger.info(harvester_msg.format(self.provider,
                 timestamp, job.id, new_counter, '0'))  # noqa: E128, E501
 
+        # Only update the snapshots once the objects exist, so that the files
+        # are listed again if the gather fails.
+        if snapshots:
+            snapshots.save()
+
         return ids
 
     def fetch_stage(self, harvest_object):
@@ -223,12 +243,23 @@ class FtpSource(object):
         self.domain = domain
         self.directories = directories
 
-    def _get_ftp_urls(self, user, passwd):
+    def _get_ftp_urls(self, user, passwd, snapshots=None, max_connections=3):
+        """
+        Return the set of file URLs. If `snapshots` is given, only the files
+        that are new since the last snapshots are included.
+
+        The directories are listed concurrently over up to
+        `max_connections` connections.
+        """
         ftp_urls = set()
-        ftp = FTP(self._get_ftp_domain(), user, passwd)
-        for directory in self._get_ftp_directories():
-            ftp.cwd('/{}'.format(directory))
-            ftp_urls |= set(self._ftp_url(directory, fname, user) for fname in ftp.nlst())  # noqa: E501
+        pool = get_pool(self._get_ftp_domain(), user, passwd,
+                        max_connections)
+        directories = self._get_ftp_directories()
+        paths = ['/{}'.format(directory) for directory in directories]
+        list_new = partial(snapshots.list_new, pool) if snapshots else None
+        listings = crawl(pool, paths, list_new)
+        for directory, entries in zip(directories, listings):
+            ftp_urls |= set(self._ftp_url(directory, entry.name, user) for entry in entries)  # noqa: E501
         return ftp_urls
 
     def _ftp_url(self, directory, filename, ftp_user):
@@ -4,6 +4,7 @@ import logging
 import json
 from ckan.plugins.core import implements
 from ckanext.harvest.interfaces import IHarvester
+from ckanext.nextgeossharvest.lib.candidates import missing_candidates
 from ckanext.nextgeossharvest.lib.ebvs_base import EBVSBase
 from ckanext.nextgeossharvest.lib.opensearch_base import OpenSearchHarvester
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
@@ -49,8 +50,11 @@ class EBVSHarvester(EBVSBase, OpenSearchHarvester, NextGEOSSHarvester):
 
         ids = []
 
-        tree_species_prods = self.treeSpecies()
-        flood_hazards_prods = self.floodHazards()
+        # Only create objects for the products that weren't harvested yet.
+        tree_species_prods = missing_candidates(self.treeSpecies(),
+                                                identifier=lambda x: x[6])
+        flood_hazards_prods = missing_candidates(self.floodHazards(),
+                                                 identifier=lambda x: x[6])
 
         for result in tree_species_prods:
             _id = self._create_object('tree_species', result)
@@ -62,7 +66,7 @@ class EBVSHarvester(EBVSBase, OpenSearchHarvester, NextGEOSSHarvester):
             if _id:
                 ids.append(_id)
 
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def fetch_stage(self, harvest_object):
         return True
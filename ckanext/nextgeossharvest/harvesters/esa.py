@@ -175,7 +175,7 @@ class ESAHarvester(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
                                   password)
         # This can be a hook
 
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def fetch_stage(self, harvest_object):
         """Fetch was completed during gather."""
@@ -4,6 +4,7 @@ import logging
 import json
 from ckan.plugins.core import implements
 from ckanext.harvest.interfaces import IHarvester
+from ckanext.nextgeossharvest.lib.candidates import missing_candidates
 from ckanext.nextgeossharvest.lib.glass_lai_base import GLASS_LAI_Base
 from ckanext.nextgeossharvest.lib.opensearch_base import OpenSearchHarvester
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
@@ -57,12 +58,16 @@ class GLASS_LAI_Harvester(GLASS_LAI_Base, OpenSearchHarvester, NextGEOSSHarveste
         elif sensor == 'modis':
             glass_lai_prods = self.glassLAImodis()
 
+        # Only create objects for the products that weren't harvested yet.
+        glass_lai_prods = missing_candidates(glass_lai_prods,
+                                             identifier=lambda x: x[6])
+
         for result in glass_lai_prods:
             _id = self._create_object(sensor, result)
             if _id:
                 ids.append(_id)
 
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def fetch_stage(self, harvest_object):
         return True
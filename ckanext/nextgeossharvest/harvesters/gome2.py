@@ -7,14 +7,11 @@ from datetime import datetime, timedelta
 
 from ckan.plugins.core import implements
 
-from ckanext.harvest.model import HarvestObject
 from ckanext.harvest.interfaces import IHarvester
+from ckanext.nextgeossharvest.lib.candidates import expected_dates
 from ckanext.nextgeossharvest.lib.gome2_base import GOME2Base
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
 
-from ckan.model import Session
-from sqlalchemy import desc
-
 
 class GOME2Harvester(GOME2Base,
                      NextGEOSSHarvester):
@@ -67,6 +64,12 @@ class GOME2Harvester(GOME2Base,
 
             if type(config_obj.get('make_private', False)) != bool:
                 raise ValueError('make_private must be true or false')
+            if type(config_obj.get('catch_up', False)) != bool:
+                raise ValueError('catch_up must be true or false')
+            if 'max_objects_per_job' in config_obj:
+                max_objects = config_obj['max_objects_per_job']
+                if not isinstance(max_objects, int) or not max_objects > 0:
+                    raise ValueError('max_objects_per_job must be a positive integer')  # noqa: E501
         except ValueError as e:
             raise e
 
@@ -98,41 +101,36 @@ class GOME2Harvester(GOME2Base,
         else:
             self.end_date = datetime.now()
 
-        if self.get_last_harvesting_date() is None:
-            self.start_date = self.start_date
-        else:
-            self.start_date = self.get_last_harvesting_date()
+        last_harvesting_date = self.get_last_harvesting_date()
+        if last_harvesting_date is not None:
+            self.start_date = last_harvesting_date
 
         if self.end_date > datetime.now():
             self.end_date = datetime.now()
 
-        if self.end_date > self.start_date + timedelta(days=10):
+        if self.source_config.get('catch_up', False):
+            # Every day has one product per coverage.
+            self.end_date = self._get_catch_up_end_date(
+                self.start_date, self.end_date, len(self.COVERAGES))
+        elif self.end_date > self.start_date + timedelta(days=10):
             self.end_date = self.start_date + timedelta(days=10)
 
-        date = self.start_date
-        date_strings = []
-        while date < self.end_date:
-            date_strings.append(datetime.strftime(date, '%Y-%m-%d'))
-            date += timedelta(days=1)
+        date_strings = [datetime.strftime(date, '%Y-%m-%d') for date
+                        in expected_dates(self.start_date, self.end_date)]
         self.date_strings = date_strings
-        print('DateList: {}'.format(str(date_strings)))
+        log.debug('DateList: {}'.format(date_strings))
 
         ids = self._create_harvest_objects()
 
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def fetch_stage(self, harvest_object):
         return True
 
     def get_last_harvesting_date(self):
-        last_object = Session.query(HarvestObject).filter(
-            HarvestObject.harvest_source_id == self.job.source_id,
-            HarvestObject.import_finished is not None).\
-            order_by(desc(HarvestObject.import_finished)).\
-            limit(1).first()
-        if last_object is not None:
-            restart_date = self._get_object_extra(last_object,
-                                                  'restart_date')
+        restart_date = self._get_restart_day(self.job.source_id,
+                                             'restart_date')
+        if restart_date is not None:
             return datetime.strptime(restart_date, '%Y-%m-%d')
         else:
             return None
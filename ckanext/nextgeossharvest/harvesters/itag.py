@@ -3,10 +3,14 @@
 import logging
 import json
 import os
-import time
+import threading
+import uuid
 from datetime import datetime
+from functools import partial
+from multiprocessing.pool import ThreadPool
 
 from shapely.geometry import Polygon
+from sqlalchemy import text
 import requests
 from requests.exceptions import Timeout
 import jmespath
@@ -14,7 +18,11 @@ import jmespath
 from ckan import model
 from ckan import logic
 from ckan.common import config
-from ckan.logic import ValidationError
+from ckan.logic import NotFound, ValidationError
+from ckan.logic.validators import tag_length_validator, tag_name_validator
+from ckan.lib import search
+from ckan.lib.munge import munge_tag
+from ckan.lib.navl.dictization_functions import Invalid
 from ckan.lib.navl.validators import not_empty
 from ckan.plugins.core import implements
 
@@ -23,8 +31,13 @@ from ckanext.harvest.model import HarvestObjectExtra as HOExtra
 from ckanext.harvest.interfaces import IHarvester
 
 from ckanext.nextgeossharvest.lib.esa_base import SentinelHarvester
+from ckanext.nextgeossharvest.lib.footprint import METHODS
+from ckanext.nextgeossharvest.lib.footprint import simplify_footprint
+from ckanext.nextgeossharvest.lib.itag_cache import ITagCache, cache_key
+from ckanext.nextgeossharvest.lib.itag_local import get_tagger
 from ckanext.nextgeossharvest.lib.opensearch_base import OpenSearchHarvester
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
+from ckanext.nextgeossharvest.lib.throttle import RateLimiter
 
 
 log_dir = log_dir = config.get('ckanext.nextgeossharvest.itag_log_dir')
@@ -41,6 +54,85 @@ if log_dir:
 else:
     itag_logger = None
 
+TAGGERS = 'Political,Geology,Hydrology,LandCover2009'
+
+# The targeted import mode updates the datasets with core SQL statements,
+# so that a batch of datasets is updated with a single commit and reindexed
+# once (see ITagEnricher._import_targeted()). psycopg2 adapts tuples to
+# lists of values for the IN clauses.
+PACKAGES = text('''
+    SELECT id FROM package WHERE id IN :package_ids
+''')
+
+PACKAGE_TAGS = text('''
+    SELECT package_tag.package_id, tag.name FROM package_tag
+    JOIN tag ON tag.id = package_tag.tag_id
+    WHERE package_tag.state = 'active' AND tag.vocabulary_id IS NULL
+    AND package_tag.package_id IN :package_ids
+''')
+
+TAGS = text('''
+    SELECT name, id FROM tag
+    WHERE vocabulary_id IS NULL AND name IN :names
+''')
+
+INSERT_TAG = text('''
+    INSERT INTO tag (id, name) VALUES (:id, :name)
+''')
+
+INSERT_PACKAGE_TAG = text('''
+    INSERT INTO package_tag (id, package_id, tag_id, state)
+    VALUES (:id, :package_id, :tag_id, 'active')
+''')
+
+PACKAGE_EXTRAS = text('''
+    SELECT package_id, key, state FROM package_extra
+    WHERE package_id IN :package_ids
+''')
+
+RESTORE_PACKAGE_EXTRA = text('''
+    UPDATE package_extra SET value = :value, state = 'active'
+    WHERE package_id = :package_id AND key = :key
+''')
+
+INSERT_PACKAGE_EXTRA = text('''
+    INSERT INTO package_extra (id, package_id, key, value, state)
+    VALUES (:id, :package_id, :key, :value, 'active')
+''')
+
+TOUCH_PACKAGES = text('''
+    UPDATE package SET metadata_modified = :now
+    WHERE id IN :package_ids
+''')
+
+# requests.Session isn't guaranteed to be thread-safe, so each fetch thread
+# uses its own session (and connection pool).
+thread_local = threading.local()
+
+
+def get_session():
+    if not hasattr(thread_local, 'session'):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
+
+def get_error_message(e):
+    """Return the message of an exception, or its repr() if it's empty."""
+    return e.message or repr(e)
+
+
+def clean_tag_name(name):
+    """
+    Return a tag name that passes CKAN's tag validators. Names that don't,
+    like "Côte d'Ivoire" or names over 100 characters, are munged.
+    """
+    try:
+        tag_length_validator(name, {})
+        tag_name_validator(name, {})
+    except Invalid:
+        return munge_tag(name)
+    return name
+
 
 class ITagEnricher(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
     """
@@ -62,7 +154,15 @@ class ITagEnricher(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
         try:
             config_obj = json.loads(config)
 
-            if 'base_url' not in config_obj:
+            backend = config_obj.get('backend', 'remote')
+            if backend not in {'remote', 'local'}:
+                raise ValueError('backend must be either remote or local')
+            if backend == 'local':
+                reference_dir = config_obj.get('reference_dir') or \
+                    config.get('ckanext.nextgeossharvest.itag_reference_dir')  # noqa: E501
+                if not reference_dir or not os.path.isdir(reference_dir):
+                    raise ValueError('reference_dir must be an existing directory')  # noqa: E501
+            elif 'base_url' not in config_obj:
                 raise ValueError('base_url is required')
             else:
                 base_url = config_obj['base_url']
@@ -76,6 +176,35 @@ class ITagEnricher(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
                 datasets_per_job = config_obj['datasets_per_job']
                 if not isinstance(datasets_per_job, int) and not datasets_per_job > 0:  # noqa: E501
                     raise ValueError('datasets_per_job must be a positive integer')  # noqa: E501
+            if 'page_size' in config_obj:
+                page_size = config_obj['page_size']
+                if not isinstance(page_size, int) or not page_size > 0:
+                    raise ValueError('page_size must be a positive integer')
+            if 'fetch_workers' in config_obj:
+                fetch_workers = config_obj['fetch_workers']
+                if not isinstance(fetch_workers, int) or not fetch_workers > 0:  # noqa: E501
+                    raise ValueError('fetch_workers must be a positive integer')  # noqa: E501
+            for key in ['cache_ttl_days', 'cache_max_entries', 'cache_precision']:  # noqa: E501
+                if key in config_obj:
+                    if not isinstance(config_obj[key], int) or not config_obj[key] > 0:  # noqa: E501
+                        raise ValueError('{} must be a positive integer'.format(key))  # noqa: E501
+            if config_obj.get('simplify', 'none') not in METHODS + ['none']:  # noqa: E501
+                raise ValueError('simplify must be one of none, {}'.format(', '.join(METHODS)))  # noqa: E501
+            if 'max_vertices' in config_obj:
+                max_vertices = config_obj['max_vertices']
+                if not isinstance(max_vertices, int) or max_vertices < 5:
+                    raise ValueError('max_vertices must be an integer of at least 5')  # noqa: E501
+            if config_obj.get('itag_method', 'GET') not in {'GET', 'POST'}:
+                raise ValueError('itag_method must be either GET or POST')
+            if 'include_sentinel3' in config_obj:
+                if not isinstance(config_obj['include_sentinel3'], bool):
+                    raise ValueError('include_sentinel3 must be true or false')  # noqa: E501
+            if config_obj.get('import_mode', 'full') not in {'full', 'targeted'}:  # noqa: E501
+                raise ValueError('import_mode must be either full or targeted')  # noqa: E501
+            if 'requests_per_second' in config_obj:
+                requests_per_second = config_obj['requests_per_second']
+                if not isinstance(requests_per_second, (int, float)) or not requests_per_second > 0:  # noqa: E501
+                    raise ValueError('requests_per_second must be a positive number')  # noqa: E501
 
         except ValueError as e:
             raise e
@@ -99,147 +228,331 @@ class ITagEnricher(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
         organization = logic.get_action('organization_show')(context, {'id': org_id})  # noqa: E501
 
         # Exclude Sentinel-3 because it seems like iTag can't handle the curved
-        # footprints.
-        filter_query = '+organization:{} -itag:tagged -FamilyName:Sentinel-3'.format(organization['name'])  # noqa: E501
+        # footprints, unless they're simplified first. The local backend
+        # handles them fine.
+        filter_query = '+organization:{} -itag:tagged'.format(organization['name'])  # noqa: E501
+        if self.source_config.get('backend') != 'local' and \
+                not self.source_config.get('include_sentinel3', False):
+            filter_query += ' -FamilyName:Sentinel-3'
 
         ids = []
+        objects = []
 
         # We'll limit this to 10 datasets per job so that results appear
         # faster
-        start = 0
         rows = self.source_config.get('datasets_per_job', 10)
-        untagged = logic.get_action('package_search')(context,
-                                                      {'fq': filter_query,
-                                                       'rows': rows,
-                                                       'start': start})
-        results = untagged['results']
-        for result in results:
-            spatial = None
-            for i in result['extras']:
-                if i['key'] == 'spatial':
-                    spatial = i['value']
+        for result in self._search_untagged(context, filter_query, rows):
+            spatial = result.get('spatial')
             if spatial:
                 obj = HarvestObject(guid=result['id'], job=self.job,
                                     extras=[HOExtra(key='status', value='change'),  # noqa: E501
-                                            HOExtra(key='spatial', value=spatial),  # noqa: E501
-                                            HOExtra(key='package', value=json.dumps(result))])  # noqa: E501
+                                            HOExtra(key='spatial', value=spatial)])  # noqa: E501
                 obj.save()
+                objects.append(obj)
                 ids.append(obj.id)
 
-        return ids
-
-    def fetch_stage(self, harvest_object):
-        log = logging.getLogger(__name__ + '.fetch')
-        log.debug('Starting iTag fetch for package {}'
-                  .format(harvest_object.id))
-
-        # Limit requests to one per second so the server doesn't fall over.
-        start_request = time.time()
-
+        # Fetch the iTag responses for all the objects at once, so that the
+        # fetch stage only has to check the results.
+        self._fetch_all(objects)
+
+        return self._get_ids_to_publish(ids)
+
+    def _search_untagged(self, context, filter_query, rows):
+        """
+        Yield the IDs and footprints of up to `rows` untagged datasets.
+
+        Only the `id` and `spatial` fields are requested from Solr. The
+        results are sorted by ID and each page starts after the last ID of
+        the previous one, so deep pages are as cheap as the first one.
+        """
+        page_size = self.source_config.get('page_size', 1000)
+        last_id = None
+        while rows > 0:
+            fq = filter_query
+            if last_id:
+                fq += ' +id:{{"{}" TO *]'.format(last_id)
+            page = logic.get_action('package_search')(context,
+                                                      {'fq': fq,
+                                                       'fl': ['id', 'extras_spatial'],  # noqa: E501
+                                                       'sort': 'id asc',
+                                                       'rows': min(rows, page_size),  # noqa: E501
+                                                       'start': 0})
+            results = page['results']
+            if not results:
+                break
+            for result in results:
+                yield result
+            rows -= len(results)
+            last_id = results[-1]['id']
+
+    def _get_rate_limiter(self):
+        """
+        Return the rate limiter shared by all the requests to iTag made by
+        this process.
+        """
+        requests_per_second = self.source_config.get('requests_per_second', 4)  # noqa: E501
+        limiter = getattr(self, 'rate_limiter', None)
+        if limiter is None or limiter.interval != 1.0 / requests_per_second:  # noqa: E501
+            self.rate_limiter = RateLimiter(requests_per_second)
+        return self.rate_limiter
+
+    def _get_footprint_wkt(self, spatial):
+        """
+        Return the WKT of a GeoJSON footprint, simplified first if the
+        `simplify` option is set.
+        """
+        method = self.source_config.get('simplify', 'none')
+        if method != 'none':
+            max_vertices = self.source_config.get('max_vertices', 100)
+            return simplify_footprint(spatial, method, max_vertices).wkt
+        spatial = json.loads(spatial)
+        return Polygon([(x[0], x[1]) for x in spatial['coordinates'][0]]).wkt
+
+    def _get_cache_taggers(self):
+        """
+        Return the taggers part of the cache keys, which also depends on the
+        simplification, as it changes the responses.
+        """
+        method = self.source_config.get('simplify', 'none')
+        if method == 'none':
+            return TAGGERS
+        return '{}|{}:{}'.format(TAGGERS, method,
+                                 self.source_config.get('max_vertices', 100))
+
+    def _make_itag_query(self, spatial):
+        """Return the iTag query URL for a GeoJSON footprint."""
         template = '{}/?taggers={}&_pretty=true&footprint={}'
-        self._set_source_config(harvest_object.job.source.config)
         base_url = self.source_config.get('base_url')
         if base_url[-1] == '/':
             base_url = base_url[:-1]
-        taggers = 'Political,Geology,Hydrology,LandCover2009'
-        spatial = json.loads(self._get_object_extra(harvest_object, 'spatial'))
-        coords = Polygon([(x[0], x[1]) for x in spatial['coordinates'][0]]).wkt
-        query = template.format(base_url, taggers, coords)
-        timeout = self.source_config.get('timeout', 5)
+        return template.format(base_url, TAGGERS,
+                               self._get_footprint_wkt(spatial))
+
+    def _make_itag_form(self, spatial):
+        """
+        Return the iTag URL and form data for a GeoJSON footprint, for
+        footprints that are too long for a query string.
+        """
+        base_url = self.source_config.get('base_url')
+        if base_url[-1] == '/':
+            base_url = base_url[:-1]
+        data = {'taggers': TAGGERS, '_pretty': 'true',
+                'footprint': self._get_footprint_wkt(spatial)}
+        return base_url + '/', data
+
+    def _get_reference_dir(self):
+        """Return the directory of the reference datasets for tagging."""
+        return self.source_config.get('reference_dir') or \
+            config.get('ckanext.nextgeossharvest.itag_reference_dir')
+
+    def _tag_locally(self, tagger, spatial):
+        """
+        Tag a footprint with the local tagger and return a (response, error)
+        tuple like _request_itag().
+        """
+        try:
+            return json.dumps(tagger.tag(spatial)), None
+        except Exception as e:
+            message = get_error_message(e)
+            return None, 'Error tagging: {}'.format(message)
+
+    def _fetch_remote(self, limiter, timeout, spatial):
+        """Query iTag for a footprint."""
+        try:
+            if self.source_config.get('itag_method', 'GET') == 'POST':
+                query, data = self._make_itag_form(spatial)
+            else:
+                query, data = self._make_itag_query(spatial), None
+        except Exception as e:
+            message = get_error_message(e)
+            return None, 'Error preparing footprint: {}'.format(message)
+        return self._request_itag(query, limiter, timeout, data)
+
+    def _request_itag(self, query, limiter, timeout, data=None):
+        """
+        Query iTag and return a (response, error) tuple. The footprint is
+        posted as form data if `data` is given.
+
+        Only the network request happens here, so this is safe to call from
+        the fetch threads.
+        """
+        limiter.wait()
         timestamp = str(datetime.utcnow())
         log_message = '{:<12} | {} | {} | {}s'
         try:
-            r = requests.get(query, timeout=timeout)
-            assert r.status_code == 200
-            response = r.text
-        except AssertionError as e:
-            self._save_object_error('{} error on request: {}'
-                                    .format(r.status_code, r.text),
-                                    harvest_object, 'Fetch')
-            elapsed = 9999
-            if itag_logger:
-                itag_logger.info(log_message.format('itag',
-                                 timestamp, r.status_code, elapsed))
-            # TODO: There should be a way to limit the fetch process itself
-            # to one request per second or similar. ###########################
-            end_request = time.time()
-            request_time = end_request - start_request
-            if request_time < 1.0:
-                time.sleep(1 - request_time)
-            # End TODO ########################################################
-            return False
+            if data is not None:
+                r = get_session().post(query, data=data, timeout=timeout)
+            else:
+                r = get_session().get(query, timeout=timeout)
         except Timeout as e:
-            self._save_object_error('Request timed out: {}'
-                                    .format(e),
-                                    harvest_object, 'Fetch')
-            status_code = 408
             if itag_logger:
-                log.debug('logging repsonse')
                 itag_logger.info(log_message.format('itag',
-                                 timestamp, status_code, timeout))
-            end_request = time.time()
-            request_time = end_request - start_request
-            if request_time < 1.0:
-                time.sleep(1 - request_time)
-            return False
+                                 timestamp, 408, timeout))
+            return None, 'Request timed out: {}'.format(e)
         except Exception as e:
-            message = e.message
-            if not message:
-                message = repr(e)
-            self._save_object_error('Error fetching: {}'
-                                    .format(message),
-                                    harvest_object, 'Fetch')
-            end_request = time.time()
-            request_time = end_request - start_request
-            if request_time < 1.0:
-                time.sleep(1 - request_time)
-            return False
+            message = get_error_message(e)
+            return None, 'Error fetching: {}'.format(message)
+
+        if r.status_code != 200:
+            if itag_logger:
+                itag_logger.info(log_message.format('itag',
+                                 timestamp, r.status_code, 9999))
+            return None, '{} error on request: {}'.format(r.status_code,
+                                                          r.text)
+
         if itag_logger:
-            log.debug('logging repsonse')
             itag_logger.info(log_message.format('itag',
                              timestamp, r.status_code,
                              r.elapsed.total_seconds()))
+        return r.text, None
+
+    def _get_cache(self):
+        """Return the iTag response cache, or None if it's disabled."""
+        if not self.source_config.get('use_cache', False):
+            return None
+        return ITagCache(self.source_config.get('cache_ttl_days', 30),
+                         self.source_config.get('cache_max_entries', 100000))
+
+    def _fetch_all(self, harvest_objects):
+        """
+        Fetch the iTag responses for a list of harvest objects with a pool
+        of threads and store them on the objects.
+
+        If the cache is enabled, it's checked first and only the footprints
+        that aren't cached are queried (once per footprint). The requests
+        are limited to `requests_per_second` across all the threads. Errors
+        are stored in a `fetch_error` extra and reported during the fetch
+        stage.
+        """
+        if not harvest_objects:
+            return
+
+        if self.source_config.get('backend') == 'local':
+            # Tagging locally is cheaper than reading the cache.
+            cache = None
+            tagger = get_tagger(self._get_reference_dir())
+            fetch = partial(self._tag_locally, tagger)
+        else:
+            cache = self._get_cache()
+            fetch = partial(self._fetch_remote, self._get_rate_limiter(),
+                            self.source_config.get('timeout', 5))
+
+        precision = self.source_config.get('cache_precision', 4)
+        taggers = self._get_cache_taggers()
+        footprints = []
+        keys = []
+        key_errors = {}
+        for obj in harvest_objects:
+            footprint = self._get_object_extra(obj, 'spatial')
+            key, error = self._get_cache_key(footprint, taggers, precision)
+            if error:
+                key_errors[obj.id] = error
+            footprints.append(footprint)
+            keys.append(key)
+        responses = cache.get_many(filter(None, keys)) if cache else {}
+        errors = {}
+
+        pending = {}
+        for key, footprint in zip(keys, footprints):
+            if key is not None and key not in responses:
+                pending[key] = footprint
+
+        if pending:
+            workers = self.source_config.get('fetch_workers', 4)
+            pool = ThreadPool(min(workers, len(pending)))
+            try:
+                results = pool.map(fetch, pending.values())
+            finally:
+                pool.close()
+                pool.join()
+
+            fetched = {}
+            for key, (response, error) in zip(pending.keys(), results):
+                if error:
+                    errors[key] = error
+                else:
+                    fetched[key] = response
+            responses.update(fetched)
+            if cache:
+                cache.put_many(fetched)
+                cache.evict()
+
+        # The database session isn't shared between threads, so the objects
+        # are only updated here.
+        for obj, key in zip(harvest_objects, keys):
+            if key is None:
+                obj.extras.append(HOExtra(key='fetch_error',
+                                          value=key_errors[obj.id]))
+            elif key in responses:
+                obj.content = responses[key]
+            else:
+                obj.extras.append(HOExtra(key='fetch_error',
+                                          value=errors[key]))
+            obj.save()
+
+    def _get_cache_key(self, spatial, taggers, precision):
+        """
+        Return a (key, error) tuple like _request_itag(), so that a malformed
+        footprint only fails its own object.
+        """
+        try:
+            return cache_key(spatial, taggers, precision), None
+        except Exception as e:
+            message = get_error_message(e)
+            return None, 'Error preparing footprint: {}'.format(message)
 
-        harvest_object.content = response
-        harvest_object.save()
+    def fetch_stage(self, harvest_object):
+        log = logging.getLogger(__name__ + '.fetch')
+        log.debug('Starting iTag fetch for package {}'
+                  .format(harvest_object.id))
 
-        end_request = time.time()
-        request_time = end_request - start_request
-        if request_time < 1.0:
-            time.sleep(1 - request_time)
+        # Objects that weren't fetched in the gather stage.
+        if not harvest_object.content and \
+                self._get_object_extra(harvest_object, 'fetch_error') is None:
+            self._set_source_config(harvest_object.job.source.config)
+            self._fetch_all([harvest_object])
 
-        return True
+        # The response was fetched with the other objects of the job.
+        if harvest_object.content:
+            return True
+
+        error = self._get_object_extra(harvest_object, 'fetch_error')
+        self._save_object_error(error, harvest_object, 'Fetch')
+        return False
 
     def import_stage(self, harvest_object):
         log = logging.getLogger(__name__ + '.import')
         log.debug('Import stage for package {}'
                   .format(harvest_object.id))
 
-        if harvest_object.content is None:
-            self._save_object_error('Empty content for object {}'
-                                    .format(harvest_object.id),
-                                    harvest_object, 'Import')
+        response = self._parse_response(harvest_object)
+        if response is None:
             return False
+        itag_tags, itag_extras = response
 
-        package = json.loads(self._get_object_extra(harvest_object, 'package'))
-
-        content = json.loads(harvest_object.content)['content']
-        itag_tags = self._get_itag_tags(content)
-        itag_extras = self._get_itag_extras(content)
-
-        # Include an itag: tagged extra, even if there are no new tags or
-        # extras, so that we can differentiate between datasets that we've
-        # tried to tag and datasets that we haven't tried to tag.
-        itag_extras.append({'key': 'itag', 'value': 'tagged'})
-
-        package['tags'] = self._update_tags(package['tags'], itag_tags)
-        package['extras'] = self._update_extras(package['extras'], itag_extras)
+        self._set_source_config(harvest_object.job.source.config)
+        if self.source_config.get('import_mode', 'full') == 'targeted':
+            return self._import_targeted([(harvest_object, itag_tags,
+                                           itag_extras)])[0]
 
+        # Get the current version of the dataset, as harvesters may have
+        # updated it since the gather stage.
         context = {
             'model': model,
             'session': model.Session,
             'user': self._get_user_name(),
         }
+        try:
+            package = logic.get_action('package_show')(context, {'id': harvest_object.guid})  # noqa: E501
+        except NotFound:
+            self._save_object_error('Dataset {} no longer exists'
+                                    .format(harvest_object.guid),
+                                    harvest_object, 'Import')
+            return False
+
+        package['tags'] = self._update_tags(package['tags'], itag_tags)
+        package['extras'] = self._update_extras(package['extras'], itag_extras)
+
         package_schema = logic.schema.default_update_package_schema()
         tag_schema = logic.schema.default_tags_schema()
         tag_schema['name'] = [not_empty, unicode]
@@ -261,6 +574,200 @@ class ITagEnricher(SentinelHarvester, OpenSearchHarvester, NextGEOSSHarvester):
 
         return True
 
+    def import_objects(self, harvest_objects):
+        """
+        Run the import stage for a batch of fetched objects claimed by the
+        import pool (see lib/import_pool.py) and return their results, like
+        import_stage().
+
+        The objects of sources in the targeted import mode are imported
+        together, so their datasets are updated with a single commit and
+        reindexed with a single search index commit.
+        """
+        results = {}
+        targeted = []
+        for harvest_object in harvest_objects:
+            self._set_source_config(harvest_object.job.source.config)
+            if self.source_config.get('import_mode', 'full') != 'targeted':
+                results[harvest_object.id] = self.import_stage(harvest_object)
+                continue
+            response = self._parse_response(harvest_object)
+            if response is None:
+                results[harvest_object.id] = False
+            else:
+                targeted.append((harvest_object,) + response)
+
+        object_ids = [harvest_object.id for harvest_object in harvest_objects]
+        if targeted:
+            results.update(zip([harvest_object.id
+                                for harvest_object, _, _ in targeted],
+                               self._import_targeted(targeted)))
+        return [results[object_id] for object_id in object_ids]
+
+    def _parse_response(self, harvest_object):
+        """
+        Return the iTag tags and extras of a harvest object as a tuple, or
+        None if it has no content.
+        """
+        if harvest_object.content is None:
+            self._save_object_error('Empty content for object {}'
+                                    .format(harvest_object.id),
+                                    harvest_object, 'Import')
+            return None
+
+        content = json.loads(harvest_object.content)['content']
+        itag_tags = self._get_itag_tags(content)
+        itag_extras = self._get_itag_extras(content)
+
+        # Include an itag: tagged extra, even if there are no new tags or
+        # extras, so that we can differentiate between datasets that we've
+        # tried to tag and datasets that we haven't tried to tag.
+        itag_extras.append({'key': 'itag', 'value': 'tagged'})
+
+        return itag_tags, itag_extras
+
+    def _import_targeted(self, responses):
+        """
+        Add the new tags and extras of a list of (harvest object, tags,
+        extras) tuples to their datasets directly in the database, without
+        validating and rewriting the rest of the datasets, and return the
+        results of the objects.
+
+        The changes are written with core SQL statements and a single
+        commit, so they don't create revisions or activity stream entries
+        and they aren't reindexed one by one. The datasets are reindexed
+        together afterwards.
+        """
+        object_ids = [harvest_object.id for harvest_object, _, _ in responses]
+        guids = [harvest_object.guid for harvest_object, _, _ in responses]
+        rows = model.Session.execute(PACKAGES, {'package_ids': tuple(guids)})
+        package_ids = {row[0] for row in rows}
+
+        results = {}
+        updated = []
+        new_tags = {}
+        new_extras = {}
+        for harvest_object, itag_tags, itag_extras in responses:
+            if harvest_object.guid not in package_ids:
+                self._save_object_error('Dataset {} no longer exists'
+                                        .format(harvest_object.guid),
+                                        harvest_object, 'Import')
+                results[harvest_object.id] = False
+                continue
+            updated.append((harvest_object.id, harvest_object.guid))
+            new_tags.setdefault(harvest_object.guid, set()).update(
+                clean_tag_name(tag['name']) for tag in itag_tags)
+            extras = new_extras.setdefault(harvest_object.guid, {})
+            for extra in itag_extras:
+                extras.setdefault(extra['key'], extra['value'])
+
+        if updated:
+            try:
+                self._add_tags(new_tags)
+                self._add_extras(new_extras)
+                model.Session.execute(TOUCH_PACKAGES,
+                                      {'package_ids': tuple(new_tags),
+                                       'now': datetime.utcnow()})
+                model.Session.commit()
+            except Exception as e:
+                model.Session.rollback()
+                for object_id, guid in updated:
+                    self._save_object_error('Error updating {}: {}'
+                                            .format(guid, e),
+                                            HarvestObject.get(object_id),
+                                            'Import')
+                    results[object_id] = False
+                updated = []
+
+        if updated:
+            search.rebuild(package_ids=sorted(new_tags), defer_commit=True)
+            search.commit()
+
+        # Perform the necessary harvester housekeeping
+        for object_id, guid in updated:
+            self._refresh_harvest_objects(HarvestObject.get(object_id), guid)
+            results[object_id] = True
+
+        return [results[object_id] for object_id in object_ids]
+
+    def _add_tags(self, new_tags):
+        """
+        Add the free tags in a dictionary of tag names by dataset ID that
+        the datasets don't have yet.
+        """
+        package_ids = tuple(new_tags)
+        rows = model.Session.execute(PACKAGE_TAGS,
+                                     {'package_ids': package_ids})
+        for package_id, name in rows.fetchall():
+            new_tags[package_id].discard(name)
+
+        all_names = set(name for names in new_tags.values()
+                        for name in names)
+        if not all_names:
+            return
+        tag_ids = self._get_tag_ids(all_names)
+        model.Session.execute(INSERT_PACKAGE_TAG,
+                              [{'id': unicode(uuid.uuid4()),
+                                'package_id': package_id,
+                                'tag_id': tag_ids[name]}
+                               for package_id, names in new_tags.items()
+                               for name in names])
+
+    def _get_tag_ids(self, names):
+        """
+        Return the IDs of free tags by name, creating the missing tags.
+
+        The missing names are locked first, like the dataset names in
+        _lock_dataset_name(), so that workers that import datasets with the
+        same new tags don't create them twice.
+        """
+        rows = model.Session.execute(TAGS, {'names': tuple(names)})
+        tag_ids = dict(rows.fetchall())
+        missing = sorted(names - set(tag_ids))
+        if not missing:
+            return tag_ids
+
+        for name in missing:
+            self._lock_dataset_name(u'tag:' + name)
+        rows = model.Session.execute(TAGS, {'names': tuple(missing)})
+        tag_ids.update(rows.fetchall())
+        tags = [{'id': unicode(uuid.uuid4()), 'name': name}
+                for name in missing if name not in tag_ids]
+        if tags:
+            model.Session.execute(INSERT_TAG, tags)
+            tag_ids.update((tag['name'], tag['id']) for tag in tags)
+        return tag_ids
+
+    def _add_extras(self, new_extras):
+        """
+        Add the extras in a dictionary of extras by dataset ID that the
+        datasets don't have yet. Deleted extras with the same keys are
+        restored with the new values.
+        """
+        rows = model.Session.execute(PACKAGE_EXTRAS,
+                                     {'package_ids': tuple(new_extras)})
+        states = {}
+        for package_id, key, state in rows.fetchall():
+            if states.get((package_id, key)) != 'active':
+                states[(package_id, key)] = state
+
+        restored = []
+        inserted = []
+        for package_id, extras in new_extras.items():
+            for key, value in extras.items():
+                state = states.get((package_id, key))
+                extra = {'package_id': package_id, 'key': key,
+                         'value': value}
+                if state is None:
+                    extra['id'] = unicode(uuid.uuid4())
+                    inserted.append(extra)
+                elif state != 'active':
+                    restored.append(extra)
+        if restored:
+            model.Session.execute(RESTORE_PACKAGE_EXTRA, restored)
+        if inserted:
+            model.Session.execute(INSERT_PACKAGE_EXTRA, inserted)
+
     def _get_itag_tags(self, content):
         """Return a list of all iTag tags (may be an empty list)"""
         continents = jmespath.search('political.continents[*].name', content) or []  # noqa: E501
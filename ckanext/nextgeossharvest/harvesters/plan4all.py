@@ -112,7 +112,7 @@ class Plan4AllHarvester(OLUHarvester, CSWSearchHarvester, NextGEOSSHarvester):
         ids = self._crawl_results(harvest_url, limit, timeout)
         # This can be a hook
 
-        return ids
+        return self._get_ids_to_publish(ids)
 
     def fetch_stage(self, harvest_object):
         """Fetch was completed during gather."""
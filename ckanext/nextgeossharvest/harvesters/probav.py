@@ -1,21 +1,29 @@
 # -*- coding: utf-8 -*-
 import re
+import sys
 from enum import Enum
 import logging
 import json
 import uuid
 from datetime import datetime, timedelta
 import time
+import threading
+from functools import partial
+from itertools import izip
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
 from bs4 import BeautifulSoup
+from lxml import etree
 from os import path
 from urllib import urlencode, unquote
 from urlparse import urlparse, urlunparse, parse_qsl
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import Timeout
 
+from ckan.common import config
 from ckan.model import Session
 from ckan.plugins.core import implements
 
@@ -24,6 +32,9 @@ from ckanext.harvest.interfaces import IHarvester
 
 from ckanext.nextgeossharvest.lib.opensearch_base import OpenSearchHarvester
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
+from ckanext.nextgeossharvest.lib.content_blob import get_blob, store_blob
+from ckanext.nextgeossharvest.lib.metalink_cache import MetalinkCache
+from ckanext.nextgeossharvest.lib.throttle import RateLimiter
 
 from ckan.model import Package
 
@@ -57,6 +68,16 @@ DATE_FORMAT = '%Y-%m-%d'
 
 log = logging.getLogger(__name__)
 
+# requests.Session isn't guaranteed to be thread-safe, so each metalink
+# thread uses its own session (and connection pool).
+thread_local = threading.local()
+
+
+def get_session():
+    if not hasattr(thread_local, 'session'):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
 
 class Units(Enum):
     METERS = 'M'
@@ -206,6 +227,24 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                     raise ValueError('resolution is required and must be a "100" or "333"')  # noqa E501
             if type(config_obj.get('make_private', False)) != bool:
                 raise ValueError('make_private must be true or false')
+            if type(config_obj.get('catch_up', False)) != bool:
+                raise ValueError('catch_up must be true or false')
+            if 'max_objects_per_job' in config_obj:
+                max_objects = config_obj['max_objects_per_job']
+                if not isinstance(max_objects, int) or not max_objects > 0:
+                    raise ValueError('max_objects_per_job must be a positive integer')  # noqa: E501
+            if 'fetch_workers' in config_obj:
+                fetch_workers = config_obj['fetch_workers']
+                if not isinstance(fetch_workers, int) or not fetch_workers > 0:  # noqa: E501
+                    raise ValueError('fetch_workers must be a positive integer')  # noqa: E501
+            if 'collection_workers' in config_obj:
+                collection_workers = config_obj['collection_workers']
+                if not isinstance(collection_workers, int) or not collection_workers > 0:  # noqa: E501
+                    raise ValueError('collection_workers must be a positive integer')  # noqa: E501
+            if 'requests_per_second' in config_obj:
+                requests_per_second = config_obj['requests_per_second']
+                if not isinstance(requests_per_second, (int, float)) or not requests_per_second > 0:  # noqa: E501
+                    raise ValueError('requests_per_second must be a positive number')  # noqa: E501
         except ValueError as e:
             raise e
 
@@ -220,6 +259,30 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
 
         return date_time.replace(hour=0, minute=0, second=0, microsecond=0)
 
+    def _get_metalink_cache(self):
+        """
+        Return the metalink cache, or None if
+        `ckanext.nextgeossharvest.metalink_cache_dir` isn't set.
+        """
+        directory = config.get('ckanext.nextgeossharvest.metalink_cache_dir')
+        if not directory:
+            return None
+        return MetalinkCache(
+            directory,
+            int(config.get('ckanext.nextgeossharvest.metalink_cache_max_age_days', 30)),  # noqa: E501
+            int(config.get('ckanext.nextgeossharvest.metalink_cache_max_size_mb', 500)))  # noqa: E501
+
+    def _get_rate_limiter(self):
+        """
+        Return the rate limiter shared by all the requests to the source
+        made by this process.
+        """
+        requests_per_second = self.source_config.get('requests_per_second', 4)  # noqa: E501
+        limiter = getattr(self, 'rate_limiter', None)
+        if limiter is None or limiter.interval != 1.0 / requests_per_second:  # noqa: E501
+            self.rate_limiter = RateLimiter(requests_per_second)
+        return self.rate_limiter
+
     def _get_dates_from_config(self, config):
 
         start_date_str = config['start_date']
@@ -276,6 +339,12 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
             end_date = start_date + timedelta(days=1)
         else:
             start_date, end_date = self._get_dates_from_config(config)
+        if self.source_config.get('catch_up', False):
+            end_date = self._get_catch_up_end_date(
+                start_date, self._get_backlog_end_date(config),
+                self._estimate_objects_per_day(harvest_job.source_id,
+                                               start_date))
+        log.info('Harvesting from {} to {}'.format(start_date, end_date))
 
         ids = []
 
@@ -291,34 +360,83 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                 l2a_collection = "PROBAV_L2A_333M_V001"
                 l3Collections = L3_COLLECTIONS_DELAYED_333
 
-        for l3_collection in l3Collections:
-            harvest_url = self._generate_harvest_url(l3_collection, start_date,  # noqa: E501
-                                                     end_date)
-            log.info('Harvesting {}'.format(harvest_url))
-            for harvest_object in self._gather_L3(harvest_url, auth=auth):
-                _id = self._gather_entry(harvest_object)
-                if _id:
-                    ids.append(_id)
-
+        collections = [(True, l3_collection)
+                       for l3_collection in l3Collections]
         if collections_type == 'current':
-            harvest_url = self._generate_harvest_url(l1c_collection,
-                                                     start_date, end_date)
-            for harvest_object in self._gather_L2A_L1C(harvest_url):
-                _id = self._gather_entry(harvest_object)
-                if _id:
-                    ids.append(_id)
-
-        harvest_url = self._generate_harvest_url(l2a_collection,
-                                                 start_date, end_date)
-        log.info('Harvesting {}'.format(harvest_url))
-        for harvest_object in self._gather_L2A_L1C(harvest_url):
-            _id = self._gather_entry(harvest_object)
-            if _id:
-                ids.append(_id)
+            collections.append((False, l1c_collection))
+        collections.append((False, l2a_collection))
 
-        return ids
+        crawl = partial(self._crawl_collection, self._get_rate_limiter(),
+                        auth, start_date, end_date)
+        pool = ThreadPool(self.source_config.get('collection_workers', 4))
+        try:
+            # The collections are crawled at the same time, but the harvest
+            # objects and errors are only saved here, in the main thread.
+            for is_l3, entries, errors in pool.imap_unordered(crawl,
+                                                              collections):
+                for error in errors:
+                    self._save_gather_error(error, self.job)
+                if is_l3:
+                    harvest_objects = self._create_L3_harvest_objects(entries)  # noqa: E501
+                else:
+                    harvest_objects = entries
+                for harvest_object in harvest_objects:
+                    _id = self._gather_entry(harvest_object)
+                    if _id:
+                        ids.append(_id)
+        finally:
+            pool.close()
+            pool.join()
+
+        metalink_cache = self._get_metalink_cache()
+        if metalink_cache:
+            metalink_cache.evict()
+
+        return self._get_ids_to_publish(ids)
+
+    def _get_backlog_end_date(self, config):
+        """Return the end_date of the config, or today if it has none."""
+        end_date = config.get('end_date', 'TODAY')
+        if end_date == 'TODAY':
+            return self.convert_date_config(end_date)
+        return datetime.strptime(end_date, '%Y-%m-%d')
+
+    def _estimate_objects_per_day(self, source_id, start_date, days=7):
+        """
+        Return the largest number of objects of a day among the last `days`
+        days that the source imported before start_date, or None.
+
+        Only the restart_day extras of those days are counted, which uses
+        the idx_harvest_object_extra_restart_day index.
+        """
+        first_day = (start_date - timedelta(days=days)).strftime(DATE_FORMAT)
+        counts = Session.query(func.count(HOExtra.id)) \
+            .join(HarvestObject,
+                  HarvestObject.id == HOExtra.harvest_object_id) \
+            .filter(HOExtra.key == 'restart_day',
+                    HOExtra.value >= first_day,
+                    HOExtra.value <= start_date.strftime(DATE_FORMAT),
+                    HarvestObject.harvest_source_id == source_id,
+                    HarvestObject.import_finished != None) \
+            .group_by(HOExtra.value).all()  # noqa: E711
+        return max(count for count, in counts) if counts else None
 
     def _get_last_harvesting_date(self, source_id):
+        """
+        Return the day from which a source resumes harvesting, or None.
+
+        The day of each object is stored in a `restart_day` extra when it's
+        gathered, so it's read with a single query that uses the
+        idx_harvest_object_extra_restart_day index. Sources whose objects
+        were gathered before the extra existed fall back to parsing the
+        content of the last imported object.
+        """
+        restart_day = self._get_restart_day(source_id, 'restart_day')
+        if restart_day is not None:
+            return datetime.strptime(restart_day, '%Y-%m-%d')
+        return self._get_legacy_last_harvesting_date(source_id)
+
+    def _get_legacy_last_harvesting_date(self, source_id):
         objects = self._get_imported_harvest_objects_by_source(source_id)
         sorted_objects = objects.order_by(desc(HarvestObject.import_finished))
         last_object = sorted_objects.limit(1).first()
@@ -329,11 +447,6 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
         else:
             return None
 
-    def _get_imported_harvest_objects_by_source(self, source_id):
-        return Session.query(HarvestObject).filter(
-            HarvestObject.harvest_source_id == source_id,
-            HarvestObject.import_finished is not None)
-
     def _generate_harvest_url(self, collection, start_date, end_date):
         date_format = '%Y-%m-%d'
         return URL_TEMPLATE.format(collection,
@@ -346,8 +459,7 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
 
     def _parse_content(self, content_str):
         content_json = json.loads(content_str)
-        opensearch_contnet = content_json['content']
-        content = BeautifulSoup(opensearch_contnet, 'lxml-xml')
+        content = self._get_opensearch_entry(content_json)
         identifier = self._parse_identifier_element(content)
         collection = self._parse_collection_from_identifier(identifier)
 
@@ -374,6 +486,38 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
             self._parse_S_content(parsed_content, content, file_name, file_url)  # noqa: E501
         return parsed_content
 
+    # The number of parsed L3 entries kept by _get_opensearch_entry().
+    PARSED_ENTRIES_SIZE = 16
+
+    def _get_opensearch_entry(self, content_json):
+        """
+        Return the parsed OpenSearch entry of a harvest object's content.
+
+        The tiles of an L3 entry reference the entry's content, which is
+        stored once as a blob, instead of including it. The tiles are
+        gathered (and usually imported) one after the other, so the last
+        entries that were parsed are kept and each one is only parsed once.
+        """
+        content_ref = content_json.get('content_ref')
+        if content_ref is None:
+            return BeautifulSoup(content_json['content'], 'lxml-xml')
+
+        parsed_entries = getattr(self, 'parsed_entries', None)
+        if parsed_entries is None:
+            parsed_entries = self.parsed_entries = OrderedDict()
+        if content_ref in parsed_entries:
+            parsed_entries[content_ref] = parsed_entries.pop(content_ref)
+            return parsed_entries[content_ref]
+
+        content = get_blob(content_ref)
+        if content is None:
+            raise ValueError('Content {} not found'.format(content_ref))
+        entry = BeautifulSoup(content, 'lxml-xml')
+        parsed_entries[content_ref] = entry
+        if len(parsed_entries) > self.PARSED_ENTRIES_SIZE:
+            parsed_entries.popitem(last=False)
+        return entry
+
     def _parse_L2A_L1C_content(self, parsed_content, identifier, content):
         parsed_content['identifier'] = self._parse_identifier(identifier)
         parsed_content['name'] = self._parse_name(identifier)
@@ -411,9 +555,6 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
 
         return unquote(urlunparse(tuple(url_parts_list)))
 
-    def _parse_file_name(self, file_entry):
-        return str(file_entry['name'])
-
     def _parse_S_identifier(self, name):
         return path.splitext(name)[0]
 
@@ -434,9 +575,6 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
         lat_min = lat_max - 10
         return [lat_min, lng_min, lat_max, lng_max]
 
-    def _parse_file_url(self, file_entry):
-        return str(file_entry.resources.url.string)
-
     def _create_ckan_tags(self, tags):
         return [{'name': tag} for tag in tags]
 
@@ -547,56 +685,186 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
         response.raise_for_status()
         return response
 
-    def _get_xml_from_url(self, url, auth=None, **kwargs):
-        response = self._get_url(url, auth=auth, **kwargs)
-        return BeautifulSoup(response.text, 'lxml-xml')
+    def _crawl_collection(self, limiter, auth, start_date, end_date,
+                          collection):
+        """
+        Search an (is L3, collection name) tuple and return an
+        (is L3, entries, errors) tuple.
+
+        Runs in the collection threads, so the database isn't touched: the
+        entries are the harvest objects of L2A and L1C collections, or the
+        crawled entries of L3 collections, and errors are returned instead
+        of being saved.
+        """
+        is_l3, collection_name = collection
+        harvest_url = self._generate_harvest_url(collection_name, start_date,
+                                                 end_date)
+        log.info('Harvesting {}'.format(harvest_url))
+        # A catch-up window must be searched completely, or the restart
+        # day would skip the entries of the pages that weren't read.
+        limit = sys.maxint if self.source_config.get('catch_up') else 100
+        errors = []
+        if is_l3:
+            entries = list(self._crawl_L3(harvest_url, limiter, auth=auth,
+                                          limit=limit, errors=errors))
+        else:
+            entries = list(self._gather_L2A_L1C(harvest_url, limiter=limiter,
+                                                limit=limit, errors=errors))
+        return is_l3, entries, errors
 
-    def _gather_L2A_L1C(self, open_search_url, auth=None):
+    def _gather_L2A_L1C(self, open_search_url, auth=None, limiter=None,
+                        limit=100, errors=None):
         for open_search_page in self._open_search_pages_from(
-                open_search_url, auth=auth):
+                open_search_url, limit=limit, auth=auth, limiter=limiter,
+                errors=errors):
             for open_search_entry in self._parse_open_search_entries(
                     open_search_page):
                 guid = self._parse_identifier_element(open_search_entry)
                 restart_date = self._parse_restart_date(open_search_entry)
+                restart_day = self._parse_restart_day(open_search_entry)
                 content = open_search_entry.encode()
-                yield self._create_harvest_object(guid, restart_date, content)  # noqa: E501
+                yield self._create_harvest_object(guid, restart_date,
+                                                  restart_day, content)
 
-    def _gather_L3(self, open_search_url, auth=None):
-        for open_search_page in self._open_search_pages_from(
-                open_search_url, auth=auth):
-            for open_search_entry in self._parse_open_search_entries(
-                    open_search_page):
-                metalink_url = self._parse_metalink_url(open_search_entry)
-                metalink_xml = self._get_xml_from_url(metalink_url, auth)
-                for metalink_file_entry in self._get_metalink_file_elements(
-                        metalink_xml):
-                    identifier = self._parse_identifier_element(
-                        open_search_entry)
-                    file_name = self._parse_file_name(metalink_file_entry)
-                    guid = self._generate_L3_guid(identifier, file_name)
-                    restart_date = self._parse_restart_date(open_search_entry)  # noqa: E501
-                    content = open_search_entry.encode()
-                    extras = {
-                        'file_name': file_name,
-                        'file_url': self._parse_file_url(metalink_file_entry)
-                    }
-                    yield self._create_harvest_object(
-                        guid, restart_date, content, extras=extras)
-
-    def _create_harvest_object(self, guid, restart_date, content, extras={}):
+    def _crawl_L3(self, open_search_url, limiter, auth=None, limit=100,
+                  errors=None):
+        """
+        Yield an (identifier, restart date, restart day, content, files)
+        tuple for each entry of an OpenSearch search that has tiles.
+
+        The metalinks of the entries of a page are fetched concurrently by
+        `fetch_workers` threads, limited by `limiter` across all of them,
+        and handed back in the order of the entries. A metalink that can't
+        be fetched is added to `errors` and its entry is skipped. Metalinks
+        of entries that haven't been updated since they were cached aren't
+        fetched again.
+        """
+        fetch = partial(self._fetch_metalink, limiter, auth,
+                        self.source_config.get('timeout', 10),
+                        self._get_metalink_cache())
+        pool = ThreadPool(self.source_config.get('fetch_workers', 4))
+        try:
+            for open_search_page in self._open_search_pages_from(
+                    open_search_url, limit=limit, auth=auth, limiter=limiter,
+                    errors=errors):
+                open_search_entries = self._parse_open_search_entries(
+                    open_search_page)
+                metalinks = [(self._parse_identifier_element(entry),
+                              self._parse_restart_date(entry),
+                              self._parse_metalink_url(entry))
+                             for entry in open_search_entries]
+                # izip hands back each result as soon as it's ready.
+                results = pool.imap(fetch, metalinks)
+                for open_search_entry, metalink, (files, error) in izip(
+                        open_search_entries, metalinks, results):
+                    if error:
+                        self._defer_gather_error(error, errors)
+                        continue
+                    if not files:
+                        continue
+                    identifier, restart_date, _ = metalink
+                    yield (identifier, restart_date,
+                           self._parse_restart_day(open_search_entry),
+                           open_search_entry.encode(), files)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _create_L3_harvest_objects(self, entries):
+        """
+        Yield a harvest object for each tile of each entry crawled by
+        _crawl_L3().
+
+        The content of each entry is stored once and its tiles only
+        reference it.
+        """
+        for identifier, restart_date, restart_day, content, files in entries:
+            content_ref = store_blob(content)
+            for file_entry in files:
+                guid = self._generate_L3_guid(identifier, file_entry['name'])
+                extras = {
+                    'file_name': file_entry['name'],
+                    'file_url': file_entry['url']
+                }
+                yield self._create_harvest_object(
+                    guid, restart_date, restart_day,
+                    content_ref=content_ref, extras=extras)
+
+    def _defer_gather_error(self, message, errors):
+        """
+        Add a gather error to `errors`, or save it if `errors` is None.
+        """
+        if errors is None:
+            self._save_gather_error(message, self.job)
+        else:
+            errors.append(message)
+
+    def _fetch_metalink(self, limiter, auth, timeout, cache, metalink):
+        """
+        Fetch and parse the metalink of an (entry id, updated, metalink URL)
+        tuple and return a (files, error) tuple.
+
+        Runs in the metalink threads, so errors are returned instead of being
+        saved, and the database isn't touched.
+        """
+        entry_id, updated, metalink_url = metalink
+        if cache:
+            files = cache.get(entry_id, updated)
+            if files is not None:
+                return files, None
+
+        limiter.wait()
+        log.info('getting %s', metalink_url)
+        try:
+            response = get_session().get(
+                metalink_url, timeout=timeout,
+                auth=HTTPBasicAuth(*auth) if auth else None)
+            response.raise_for_status()
+            files = self._parse_metalink(response.content)
+        except Timeout as e:
+            return None, 'Metalink request timed out: {}'.format(e)
+        except requests.exceptions.RequestException as e:
+            return None, 'Error fetching metalink {}: {}'.format(
+                metalink_url, e)
+        except etree.XMLSyntaxError as e:
+            return None, 'Error parsing metalink {}: {}'.format(
+                metalink_url, e)
+
+        if cache:
+            try:
+                cache.put(entry_id, updated, files)
+            except (IOError, OSError) as e:
+                log.warning('Cannot cache metalink {}: {}'
+                            .format(metalink_url, e))
+        return files, None
+
+    def _create_harvest_object(self, guid, restart_date, restart_day,
+                               content=None, content_ref=None, extras={}):
+        """
+        Return a harvest object dictionary with either the content of the
+        entry or, if the entry is shared by several objects, the key of its
+        blob.
+        """
+        if content_ref is not None:
+            content_dict = {'content_ref': content_ref, 'extras': extras}
+        else:
+            content_dict = {'content': content, 'extras': extras}
         return {
             'identifier': self._parse_name(guid),
             'guid': guid,
             'restart_date': restart_date,
-            'content': json.dumps({
-                'content': content,
-                'extras': extras
-            }),
+            'restart_day': restart_day,
+            'content': json.dumps(content_dict),
+            'content_ref': content_ref,
         }
 
     def _parse_restart_date(self, open_search_entry):
         return open_search_entry.find('updated').string
 
+    def _parse_restart_day(self, open_search_entry):
+        """Return the last day of an entry's time range (YYYY-MM-DD)."""
+        return self._parse_interval(open_search_entry)[1].split('T')[0]
+
     def _generate_L3_guid(self, identifier, file_name):
         return '{}:{}'.format(identifier, file_name)
 
@@ -607,10 +875,15 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                                 timeout=10,
                                 auth=None,
                                 provider=None,
-                                parser='lxml-xml'):  # noqa: E501
+                                parser='lxml-xml',
+                                limiter=None,
+                                errors=None):  # noqa: E501
         """
         Iterate through the results, create harvest objects,
         and return the ids.
+
+        Requests wait for `limiter`, if given, and errors are added to
+        `errors` instead of being saved, if given.
         """
         retrieved_entries = 0
         while retrieved_entries < limit and harvest_url:
@@ -620,12 +893,14 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
             # Make a request to the website
             timestamp = str(datetime.utcnow())
             log_message = '{:<12} | {} | {} | {}s'
+            if limiter:
+                limiter.wait()
             try:
                 kwargs = {'verify': False, 'timeout': timeout}
                 r = self._get_url(harvest_url, auth=auth, **kwargs)
             except Timeout as e:
-                self._save_gather_error('Request timed out: {}'.format(e),
-                                        self.job)  # noqa: E501
+                self._defer_gather_error('Request timed out: {}'.format(e),
+                                         errors)
                 status_code = 408
                 elapsed = 9999
                 if hasattr(self, 'provider_logger'):
@@ -634,8 +909,8 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                                            status_code, timeout))  # noqa: E128, E501
                 raise StopIteration
             if r.status_code != 200:
-                self._save_gather_error('{} error: {}'.format(
-                    r.status_code, r.text), self.job)  # noqa: E501
+                self._defer_gather_error('{} error: {}'.format(
+                    r.status_code, r.text), errors)
                 elapsed = 9999
                 if hasattr(self, 'provider_logger'):
                     self.provider_logger.info(
@@ -672,9 +947,26 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
 
     HDF5_FILENAME_REGEX = re.compile(r'.*\.HDF5$')
 
-    def _get_metalink_file_elements(self, metalinks):
-        return metalinks.files.find_all(
-            name='file', attrs={'name': self.HDF5_FILENAME_REGEX})
+    def _parse_metalink(self, metalink_xml):
+        """
+        Return a dictionary with the name, URL and size of each HDF5 file of
+        a metalink.
+        """
+        root = etree.fromstring(metalink_xml)
+        files = []
+        for file_element in root.xpath('//*[local-name()="file"]'):
+            name = file_element.get('name')
+            if not name or not self.HDF5_FILENAME_REGEX.match(name):
+                continue
+            url = file_element.xpath('string(*[local-name()="resources"]'
+                                     '/*[local-name()="url"])')
+            size = file_element.xpath('string(*[local-name()="size"])')
+            files.append({
+                'name': str(name),
+                'url': str(url.strip()),
+                'size': int(size) if size.strip().isdigit() else None
+            })
+        return files
 
     def _parse_metalink_url(self, openseach_entry):
         return openseach_entry.find(
@@ -687,12 +979,27 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
             content_dict['file_entry'] = metalink_file_entry
         return json.dumps(content_dict)
 
+    def _make_extras(self, entry, status):
+        """
+        Return the extras of an entry's harvest object.
+
+        The key of the blob that the object references, if any, is stored
+        in a `content_ref` extra, so delete_unreferenced_blobs() doesn't
+        need to parse the contents.
+        """
+        extras = [HOExtra(key='status', value=status),
+                  HOExtra(key='restart_date', value=entry['restart_date']),
+                  HOExtra(key='restart_day', value=entry['restart_day'])]
+        if entry.get('content_ref') is not None:
+            extras.append(HOExtra(key='content_ref',
+                                  value=entry['content_ref']))
+        return extras
+
     def _gather_entry(self, entry, auth=None, update_all=False):
         # Create a harvest object for each entry
         entry_guid = entry['guid']
         log.debug('gathering %s', entry_guid)
         entry_name = entry['identifier'].replace('v101_', '').replace('.hdf5', '')  # noqa: E501
-        entry_restart_date = entry['restart_date']
 
         package_query = Session.query(Package)
         query_filtered = package_query.filter(Package.name == entry_name)
@@ -716,10 +1023,7 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                 obj = HarvestObject(
                     guid=entry_guid,
                     job=self.job,
-                    extras=[
-                        HOExtra(key='status', value=status),
-                        HOExtra(key='restart_date', value=entry_restart_date)
-                    ])
+                    extras=self._make_extras(entry, status))
                 obj.content = entry['content']
                 obj.package = package
                 obj.save()
@@ -732,10 +1036,7 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
                 obj = HarvestObject(
                     guid=entry_guid,
                     job=self.job,
-                    extras=[
-                        HOExtra(key='status', value=status),
-                        HOExtra(key='restart_date', value=entry_restart_date)
-                    ])
+                    extras=self._make_extras(entry, status))
                 obj.content = entry['content']
                 obj.package = package
                 obj.save()
@@ -754,10 +1055,7 @@ class PROBAVHarvester(OpenSearchHarvester, NextGEOSSHarvester):
             obj = HarvestObject(
                 guid=entry_guid,
                 job=self.job,
-                extras=[
-                    HOExtra(key='status', value='new'),
-                    HOExtra(key='restart_date', value=entry_restart_date)
-                ])
+                extras=self._make_extras(entry, 'new'))
             obj.content = entry['content']
             obj.package = None
             obj.save()
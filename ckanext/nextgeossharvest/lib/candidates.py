@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Expected products of sources that publish on a fixed calendar.
+
+Harvesters for sources without a search API generate the identifiers of
+the products they expect for a date range and harvest the ones that don't
+exist yet. expected_dates() generates the dates of a cadence and
+missing_candidates() filters out the products that were already harvested
+with one query per batch instead of one per product.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+
+from ckan.model import Session
+from ckan.model import Package
+
+
+log = logging.getLogger(__name__)
+
+
+def daily(start_date, end_date):
+    """Yield every day from start_date up to but not including end_date."""
+    date = start_date
+    while date < end_date:
+        yield date
+        date += timedelta(days=1)
+
+
+def eight_day(start_date, end_date):
+    """
+    Yield the start dates of 8-day composites from start_date up to but not
+    including end_date.
+
+    The composites start on days 1, 9, 17, ..., 361 of each year, so the
+    last composite of a year is shorter and the cadence restarts on
+    January 1st.
+    """
+    year = start_date.year
+    while datetime(year, 1, 1) < end_date:
+        for day_of_year in range(1, 366, 8):
+            date = datetime(year, 1, 1) + timedelta(days=day_of_year - 1)
+            if start_date <= date < end_date:
+                yield date
+        year += 1
+
+
+CADENCES = {
+    'daily': daily,
+    '8-day': eight_day,
+}
+
+
+def expected_dates(start_date, end_date, cadence='daily'):
+    """
+    Return a generator of the dates on which products are expected between
+    start_date and end_date (excluded).
+    """
+    return CADENCES[cadence](start_date, end_date)
+
+
+def with_forecasts(dates, offsets):
+    """
+    Yield a (date, forecast_date) tuple for each date and forecast offset in
+    days, for sources that publish several forecasts per day.
+    """
+    for date in dates:
+        for offset in offsets:
+            yield date, date + timedelta(days=offset)
+
+
+def existing_names(names):
+    """Return the set of dataset names from a list that already exist."""
+    names = list(names)
+    if not names:
+        return set()
+    query = Session.query(Package.name).filter(Package.name.in_(names))
+    return {name for name, in query}
+
+
+def batches(items, batch_size):
+    """Yield lists of up to `batch_size` items of an iterable, in order."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def missing_candidates(candidates, identifier=lambda x: x, batch_size=1000):
+    """
+    Yield the candidates whose datasets don't exist yet, in order.
+
+    `identifier` returns the identifier of a candidate; the dataset name is
+    the lower-case identifier. The candidates are consumed `batch_size` at a
+    time and each batch is checked with a single query, so lazily generated
+    candidates of a multi-year backfill are never all held in memory.
+    """
+    for batch in batches(candidates, batch_size):
+        for missing in _missing_in_batch(batch, identifier):
+            yield missing
+
+
+def _missing_in_batch(batch, identifier):
+    names = [identifier(candidate).lower() for candidate in batch]
+    existing = existing_names(names)
+    log.debug('{} of {} expected products were already harvested'
+              .format(len(existing), len(batch)))
+    return [candidate for candidate, name in zip(batch, names)
+            if name not in existing]
@@ -2,6 +2,7 @@
 
 import logging
 import json
+import re
 from datetime import timedelta, datetime
 import uuid
 from ftplib import FTP, error_perm as Ftp5xxErrors
@@ -16,19 +17,31 @@ from ckanext.harvest.harvesters.base import HarvesterBase
 from ckanext.harvest.model import HarvestObjectExtra as HOExtra
 from ckanext.harvest.model import HarvestObject
 
+from ckanext.nextgeossharvest.lib.candidates import batches
+from ckanext.nextgeossharvest.lib.candidates import expected_dates
+from ckanext.nextgeossharvest.lib.candidates import missing_candidates
+from ckanext.nextgeossharvest.lib.candidates import with_forecasts
+from ckanext.nextgeossharvest.lib.cmems_descriptors import get_descriptor
+
 
 log = logging.getLogger(__name__)
 
+# The number of expected products that are checked on the FTP server at a
+# time.
+CRAWL_BATCH_SIZE = 1000
+
 
 class CMEMSBase(HarvesterBase):
 
-    def _create_object(self, identifier, ftp_link, size, forecast_date):
+    def _create_object(self, identifier, ftp_link, size, forecast_date,
+                       start_date=None):
 
         extras = [HOExtra(key='status',
                           value='new')]
 
         content = json.dumps({'identifier': identifier, 'ftp_link': ftp_link,
-                              'size': size, 'start_date': self.start_date,
+                              'size': size,
+                              'start_date': start_date or self.start_date,
                               'forecast_date': forecast_date}, default=str)
 
         obj = HarvestObject(job=self.job, guid=unicode(uuid.uuid4()),
@@ -38,50 +51,63 @@ class CMEMSBase(HarvesterBase):
 
         return obj.id
 
-    def _get_products(self):
+    def _get_products(self, dates=None):
         """
-        Check if a product or products exist on an FTP server, create a harvest
-        object and append the id to a list if so.
+        Check if the products of a list of dates (by default, the start
+        date) exist on an FTP server, create a harvest object for each one
+        that does and return the list of their ids.
 
-        The `ocn` source is a special case, with multiple products and
-        additional date parameters.
+        The `ocn` source is a special case, with a product for each of the
+        next 10 days.
         """
-        day, month, year = self._format_date_separed(self.start_date)
-
-        harvest_object_ids = []
+        if dates is None:
+            dates = [self.start_date]
 
         if self.harvester_type == 'ocn':
-            num_products = 10
+            products = with_forecasts(dates, range(10))
         else:
-            num_products = 1
-
-        for i in range(num_products):
-            if self.harvester_type == 'ocn':
-                forecast_date = self.start_date + timedelta(days=i)
-                fday, fmonth, fyear = self._format_date_separed(
-                    forecast_date)
-            else:
-                forecast_date = fday = fmonth = fyear = None
-
-            identifier = self._make_identifier(day, month,
-                                               year, fday, fmonth, fyear)
-
-            if not self._was_harvested(identifier):
-
-                ftp_link = self._make_ftp_link(day, month,
-                                               year, fday, fmonth, fyear)
+            products = ((date, None) for date in dates)
 
-                size = self._crawl_urls_ftp(ftp_link, 'cmems')
+        candidates = (self._make_candidate(date, forecast_date)
+                      for date, forecast_date in products)
+        candidates = missing_candidates(candidates,
+                                        identifier=lambda x: x[0])
 
+        harvest_object_ids = []
+        # Check the products of each batch over a single FTP session and
+        # create their objects before crawling the next batch.
+        for batch in batches(candidates, CRAWL_BATCH_SIZE):
+            sizes = self._crawl_urls_ftp_batch([candidate[1] for candidate
+                                                in batch], 'cmems')
+            for identifier, ftp_link, date, forecast_date in batch:
+                size = sizes.get(ftp_link)
                 if size:
                     harvest_object_id = self._create_object(identifier,
                                                             ftp_link,
                                                             size,
-                                                            forecast_date)
+                                                            forecast_date,
+                                                            date)
                     harvest_object_ids.append(harvest_object_id)
 
         return harvest_object_ids
 
+    def _make_candidate(self, date, forecast_date=None):
+        """
+        Return an (identifier, ftp_link, date, forecast_date) tuple for the
+        product of a date.
+        """
+        day, month, year = self._format_date_separed(date)
+        if forecast_date:
+            fday, fmonth, fyear = self._format_date_separed(forecast_date)
+        else:
+            fday = fmonth = fyear = None
+
+        identifier = self._make_identifier(day, month,
+                                           year, fday, fmonth, fyear)
+        ftp_link = self._make_ftp_link(day, month,
+                                       year, fday, fmonth, fyear)
+        return identifier, ftp_link, date, forecast_date
+
     def _was_harvested(self, identifier):
         """
         Check if a product has already been harvested and return True or False.
@@ -158,27 +184,16 @@ class CMEMSBase(HarvesterBase):
                     day +
                     "-fv02.0.nc")
 
-    def _make_stop_time(self, start_date):
-        stop_date = start_date + timedelta(days=1)
-        return '{}T00:00:00.000Z'.format(stop_date.date())
-
     def _format_date_separed(self, date):
-        day = datetime.strftime(date, '%d')
-        month = datetime.strftime(date, '%m')
-        year = datetime.strftime(date, '%Y')
+        day = '{:02d}'.format(date.day)
+        month = '{:02d}'.format(date.month)
+        year = '{:04d}'.format(date.year)
 
         return day, month, year
 
     def _get_metadata_create_objects(self):
-        time_interval = self.end_date - self.start_date
-
-        ids = []
-        for idx in range(time_interval.days):
-            self.start_date = self.start_date + timedelta(days=idx)
-            new_ids = self._get_products()
-            ids.extend(new_ids)
-
-        return ids
+        dates = expected_dates(self.start_date, self.end_date, 'daily')
+        return self._get_products(dates)
 
     def _get_metadata_create_objects_ftp_dir(self):
         year_month_list = self._create_months_years_list()
@@ -320,381 +335,59 @@ class CMEMSBase(HarvesterBase):
         ftp.cwd(directory)
         return ftp
 
-    def _create_tags(self):
-        """Create a list of tags based on the type of harvester."""
-        tags_list = [{"name": "CMEMS"}]
+    def _get_template_dates(self, content, start_date):
+        """
+        Return the dates used to format the templates of a product's
+        descriptor.
+        """
+        day, month, year = self._format_date_separed(start_date)
+        dates = {'date': '{}-{}-{}'.format(year, month, day),
+                 'next_date': str((start_date + timedelta(days=1)).date()),
+                 'day': day, 'month': month, 'year': year}
 
-        if self.harvester_type == 'sst':
-            tags_list.extend([{"name": "SST"},
-                              {"name": "sea surface temperature"},
-                              {"name": "sea ice area fraction"},
-                              {"name": "SIC"},
-                              {"name": "temperature"},
-                              {"name": "sea"},
-                              {"name": "observation"}])
-        elif self.harvester_type == 'ocn':
-            tags_list.extend([{"name": "arctic"},
-                              {"name": "arctic ocean"},
-                              {"name": "north"},
-                              {"name": "northern"},
-                              {"name": "forecast"},
-                              {"name": "temperature"},
-                              {"name": "salinity"},
-                              {"name": "sea surface height"},
-                              {"name": "SSH"},
-                              {"name": "sea ice fraction"},
-                              {"name": "sea ice thickness"},
-                              {"name": "surface snow thickness"},
-                              {"name": "sea"},
-                              {"name": "ice"},
-                              {"name": "sea ice velocity"}])
-        elif self.harvester_type == 'slv':
-            tags_list.extend([{"name": "sea level"},
-                              {"name": "sea level anomaly"},
-                              {"name": "geostrophic"},
-                              {"name": "velocity"},
-                              {"name": "sea"},
-                              {"name": "currents"},
-                              {"name": "geostrophic velocity"}])
+        forecast_date = content.get('forecast_date')
+        if forecast_date:
+            forecast_date = deserialize_date(forecast_date)
+            dates['forecast_date'] = str(forecast_date.date())
+
+        identifier = content['identifier']
+        if self.harvester_type == 'slv':
+            dates['field_date'] = self._date_from_identifier_slv(identifier)
         elif self.harvester_type == 'gpaf':
-            tags_list.extend([{"name": "sea"},
-                              {"name": "hourly"},
-                              {"name": "currents"},
-                              {"name": "velocity"},
-                              {"name": "eastward velocity"},
-                              {"name": "northward velocity"},
-                              {"name": "sea water temperature"},
-                              {"name": "temperature"},
-                              {"name": "sea surface height"},
-                              {"name": "forecast"}])
+            dates['field_date'], dates['bulletin_date'] = \
+                self._date_from_identifier_gpaf(identifier)
         elif self.harvester_type == 'mog':
-            tags_list.extend([{"name": "sea"},
-                              {"name": "velocity"},
-                              {"name": "hourly"},
-                              {"name": "eastward sea water velocity "},
-                              {"name": "northward sea water velocity"}])
-        else:
-            tags_list.extend([{"name": "sea ice"},
-                              {"name": "ice"},
-                              {"name": "sea"},
-                              {"name": "ease"},
-                              {"name": "polstere"},
-                              {"name": "polar stereographic"},
-                              {"name": "sea ice concentration"},
-                              {"name": "observation"}])
-
-            if self.harvester_type == 'sic_north':
-                tags_list.extend([{"name": "north"},
-                                  {"name": "northern"},
-                                  {"name": "arctic"},
-                                  {"name": "arctic ocean"}])
-
-            elif self.harvester_type == 'sic_south':
-                tags_list.extend([{"name": "south"},
-                                  {"name": "Southern"},
-                                  {"name": "antarctic"},
-                                  {"name": "antarctic ocean"}])
-
-        return tags_list
+            dates['field_date'] = self._date_from_identifier_mog(identifier)
+
+        return dates
 
     # Required by NextGEOSS base harvester
     def _parse_content(self, content):
         """
         Parse the entry content and return a dictionary using our standard
         metadata terms.
-        """
-        self.harvester_type = self.source_config['harvester_type']
 
-        content = json.loads(content)
-        ftp_link = content['ftp_link']
-        start_date = deserialize_date(content['start_date'])
-        day, month, year = self._format_date_separed(start_date)
-        forecast_date = content.get('forecast_date')
-        if forecast_date:
-            forecast_date = deserialize_date(content['forecast_date'])
-            fday, fmonth, fyear = self._format_date_separed(forecast_date)
-
-        start_date_string = str(start_date.date())
-
-        spatial_template = '{{"type":"Polygon", "coordinates":[{}]}}'
-        metadata = {}
-
-        if self.harvester_type == 'sst':
-            metadata['collection_id'] = ('METOFFICE-GLO-SST-L4-NRT-OBS-SST-V2')
-            metadata['title'] = "Global Observed Sea Surface Temperature"
-            metadata['notes'] = ("Daily analysis of sea surface temperature (SST),"  # noqa: E501
-                                 " based on measurements from several satellite and"  # noqa: E501
-                                 " in situ SST datasets, for the global ocean and"  # noqa: E501
-                                 " some lakes.")
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, -90],
-                                                           [-180, -90],
-                                                           [-180, 90]])
-            metadata['downloadLink'] = ftp_link
-            metadata['thumbnail'] = ("http://nrt.cmems-du.eu/thredds/wms"
-                                     "/METOFFICE-GLO-SST-L4-NRT-OBS-SST-V2"
-                                     "?request=GetMap"
-                                     "&version=1.3.0"
-                                     "&layers=analysed_sst"
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,-90,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=boxfill/rainbow"
-                                     "&format=image/png"
-                                     "&time=" +
-                                     start_date_string +
-                                     "T12:00:00.000Z")
+        The metadata that only depends on the harvester type comes from its
+        descriptor (see cmems_descriptors.py); only the dates of the product
+        are filled in here.
 
-        elif self.harvester_type == 'sic_north':
-            metadata['collection_id'] = ('METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS')  # noqa E501
-            metadata['title'] = ("Arctic Ocean Observed Sea Ice"
-                                 " Concentration")
-            metadata['notes'] = ("Daily sea ice concentration at 10km"
-                                 " resolution in polar stereographic and EASE"
-                                 " grid projections covering the Northern"
-                                 " Hemisphere.")
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, 0],
-                                                           [-180, 0],
-                                                           [-180, 90]])
-            metadata['downloadLinkEase'] = ftp_link
-            metadata['downloadLinkPolstere'] = (
-              "ftp://mftp.cmems.met.no/Core/"  # noqa: E121
-              "SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/"
-              "METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS/" +
-              year +
-              "/" +
-              month +
-              "/" +
-              "ice_conc_nh_polstere-100_multi_" +
-              year +
-              month +
-              day +
-              "1200.nc")
-            metadata['thumbnail'] = ("http://thredds.met.no/thredds/wms/"
-                                     "sea_ice/SIW-OSISAF-GLO-SIT_SIE_SIC-OBS/"
-                                     "ice_conc_north_aggregated"
-                                     "?request=GetMap"
-                                     "&layers=ice_conc"
-                                     "&version=1.3.0"
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,0,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=boxfill/rainbow"
-                                     "&format=image/png"
-                                     "&time=" +
-                                     start_date_string +
-                                     "T12:00:00.000Z")
-
-        elif self.harvester_type == 'sic_south':
-            metadata['collection_id'] = ('METNO-GLO-SEAICE_CONC-SOUTH-L4-NRT-OBS')  # noqa E501
-            metadata['title'] = ("Antarctic Ocean Observed"
-                                 " Sea Ice Concentration")
-            metadata['notes'] = ("Daily sea ice concentration at 10km "
-                                 "resolution in polar stereographic and EASE"
-                                 " grid projections covering the Southern"
-                                 " Hemisphere.")
-            metadata['spatial'] = spatial_template.format([[-180, 0],
-                                                           [180, 0],
-                                                           [180, -90],
-                                                           [-180, -90],
-                                                           [-180, 0]])
-            metadata['downloadLinkEase'] = ftp_link
-            metadata['downloadLinkPolstere'] = (
-                "ftp://mftp.cmems.met.no/Core/" +  # noqa: E121
-                "SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/" +
-                "METNO-GLO-SEAICE_CONC-SOUTH-L4-NRT-OBS/" +
-                year +
-                "/" +
-                month +
-                "/" +
-                "ice_conc_sh_polstere-100_multi_" +
-                year +
-                month +
-                day +
-                "1200.nc")
-            metadata['thumbnail'] = ("http://thredds.met.no/thredds/wms/"
-                                     "sea_ice/SIW-OSISAF-GLO-SIT_SIE_SIC-OBS/"
-                                     "ice_conc_south_aggregated"
-                                     "?request=GetMap"
-                                     "&layers=ice_conc"
-                                     "&version=1.3.0"
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,-90,180,0"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=boxfill/rainbow"
-                                     "&format=image/png"
-                                     "&time=" +
-                                     start_date_string +
-                                     "T12:00:00.000Z")
-
-        elif self.harvester_type == 'ocn':
-            metadata['collection_id'] = 'ARCTIC_ANALYSIS_FORECAST_PHYS_002_001_A'  # noqa E501
-            metadata['title'] = "Arctic Ocean Physics Analysis and Forecast"
-            metadata['notes'] = ("Daily Arctic Ocean physics analysis to provide 10"  # noqa E501
-                                 " days of forecast of the 3D physical ocean,"
-                                 " including temperature, salinity, sea ice"
-                                 " concentration, sea ice thickness, sea ice velocity"  # noqa E501
-                                 " and sea ice type.")
-            metadata['BulletinDate'] = start_date_string
-            metadata['ForecastDate'] = datetime.strftime(forecast_date,
-                                                         '%Y-%m-%d')
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, 63],
-                                                           [-180, 63],
-                                                           [-180, 90]])
-            metadata['downloadLink'] = ftp_link
-            metadata['thumbnail'] = ("http://thredds.met.no/thredds/wms/"  # noqa
-                                     "topaz/"
-                                     "dataset-topaz4-arc-1hr-myoceanv2-be"  # noqa
-                                     "?request=GetMap"
-                                     "&version=1.3.0"
-                                     "&layers=temperature"
-                                     "&CRS=CRS:84"
-                                     "&bbox=-180,0,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=boxfill/rainbow"
-                                     "&format=image/png"
-                                     "&time=" +
-                                     start_date_string)
-
-        elif self.harvester_type == 'slv':
-            metadata['collection_id'] = ('SEALEVEL_GLO_PHY_L4_NRT_OBSERVATIONS_008_046')  # noqa E501
-            metadata['title'] = ("Global Ocean Gridded L4 Sea Surface"
-                                 " Heights and Derived Variables NRT")
-            metadata['notes'] = ("Daily products processed by the DUACS multimission altimeter"  # noqa E501
-                                 " data processing system. The geostrophic currents are derived"  # noqa E501
-                                 " from sla (geostrophic velocities anomalies, ugosa and vgosa"  # noqa E501
-                                 " variables) and from adt (absolute geostrophic velicities,"  # noqa E501
-                                 " ugos and vgos variables")
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, -90],
-                                                           [-180, -90],
-                                                           [-180, 90]])
-            metadata['downloadLink'] = ftp_link
-
-            metadata['thumbnail'] = ("http://nrt.cmems-du.eu/thredds/wms/"
-                                     "dataset-duacs-nrt-global-merged-allsat-phy-l4"  # noqa E501
-                                     "?request=GetMap"
-                                     "&service=WMS"
-                                     "&version=1.3.0"
-                                     "&layers=surface_geostrophic_sea_water_velocity"  # noqa E501
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,-90,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=vector/rainbow"
-                                     "&format=image/png"
-                                     "&time=" +
-                                     start_date_string +
-                                     "T00:00:00.000Z")
-            slv_date = self._date_from_identifier_slv(content['identifier'])
-            metadata['StartTime'] = '{}T00:00:00.000Z'.format(slv_date)  # noqa E501
-            metadata['StopTime'] = metadata['StartTime']
+        Objects of sources that harvest several types have their type in
+        their content.
+        """
+        content = json.loads(content)
+        self.harvester_type = content.get('harvester_type') or \
+            self.source_config['harvester_type']
+        descriptor = get_descriptor(self.harvester_type)
 
-        elif self.harvester_type == 'gpaf':
-            metadata['collection_id'] = 'GLOBAL_ANALYSIS_FORECAST_PHY_001_024'  # noqa E501
-            metadata['title'] = "Global Ocean Physics Analysis and Forecast (Hourly)"   # noqa E501
-            metadata['notes'] = (" Daily global ocean analysis and forecast system at 1/12 degree providing 10"  # noqa E501
-                                 " days of 3D global ocean forecasts."
-                                 " These datasets include hourly mean surface fields for sea level height,"   # noqa E501
-                                 " temperature and currents (eastward sea water velocity, northward sea water velocity).")  # noqa E501
-
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, -90],
-                                                           [-180, -90],
-                                                           [-180, 90]])
-            metadata['downloadLink'] = ftp_link
-            gpaf_date_start, gpaf_date_end = self._date_from_identifier_gpaf(content['identifier'])   # noqa E501
-            metadata['thumbnail'] = ("http://nrt.cmems-du.eu/thredds/wms/"
-                                     "global-analysis-forecast-phy-001-024-hourly-t-u-v-ssh"   # noqa E501
-                                     "?request=GetMap"
-                                     "&service=WMS"
-                                     "&version=1.3.0"
-                                     "&layers=thetao"
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,-90,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=boxfill/rainbow"
-                                     "&format=image/gif"
-                                     "&time=" +
-                                     str(gpaf_date_start) +
-                                     "T00:30:00.000Z" +
-                                     "/" +
-                                     str(gpaf_date_start) +
-                                     "T23:30:00.000Z")
-            metadata['StartTime'] = '{}T00:30:00.000Z'.format(gpaf_date_start)  # noqa E501
-            metadata['StopTime'] = '{}T23:30:00.000Z'.format(gpaf_date_start)  # noqa E501
-
-            metadata['BulletinDate'] = str(gpaf_date_end)
-            metadata['FieldDate'] = str(gpaf_date_start)
+        start_date = deserialize_date(content['start_date'])
+        dates = self._get_template_dates(content, start_date)
 
-        elif self.harvester_type == 'mog':
-            metadata['collection_id'] = 'MULTIOBS_GLO_PHY_NRT_015_003'  # noqa E501
-            metadata['title'] = "Global Total Surface and 15m Current (Hourly)"   # noqa E501
-            metadata['notes'] = (" This product is a 6 hourly NRT L4 global total velocity field at 0m and 15m."  # noqa E501
-                                 " It consists of the zonal and meridional velocity at a 6h frequency and at 1/4 degree"  # noqa E501
-                                 " regular grid produced on a daily basis. These total velocity fields are obtained by combining"  # noqa E501
-                                 "CMEMS NRT satellite Geostrophic Surface Currents and modelled Ekman current at the surface and"  # noqa E501
-                                 " 15m depth (using ECMWF NRT wind).")  # noqa E501
-            metadata['spatial'] = spatial_template.format([[-180, 90],
-                                                           [180, 90],
-                                                           [180, -90],
-                                                           [-180, -90],
-                                                           [-180, 90]])
-            metadata['downloadLink'] = ftp_link
-
-            metadata['thumbnail'] = ("http://nrt.cmems-du.eu/thredds/wms/"
-                                     "dataset-uv-nrt-hourly"   # noqa E501
-                                     "?request=GetMap"
-                                     "&service=WMS"
-                                     "&version=1.3.0"
-                                     "&layers=sea_water_velocity"
-                                     "&crs=CRS:84"
-                                     "&bbox=-180,-90,180,90"
-                                     "&WIDTH=800"
-                                     "&HEIGHT=800"
-                                     "&styles=fancyvec/alg"
-                                     "&format=image/gif"
-                                     "&&time=" + start_date_string +
-                                     "T00:00:00.000Z" +
-                                     "/" +
-                                     start_date_string +
-                                     "T18:00:00.000Z")
-            mog_date = self._date_from_identifier_mog(content['identifier'])
-            metadata['StartTime'] = '{}T00:00:00.000Z'.format(mog_date)  # noqa E501
-            metadata['StopTime'] = '{}T18:00:00.000Z'.format(mog_date)  # noqa E501
-
-        # Is there any way to determine the size of the downloads?
-        # Would be good to have (or possibly required) in some cases, like
-        # OpenSearch
-
-        # Add common metadata
+        metadata = descriptor.make_metadata(dates)
+        metadata[descriptor.download_key] = content['ftp_link']
         metadata['identifier'] = content['identifier']
         metadata['name'] = metadata['identifier'].lower()
-        if self.harvester_type not in ('slv', 'gpaf', 'mog'):
-            metadata['StartTime'] = '{}T00:00:00.000Z'.format(start_date_string)  # noqa E501
-            metadata['StopTime'] = self._make_stop_time(start_date)
         metadata['size'] = content['size']
 
-        # For now, the collection name and description are the same as the
-        # title and notes, though one or the other should probably change in
-        # the future.
-        metadata['collection_name'] = metadata['title']
-        metadata['collection_description'] = metadata['notes']
-
-        metadata['tags'] = self._create_tags()
-
         # Add time range metadata that's not tied to product-specific fields
         # like StartTime so that we can filter by a dataset's time range
         # without having to cram other kinds of temporal data into StartTime
@@ -779,6 +472,17 @@ class CMEMSBase(HarvesterBase):
         return date_time.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
+SERIALIZED_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$')  # noqa: E501
+
+
 def deserialize_date(date_string):
-    """Deserialize dates serialized by calling str(date)."""
-    return datetime.strptime(date_string, '%Y-%m-%d %H:%M:%S')
+    """
+    Deserialize dates serialized by calling str(date).
+
+    Equivalent to strptime(date_string, '%Y-%m-%d %H:%M:%S'), which is the
+    slowest part of parsing a product.
+    """
+    match = SERIALIZED_DATE.match(date_string)
+    if not match:
+        raise ValueError('Invalid date: {}'.format(date_string))
+    return datetime(*[int(part) for part in match.groups()])
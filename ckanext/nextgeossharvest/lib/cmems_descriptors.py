@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Static metadata of the CMEMS product types.
+
+Everything about a product that depends only on its type (the collection,
+title, notes, footprint and tags, and the templates of the URLs and times)
+is compiled once into a CMEMSDescriptor, so parsing a product only fills in
+its dates.
+
+The templates are formatted with the dates returned by
+CMEMSBase._get_template_dates(): `date` and `next_date` (the start date of
+the product and the day after, as YYYY-MM-DD), `year`, `month` and `day`,
+and `forecast_date`, `field_date` and `bulletin_date` for the types that
+have them.
+"""
+
+SPATIAL_TEMPLATE = '{{"type":"Polygon", "coordinates":[{}]}}'
+
+GLOBAL = [[-180, 90], [180, 90], [180, -90], [-180, -90], [-180, 90]]
+NORTHERN = [[-180, 90], [180, 90], [180, 0], [-180, 0], [-180, 90]]
+SOUTHERN = [[-180, 0], [180, 0], [180, -90], [-180, -90], [-180, 0]]
+ARCTIC = [[-180, 90], [180, 90], [180, 63], [-180, 63], [-180, 90]]
+
+DAILY_TIMES = {'StartTime': '{date}T00:00:00.000Z',
+               'StopTime': '{next_date}T00:00:00.000Z'}
+
+SEA_ICE_TAGS = ('sea ice', 'ice', 'sea', 'ease', 'polstere',
+                'polar stereographic', 'sea ice concentration', 'observation')
+
+SEA_ICE_FTP = ('ftp://mftp.cmems.met.no/Core/'
+               'SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/')
+
+SEA_ICE_THUMBNAIL = ('http://thredds.met.no/thredds/wms/'
+                     'sea_ice/SIW-OSISAF-GLO-SIT_SIE_SIC-OBS/'
+                     'ice_conc_{hemisphere}_aggregated'
+                     '?request=GetMap'
+                     '&layers=ice_conc'
+                     '&version=1.3.0'
+                     '&crs=CRS:84'
+                     '&bbox={bbox}'
+                     '&WIDTH=800'
+                     '&HEIGHT=800'
+                     '&styles=boxfill/rainbow'
+                     '&format=image/png'
+                     '&time={{date}}T12:00:00.000Z')
+
+
+class CMEMSDescriptor(object):
+    """
+    The static metadata of a CMEMS product type.
+
+    `metadata` holds the fields that are the same for every product and
+    `templates` the fields that are formatted with the dates of a product.
+    Products with two downloads (EASE and polar stereographic grids) have a
+    `polstere` template.
+    """
+
+    def __init__(self, collection_id, title, notes, footprint, tags,
+                 thumbnail, times=None, polstere=None, date_fields=None):
+        self.metadata = {
+            'collection_id': collection_id,
+            'title': title,
+            'notes': notes,
+            'spatial': SPATIAL_TEMPLATE.format(footprint),
+            'collection_name': title,
+            'collection_description': notes,
+        }
+        self.tags = ('CMEMS',) + tuple(tags)
+        self.templates = {'thumbnail': thumbnail}
+        self.templates.update(times or DAILY_TIMES)
+        self.templates.update(date_fields or {})
+        if polstere:
+            self.templates['downloadLinkPolstere'] = polstere
+            self.download_key = 'downloadLinkEase'
+        else:
+            self.download_key = 'downloadLink'
+
+    def make_metadata(self, dates):
+        """
+        Return a new metadata dictionary with the static fields and the
+        templates formatted with a product's dates.
+        """
+        metadata = dict(self.metadata)
+        for key, template in self.templates.items():
+            metadata[key] = template.format(**dates)
+        metadata['tags'] = [{'name': name} for name in self.tags]
+        return metadata
+
+
+DESCRIPTORS = {
+    'sst': CMEMSDescriptor(
+        collection_id='METOFFICE-GLO-SST-L4-NRT-OBS-SST-V2',
+        title='Global Observed Sea Surface Temperature',
+        notes=('Daily analysis of sea surface temperature (SST),'
+               ' based on measurements from several satellite and'
+               ' in situ SST datasets, for the global ocean and'
+               ' some lakes.'),
+        footprint=GLOBAL,
+        tags=('SST', 'sea surface temperature', 'sea ice area fraction',
+              'SIC', 'temperature', 'sea', 'observation'),
+        thumbnail=('http://nrt.cmems-du.eu/thredds/wms'
+                   '/METOFFICE-GLO-SST-L4-NRT-OBS-SST-V2'
+                   '?request=GetMap'
+                   '&version=1.3.0'
+                   '&layers=analysed_sst'
+                   '&crs=CRS:84'
+                   '&bbox=-180,-90,180,90'
+                   '&WIDTH=800'
+                   '&HEIGHT=800'
+                   '&styles=boxfill/rainbow'
+                   '&format=image/png'
+                   '&time={date}T12:00:00.000Z')),
+    'sic_north': CMEMSDescriptor(
+        collection_id='METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS',
+        title='Arctic Ocean Observed Sea Ice Concentration',
+        notes=('Daily sea ice concentration at 10km'
+               ' resolution in polar stereographic and EASE'
+               ' grid projections covering the Northern'
+               ' Hemisphere.'),
+        footprint=NORTHERN,
+        tags=SEA_ICE_TAGS + ('north', 'northern', 'arctic', 'arctic ocean'),
+        thumbnail=SEA_ICE_THUMBNAIL.format(hemisphere='north',
+                                           bbox='-180,0,180,90'),
+        polstere=(SEA_ICE_FTP +
+                  'METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS/{year}/{month}/'
+                  'ice_conc_nh_polstere-100_multi_{year}{month}{day}1200.nc')),  # noqa: E501
+    'sic_south': CMEMSDescriptor(
+        collection_id='METNO-GLO-SEAICE_CONC-SOUTH-L4-NRT-OBS',
+        title='Antarctic Ocean Observed Sea Ice Concentration',
+        notes=('Daily sea ice concentration at 10km '
+               'resolution in polar stereographic and EASE'
+               ' grid projections covering the Southern'
+               ' Hemisphere.'),
+        footprint=SOUTHERN,
+        tags=SEA_ICE_TAGS + ('south', 'Southern', 'antarctic',
+                             'antarctic ocean'),
+        thumbnail=SEA_ICE_THUMBNAIL.format(hemisphere='south',
+                                           bbox='-180,-90,180,0'),
+        polstere=(SEA_ICE_FTP +
+                  'METNO-GLO-SEAICE_CONC-SOUTH-L4-NRT-OBS/{year}/{month}/'
+                  'ice_conc_sh_polstere-100_multi_{year}{month}{day}1200.nc')),  # noqa: E501
+    'ocn': CMEMSDescriptor(
+        collection_id='ARCTIC_ANALYSIS_FORECAST_PHYS_002_001_A',
+        title='Arctic Ocean Physics Analysis and Forecast',
+        notes=('Daily Arctic Ocean physics analysis to provide 10'
+               ' days of forecast of the 3D physical ocean,'
+               ' including temperature, salinity, sea ice'
+               ' concentration, sea ice thickness, sea ice velocity'
+               ' and sea ice type.'),
+        footprint=ARCTIC,
+        tags=('arctic', 'arctic ocean', 'north', 'northern', 'forecast',
+              'temperature', 'salinity', 'sea surface height', 'SSH',
+              'sea ice fraction', 'sea ice thickness',
+              'surface snow thickness', 'sea', 'ice', 'sea ice velocity'),
+        thumbnail=('http://thredds.met.no/thredds/wms/'
+                   'topaz/'
+                   'dataset-topaz4-arc-1hr-myoceanv2-be'
+                   '?request=GetMap'
+                   '&version=1.3.0'
+                   '&layers=temperature'
+                   '&CRS=CRS:84'
+                   '&bbox=-180,0,180,90'
+                   '&WIDTH=800'
+                   '&HEIGHT=800'
+                   '&styles=boxfill/rainbow'
+                   '&format=image/png'
+                   '&time={date}'),
+        date_fields={'BulletinDate': '{date}',
+                     'ForecastDate': '{forecast_date}'}),
+    'slv': CMEMSDescriptor(
+        collection_id='SEALEVEL_GLO_PHY_L4_NRT_OBSERVATIONS_008_046',
+        title=('Global Ocean Gridded L4 Sea Surface'
+               ' Heights and Derived Variables NRT'),
+        notes=('Daily products processed by the DUACS multimission altimeter'  # noqa: E501
+               ' data processing system. The geostrophic currents are derived'  # noqa: E501
+               ' from sla (geostrophic velocities anomalies, ugosa and vgosa'  # noqa: E501
+               ' variables) and from adt (absolute geostrophic velicities,'
+               ' ugos and vgos variables'),
+        footprint=GLOBAL,
+        tags=('sea level', 'sea level anomaly', 'geostrophic', 'velocity',
+              'sea', 'currents', 'geostrophic velocity'),
+        thumbnail=('http://nrt.cmems-du.eu/thredds/wms/'
+                   'dataset-duacs-nrt-global-merged-allsat-phy-l4'
+                   '?request=GetMap'
+                   '&service=WMS'
+                   '&version=1.3.0'
+                   '&layers=surface_geostrophic_sea_water_velocity'
+                   '&crs=CRS:84'
+                   '&bbox=-180,-90,180,90'
+                   '&WIDTH=800'
+                   '&HEIGHT=800'
+                   '&styles=vector/rainbow'
+                   '&format=image/png'
+                   '&time={date}T00:00:00.000Z'),
+        times={'StartTime': '{field_date}T00:00:00.000Z',
+               'StopTime': '{field_date}T00:00:00.000Z'}),
+    'gpaf': CMEMSDescriptor(
+        collection_id='GLOBAL_ANALYSIS_FORECAST_PHY_001_024',
+        title='Global Ocean Physics Analysis and Forecast (Hourly)',
+        notes=(' Daily global ocean analysis and forecast system at 1/12 degree providing 10'  # noqa: E501
+               ' days of 3D global ocean forecasts.'
+               ' These datasets include hourly mean surface fields for sea level height,'  # noqa: E501
+               ' temperature and currents (eastward sea water velocity, northward sea water velocity).'),  # noqa: E501
+        footprint=GLOBAL,
+        tags=('sea', 'hourly', 'currents', 'velocity', 'eastward velocity',
+              'northward velocity', 'sea water temperature', 'temperature',
+              'sea surface height', 'forecast'),
+        thumbnail=('http://nrt.cmems-du.eu/thredds/wms/'
+                   'global-analysis-forecast-phy-001-024-hourly-t-u-v-ssh'
+                   '?request=GetMap'
+                   '&service=WMS'
+                   '&version=1.3.0'
+                   '&layers=thetao'
+                   '&crs=CRS:84'
+                   '&bbox=-180,-90,180,90'
+                   '&WIDTH=800'
+                   '&HEIGHT=800'
+                   '&styles=boxfill/rainbow'
+                   '&format=image/gif'
+                   '&time={field_date}T00:30:00.000Z'
+                   '/{field_date}T23:30:00.000Z'),
+        times={'StartTime': '{field_date}T00:30:00.000Z',
+               'StopTime': '{field_date}T23:30:00.000Z'},
+        date_fields={'BulletinDate': '{bulletin_date}',
+                     'FieldDate': '{field_date}'}),
+    'mog': CMEMSDescriptor(
+        collection_id='MULTIOBS_GLO_PHY_NRT_015_003',
+        title='Global Total Surface and 15m Current (Hourly)',
+        notes=(' This product is a 6 hourly NRT L4 global total velocity field at 0m and 15m.'  # noqa: E501
+               ' It consists of the zonal and meridional velocity at a 6h frequency and at 1/4 degree'  # noqa: E501
+               ' regular grid produced on a daily basis. These total velocity fields are obtained by combining'  # noqa: E501
+               'CMEMS NRT satellite Geostrophic Surface Currents and modelled Ekman current at the surface and'  # noqa: E501
+               ' 15m depth (using ECMWF NRT wind).'),
+        footprint=GLOBAL,
+        tags=('sea', 'velocity', 'hourly', 'eastward sea water velocity ',
+              'northward sea water velocity'),
+        thumbnail=('http://nrt.cmems-du.eu/thredds/wms/'
+                   'dataset-uv-nrt-hourly'
+                   '?request=GetMap'
+                   '&service=WMS'
+                   '&version=1.3.0'
+                   '&layers=sea_water_velocity'
+                   '&crs=CRS:84'
+                   '&bbox=-180,-90,180,90'
+                   '&WIDTH=800'
+                   '&HEIGHT=800'
+                   '&styles=fancyvec/alg'
+                   '&format=image/gif'
+                   '&&time={date}T00:00:00.000Z'
+                   '/{date}T18:00:00.000Z'),
+        times={'StartTime': '{field_date}T00:00:00.000Z',
+               'StopTime': '{field_date}T18:00:00.000Z'}),
+}
+
+
+def get_descriptor(harvester_type):
+    """Return the descriptor of a CMEMS product type."""
+    return DESCRIPTORS[harvester_type]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed storage for contents shared by several harvest objects.
+
+A harvest object can store the key of a blob instead of a large content
+that other objects of the same entry also need, so the content is only
+stored once.
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from ckan.model import Session
+
+from ckanext.nextgeossharvest.model import content_blob_table
+
+
+# Blobs are immutable, so a blob that already exists is left as it is.
+INSERT_BLOB = text('''
+    INSERT INTO nextgeoss_content_blob (key, content, created)
+    VALUES (:key, :content, :created)
+    ON CONFLICT (key) DO NOTHING
+''')
+
+# The harvest objects that reference a blob store its key in a
+# `content_ref` extra, which uses the idx_harvest_object_extra_content_ref
+# index. Recent blobs are kept because a gather stage stores a blob before
+# it creates the objects that reference it.
+DELETE_UNREFERENCED_BLOBS = text('''
+    DELETE FROM nextgeoss_content_blob
+    WHERE created < :before
+    AND NOT EXISTS (
+        SELECT 1 FROM harvest_object_extra
+        WHERE harvest_object_extra.key = 'content_ref'
+        AND harvest_object_extra.value = nextgeoss_content_blob.key
+    )
+''')
+
+
+def blob_key(content):
+    """Return the key of a content."""
+    if isinstance(content, unicode):  # noqa: F821
+        content = content.encode('utf-8')
+    return hashlib.sha1(content).hexdigest()
+
+
+def store_blob(content):
+    """Store a content if it isn't stored yet and return its key."""
+    if not isinstance(content, unicode):  # noqa: F821
+        content = content.decode('utf-8')
+    key = blob_key(content)
+    Session.execute(INSERT_BLOB, {'key': key, 'content': content,
+                                  'created': datetime.utcnow()})
+    Session.commit()
+    return key
+
+
+def get_blob(key):
+    """Return the content of a blob, or None if it doesn't exist."""
+    table = content_blob_table
+    return Session.execute(select([table.c.content])
+                           .where(table.c.key == key)).scalar()
+
+
+def delete_unreferenced_blobs(min_age_days=1):
+    """
+    Delete the blobs that no harvest object references anymore, e.g.
+    because the source was cleared, and return how many were deleted.
+
+    Blobs created less than `min_age_days` ago are kept.
+    """
+    before = datetime.utcnow() - timedelta(days=min_age_days)
+    result = Session.execute(DELETE_UNREFERENCED_BLOBS, {'before': before})
+    Session.commit()
+    return result.rowcount
@@ -3,191 +3,147 @@
 import logging
 import datetime
 
-from bs4 import BeautifulSoup as Soup
+from lxml import etree
 
 from ckanext.harvest.harvesters.base import HarvesterBase
 
+from ckanext.nextgeossharvest.lib.sentinel_products import decode_identifier
+from ckanext.nextgeossharvest.lib.sentinel_products import get_collection
+from ckanext.nextgeossharvest.lib.sentinel_products import get_tags
+from ckanext.nextgeossharvest.lib.sentinel_products import UNKNOWN_COLLECTION
+
 
 log = logging.getLogger(__name__)
 
 
-class SentinelHarvester(HarvesterBase):
+NAME_ELEMENTS = ['str', 'int', 'date', 'double']
+
+NORMALIZED_NAMES = {
+    'beginposition': 'StartTime',
+    'endposition': 'StopTime',
+    'footprint': 'spatial',
+    'filename': 'Filename',
+    'platformname': 'FamilyName',
+    'instrumentshortname': 'InstrumentFamilyName',
+    'instrumentname': 'InstrumentName',
+    'polarisationmode': 'TransmitterReceiverPolarisation',
+    'sensoroperationalmode': 'InstrumentMode',
+    'productclass': 'ProductClass',
+    'producttype': 'ProductType',
+    'productconsolidation': 'ProductConsolidation',
+    'acquisitiontype': 'AcquisitionType',
+    'orbitdirection': 'OrbitDirection',
+    'swathidentifier': 'Swath',
+    'cloudcoverpercentage': 'CloudCoverage',
+    'uuid': 'uuid',
+    'identifier': 'identifier',
+    'size': 'size',
+}
+
+# The entries are stored as they were serialized by BeautifulSoup's lxml
+# HTML parser, so we parse them with the same lxml parser to get the same
+# tree, but query it with precompiled XPath expressions instead of walking
+# it in Python.
+HTML_PARSER = etree.HTMLParser(encoding='utf-8')
+XPATH_NAME_ELEMENTS = etree.XPath(
+    ' | '.join('//{}[@name]'.format(name) for name in NAME_ELEMENTS))
+XPATH_ENCLOSURE = etree.XPath('(//link[not(@rel)])[1]/@href')
+XPATH_ALTERNATIVE = etree.XPath('(//link[@rel="alternative"])[1]/@href')
+XPATH_THUMBNAIL = etree.XPath('(//link[@rel="icon"])[1]/@href')
+XPATH_INGESTION_DATE = etree.XPath('string((//date[@name="ingestiondate"])[1])')  # noqa: E501
+XPATH_SUMMARY = etree.XPath('(//summary)[1]')
+XPATH_TEXT = etree.XPath('string()')
 
-    def _normalize_names(self, item_node):
-        """
-        Return a dictionary of metadata fields with normalized names.
 
-        The Sentinel entries are composed of metadata elements with names
-        corresponding to the contents of name_elements and title, link,
-        etc. elements. We can just extract all the metadata elements at
-        once and rename them in one go.
+class SentinelHarvester(HarvesterBase):
 
-        Note that elements like `ingestiondate`, which are included in the
-        scihub results, will not be added to item as they are not part of the
-        list of elements added in the original version.
+    def _extract_entry(self, content):
         """
-        name_elements = ['str', 'int', 'date', 'double']
-        normalized_names = {
-            'beginposition': 'StartTime',
-            'endposition': 'StopTime',
-            'footprint': 'spatial',
-            'filename': 'Filename',
-            'platformname': 'FamilyName',
-            'instrumentshortname': 'InstrumentFamilyName',
-            'instrumentname': 'InstrumentName',
-            'polarisationmode': 'TransmitterReceiverPolarisation',
-            'sensoroperationalmode': 'InstrumentMode',
-            'productclass': 'ProductClass',
-            'producttype': 'ProductType',
-            'productconsolidation': 'ProductConsolidation',
-            'acquisitiontype': 'AcquisitionType',
-            'orbitdirection': 'OrbitDirection',
-            'swathidentifier': 'Swath',
-            'cloudcoverpercentage': 'CloudCoverage',
-            'uuid': 'uuid',
-            'identifier': 'identifier',
-            'size': 'size',
-        }
-        item = {}
-
-        for subitem_node in item_node.findChildren():
-            if subitem_node.name in name_elements:
-                key = normalized_names.get(subitem_node.get('name'))
-                if key:
-                    item[key] = subitem_node.text
+        Parse an entry with lxml and return the metadata fields with
+        normalized names, the links and the other elements we need in one
+        dictionary.
 
-        return item
-
-    def _add_collection(self, item):
+        Missing links and elements are None.
+        """
+        if isinstance(content, unicode):  # noqa: F821
+            content = content.encode('utf-8')
+        tree = etree.fromstring(content, HTML_PARSER)
+
+        entry = {}
+        for node in XPATH_NAME_ELEMENTS(tree):
+            key = NORMALIZED_NAMES.get(node.get('name'))
+            if key:
+                entry[key] = unicode(XPATH_TEXT(node))  # noqa: F821
+
+        entry['enclosure'] = self._first(XPATH_ENCLOSURE(tree))
+        entry['alternative'] = self._first(XPATH_ALTERNATIVE(tree))
+        entry['thumbnail'] = self._first(XPATH_THUMBNAIL(tree))
+        entry['ingestiondate'] = XPATH_INGESTION_DATE(tree) or None
+        summary = XPATH_SUMMARY(tree)
+        entry['summary'] = unicode(XPATH_TEXT(summary[0])) if summary else None  # noqa: E501, F821
+
+        return entry
+
+    def _first(self, values):
+        """Return the first result of an XPath query or None."""
+        return unicode(values[0]) if values else None  # noqa: F821
+
+    def _add_collection(self, item, product=None):
         """Return the item with collection ID, name, and description."""
-        identifier = item['identifier'].lower()
-        if identifier.startswith('s3'):
-            if 'efr' in identifier:
-                item['collection_id'] = 'SENTINEL3_OLCI_L1_EFR'
-                item['collection_name'] = 'Sentinel-3 OLCI Level-1 Full Resolution'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 OLCI Level-1 product provides radiances for each pixel in the instrument grid, each view and each OLCI channel, plus annotation data associated to OLCI pixels. The output of this product is during EO processing mode for Full Resolution.'  # noqa: E501
-            elif 'err' in identifier:
-                item['collection_id'] = 'SENTINEL3_OLCI_L1_ERR'
-                item['collection_name'] = 'Sentinel-3 OLCI Level-1 Reduced Resolution'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 OLCI Level-1 product provides radiances for each pixel in the instrument grid, each view and each OLCI channel, plus annotation data associated to OLCI pixels. The output of this product is during EO processing mode for Reduced Resolution.'  # noqa: E501
-            elif 'lfr' in identifier:
-                item['collection_id'] = 'SENTINEL3_OLCI_L2_LFR'
-                item['collection_name'] = 'Sentinel-3 OLCI Level-2 Land Full Resolution'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 OLCI level-2 land product provides land and atmospheric geophysical parameters computed for full Resolution.'  # noqa: E501
-            elif 'lrr' in identifier:
-                item['collection_id'] = 'SENTINEL3_OLCI_L2_LRR'
-                item['collection_name'] = 'Sentinel-3 OLCI Level-2 Land Reduced Resolution'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 OLCI level-2 land product provides land and atmospheric geophysical parameters computed for reduced Resolution.'  # noqa: E501
-            elif 'rbt' in identifier:
-                item['collection_id'] = 'SENTINEL3_SLSTR_L1_RBT'
-                item['collection_name'] = 'Sentinel-3 SLSTR Level-1 Radiances and Brightness Temperatures'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 SLSTR Level-1 product provides radiances and brightness temperatures for each pixel in a regular image grid, each view and each SLSTR channel, plus annotations data associated with SLSTR pixels.'  # noqa: E501
-            elif 'lst' in identifier:
-                item['collection_id'] = 'SENTINEL3_SLSTR_L2_LST'
-                item['collection_name'] = 'Sentinel-3 SLSTR Level-2 Land Surface Temperature'  # noqa: E501
-                item['collection_description'] = 'SENTINEL-3 SLSTR Level-2 LST product provides land surface parameters generated on the wide 1 km measurement grid.'  # noqa: E501
-            elif 'cal' in identifier:
-                item['collection_id'] = 'SENTINEL3_SRAL_L1_CAL'
-                item['collection_name'] = 'Sentinel-3 SRAL Level-1 Calibration'
-                item['collection_description'] = 'SENTINEL-3 is the first Earth Observation Altimetry mission to provide 100% SAR altimetry coverage where LRM is maintained as a back-up operating mode. This is a Level 1 Calibration product.'  # noqa: E501
-            elif 'sra' in identifier:
-                item['collection_id'] = 'SENTINEL3_SRAL_L1_SRA'
-                item['collection_name'] = 'Sentinel-3 SRAL Level-1 SRA'
-                item['collection_description'] = 'SENTINEL-3 is the first Earth Observation Altimetry mission to provide 100% SAR altimetry coverage where LRM is maintained as a back-up operating mode. This is a Level 1 SRA product.'  # noqa: E501
-            elif 'lan' in identifier:
-                item['collection_id'] = 'SENTINEL3_SRAL_L2_LAN'
-                item['collection_name'] = 'Sentinel-3 SRAL Level-2 Land'
-                item['collection_description'] = 'SENTINEL-3 is the first Earth Observation Altimetry mission to provide 100% SAR altimetry coverage where LRM is maintained as a back-up operating mode. This is a product of Level 2 processing and geographical coverage over land.'  # noqa: E501
-            elif 'wat' in identifier:
-                item['collection_id'] = 'SENTINEL3_SRAL_L2_WAT'
-                item['collection_name'] = 'Sentinel-3 SRAL Level-2 Water'
-                item['collection_description'] = 'SENTINEL-3 is the first Earth Observation Altimetry mission to provide 100% SAR altimetry coverage where LRM is maintained as a back-up operating mode. This is a product of Level 2 processing and geographical coverage over water.'  # noqa: E501
-            else:
-                message = 'No collection for Sentinel-3 product {}'.format(
-                    item["identifier"])
-                log.warning(message)
-        elif identifier.startswith('s2'):
-            if 'msil1c' in identifier:
-                item['collection_id'] = 'SENTINEL2_L1C'
-                item['collection_name'] = 'Sentinel-2 Level-1C'
-                item['collection_description'] = u'The Sentinel-2 Level-1C products are Top-of-atmosphere reflectances in cartographic geometry. These products are systematically generated and the data volume is 500MB for each 100x100 km².'  # noqa: E501
-            elif 'msil2a' in identifier:
-                item['collection_id'] = 'SENTINEL2_L2A'
-                item['collection_name'] = 'Sentinel-2 Level-2A'
-                item['collection_description'] = u'The Sentinel-2 Level-2A products are Bottom-of-atmosphere reflectances in cartographic geometry (prototype product). These products are generated using Sentinel-2 Toolbox and the data volume is 600MB for each 100x100 km².'  # noqa: E501
-
-            else:
-                log.warning('No collection for Sentinel-2 product {}'.format(identifier))  # noqa: E501
-        else:
-            if 'slc' in identifier:
-                item['collection_id'] = 'SENTINEL1_L1_SLC'
-                item['collection_name'] = 'Sentinel-1 Level-1 (SLC)'
-                item['collection_description'] = 'The Sentinel-1 Level-1 Single Look Complex (SLC) products consist of focused SAR data geo-referenced using orbit and attitude data from the satellite and provided in zero-Doppler slant-range geometry. The products include a single look in each dimension using the full TX signal bandwidth and consist of complex samples preserving the phase information.'  # noqa: E501
-            elif 'grd' in identifier:
-                item['collection_id'] = 'SENTINEL1_L1_GRD'
-                item['collection_name'] = 'Sentinel-1 Level-1 (GRD)'
-                item['collection_description'] = 'The Sentinel-1 Level-1 Ground Range Detected (GRD) products consist of focused SAR data that has been detected, multi-looked and projected to ground range using an Earth ellipsoid model. Phase information is lost. The resulting product has approximately square resolution pixels and square pixel spacing with reduced speckle at the cost of reduced geometric resolution.'  # noqa: E501
-            elif 'ocn' in identifier:
-                item['collection_id'] = 'SENTINEL1_L2_OCN'
-                item['collection_name'] = 'Sentinel-1 Level-2 (OCN)'
-                item['collection_description'] = 'The Sentinel-1 Level-2 OCN products include components for Ocean Swell spectra (OSW) providing continuity with ERS and ASAR WV and two new components: Ocean Wind Fields (OWI) and Surface Radial Velocities (RVL). The OSW is a two-dimensional ocean surface swell spectrum and includes an estimate of the wind speed and direction per swell spectrum. The OWI is a ground range gridded estimate of the surface wind speed and direction at 10 m above the surface derived from internally generated Level-1 GRD images of SM, IW or EW modes. The RVL is a ground range gridded difference between the measured Level-2 Doppler grid and the Level-1 calculated geometrical Doppler.'  # noqa: E501
-            elif 'raw' in identifier:
-                item['collection_id'] = 'SENTINEL1_L0_RAW'
-                item['collection_name'] = 'Sentinel-1 Level-0 (RAW)'
-                item['collection_description'] = 'The Sentinel-1 Level-0 products consist of the sequence of Flexible Dynamic Block Adaptive Quantization (FDBAQ) compressed unfocused SAR raw data. For the data to be usable, it will need to be decompressed and processed using focusing software.'  # noqa: E501
-            else:
-                log.warning('No collection for Sentinel-1 product {}'.format(identifier))  # noqa: E501
+        if product is None:
+            product = decode_identifier(item['identifier'])
+        collection = get_collection(product)
+        if not collection:
+            log.warning('No collection for Sentinel product {}'
+                        .format(item['identifier']))
+            collection = UNKNOWN_COLLECTION
+        item['collection_id'] = collection['collection_id']
+        item['collection_name'] = collection['collection_name']
+        item['collection_description'] = collection['collection_description']  # noqa: E501
 
         return item
 
-    def _get_tags_for_dataset(self, item):
+    def _get_tags_for_dataset(self, item, product=None):
         """Creates a list of tag dictionaries based on a product's metadata."""
-        identifier = item['identifier'].lower()
-        if identifier.startswith('s1'):
-            tags = [{'name': 'Sentinel-1'}]
-            if 'slc' in identifier:
-                tags.extend([{'name': 'SLC'}])
-            elif 'grd' in identifier:
-                tags.extend([{'name': 'GRD'}])
-            elif 'ocn' in identifier:
-                tags.extend([{'name': 'OCN'}])
-            elif 'raw' in identifier:
-                tags.extend([{'name': 'RAW'}])
-        elif identifier.startswith('s2'):
-            tags = [{'name': 'Sentinel-2'}, {'name': 'MSI'}]
-            if 'msil1c' in identifier:
-                tags.extend([{'name': 'Level-1C'}])
-            elif 'msil2a' in identifier:
-                tags.extend([{'name': 'Level-2A'}])
-        elif identifier.startswith('s3'):
-            tags = [{'name': 'Sentinel-3'}]
-            if 'lan' in identifier:
-                tags.extend([{'name': 'Land'}, {'name': 'Level-2'},
-                             {'name': 'SAR'}, {'name': 'Altimeter'}])
-            elif 'wat' in identifier:
-                tags.extend([{'name': 'Water'}, {'name': 'Level-2'},
-                             {'name': 'SAR'}, {'name': 'Altimeter'}])
-            elif 'sra' in identifier:
-                tags.extend([{'name': 'SRA'}, {'name': 'Level-1'},
-                             {'name': 'SAR'}, {'name': 'Altimeter'}])
-            elif 'cal' in identifier:
-                tags.extend([{'name': 'Calibration'}, {'name': 'Level-1'},
-                             {'name': 'SAR'}, {'name': 'Altimeter'}])
-        else:
-            tags = []
-            log.debug('No tags for {}'.format(identifier))
+        if product is None:
+            product = decode_identifier(item['identifier'])
+        tags = [{'name': tag}
+                for tag in get_tags(item['identifier'], product)]
+        if not tags:
+            log.debug('No tags for {}'.format(item['identifier']))
 
         return tags
 
+    def _add_product_fields(self, item, product):
+        """
+        Add the fields decoded from the identifier that aren't part of the
+        entry's metadata, so that we can facet on them.
+        """
+        if not product:
+            return item
+        if product['orbit'] is not None:
+            item['AbsoluteOrbit'] = str(product['orbit'])
+        if product['relative_orbit'] is not None:
+            item['RelativeOrbit'] = str(product['relative_orbit'])
+        if product['processing_baseline']:
+            item['ProcessingBaseline'] = product['processing_baseline']
+
+        return item
+
     def _parse_content(self, content):
         """
         Parse the entry content and return a dictionary using our standard
         metadata terms.
         """
-        soup = Soup(content, 'lxml')
+        entry = self._extract_entry(content)
 
         # Create an item dictionary and add metadata with normalized names.
-        item = self._normalize_names(soup)
+        enclosure = entry.pop('enclosure')
+        alternative = entry.pop('alternative')
+        thumbnail = entry.pop('thumbnail')
+        ingestion_date = entry.pop('ingestiondate')
+        summary = entry.pop('summary')
+        item = entry
 
         # If there's a spatial element, convert it to GeoJSON
         # Remove it if it's invalid
@@ -198,23 +154,18 @@ class SentinelHarvester(HarvesterBase):
         item['name'] = item['identifier'].lower()
 
         # Thumbnail, alternative and enclosure
-        enclosure = soup.find('link', rel=None)['href']
-        alternative = soup.find('link', rel='alternative')['href']
-        thumbnail = soup.find('link', rel='icon')
         if enclosure.startswith('https://scihub'):
             item['scihub_download_url'] = enclosure
             item['scihub_product_url'] = alternative
             item['scihub_manifest_url'] = self._make_manifest_url(item)
             if thumbnail:
-                item['scihub_thumbnail'] = thumbnail['href']
+                item['scihub_thumbnail'] = thumbnail
         elif enclosure.startswith('https://sentinels'):
             item['noa_download_url'] = enclosure
             item['noa_product_url'] = alternative
             item['noa_manifest_url'] = self._make_manifest_url(item)
             if thumbnail:
-                item['noa_thumbnail'] = thumbnail['href']
-            ingestion_date = soup.find('date',
-                                       {'name': 'ingestiondate'}).text
+                item['noa_thumbnail'] = thumbnail
             if '.' not in ingestion_date:
                 ingestion_date = ingestion_date.replace('Z', '.000Z')
             ingestion_date = datetime.datetime.strptime(ingestion_date,
@@ -226,23 +177,25 @@ class SentinelHarvester(HarvesterBase):
             item['code_product_url'] = alternative
             item['code_manifest_url'] = self._make_manifest_url(item)
             if thumbnail:
-                item['code_thumbnail'] = thumbnail['href']
+                item['code_thumbnail'] = thumbnail
         item['thumbnail'] = item.get('scihub_thumbnail') or item.get('noa_thumbnail') or item.get('code_thumbnail')  # noqa: E501
 
         # Convert size (298.74 MB to an integer representing bytes)
         item['size'] = int(float(item['size'].split(' ')[0]) * 1000000)
 
-        # Add the collection info
-        item = self._add_collection(item)
+        # Decode the identifier once and add the collection info
+        product = decode_identifier(item['identifier'])
+        item = self._add_collection(item, product)
+        item = self._add_product_fields(item, product)
 
         item['title'] = item['collection_name']
 
         item['notes'] = item['collection_description']
 
         # I think this should be the description of the dataset itself
-        item['summary'] = soup.find('summary').text
+        item['summary'] = summary
 
-        item['tags'] = self._get_tags_for_dataset(item)
+        item['tags'] = self._get_tags_for_dataset(item, product)
 
         # Add time range metadata that's not tied to product-specific fields
         # like StartTime so that we can filter by a dataset's time range
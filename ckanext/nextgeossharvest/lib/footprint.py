@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Footprint pre-processing for services that can't handle complex polygons.
+
+Sentinel-3 footprints and long swaths have hundreds of vertices, which make
+iTag queries huge and slow. simplify_footprint() reduces a footprint to a
+vertex budget and splits footprints that cross the antimeridian, so that
+they don't wrap around the world.
+"""
+
+import json
+
+from shapely.affinity import translate
+from shapely.geometry import MultiPolygon, Polygon, box, shape
+
+
+METHODS = ['hull', 'simplify']
+
+# The first tolerance tried by the topology-preserving simplification, in
+# degrees. It's doubled until the footprint fits in the vertex budget.
+INITIAL_TOLERANCE = 0.001
+
+
+def count_vertices(geometry):
+    """Return the number of vertices of a Polygon or MultiPolygon."""
+    if isinstance(geometry, MultiPolygon):
+        return sum(count_vertices(polygon) for polygon in geometry.geoms)
+    return len(geometry.exterior.coords) + \
+        sum(len(interior.coords) for interior in geometry.interiors)
+
+
+def crosses_antimeridian(ring):
+    """
+    Return True if a ring crosses the antimeridian, i.e. if two consecutive
+    vertices are more than 180 degrees of longitude apart.
+    """
+    return any(abs(x2 - x1) > 180
+               for (x1, _), (x2, _) in zip(ring, ring[1:]))
+
+
+def split_antimeridian(ring):
+    """
+    Return a footprint that crosses the antimeridian as a MultiPolygon with
+    one polygon on each side.
+    """
+    shifted = Polygon([(x + 360 if x < 0 else x, y) for x, y in ring[:-1]])
+    if not shifted.is_valid:
+        shifted = shifted.buffer(0)
+    west = shifted.intersection(box(-180, -90, 180, 90))
+    east = translate(shifted.intersection(box(180, -90, 540, 90)), xoff=-360)
+
+    polygons = []
+    for part in [west, east]:
+        if isinstance(part, Polygon):
+            polygons.append(part)
+        elif hasattr(part, 'geoms'):
+            polygons.extend(geometry for geometry in part.geoms
+                            if isinstance(geometry, Polygon))
+    return MultiPolygon([polygon for polygon in polygons
+                         if not polygon.is_empty])
+
+
+def to_geometry(spatial):
+    """
+    Return a GeoJSON footprint as a shapely geometry, split at the
+    antimeridian if needed.
+    """
+    if not isinstance(spatial, dict):
+        spatial = json.loads(spatial)
+    if spatial['type'] == 'Polygon':
+        ring = [(x[0], x[1]) for x in spatial['coordinates'][0]]
+        if crosses_antimeridian(ring):
+            return split_antimeridian(ring)
+        return Polygon(ring)
+    return shape(spatial)
+
+
+def simplify_footprint(spatial, method='simplify', max_vertices=100):
+    """
+    Return a simplified version of a GeoJSON footprint with at most
+    `max_vertices` vertices, as a shapely geometry.
+
+    `hull` replaces the footprint with its convex hull (for each side of the
+    antimeridian). `simplify` uses a topology-preserving simplification with
+    the smallest tolerance that fits the vertex budget. Either way, the
+    bounding box is used if the budget can't be met.
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of {}'.format(', '.join(METHODS)))  # noqa: E501
+    geometry = to_geometry(spatial)
+    if not geometry.is_valid:
+        geometry = geometry.buffer(0)
+
+    if method == 'hull':
+        if isinstance(geometry, MultiPolygon):
+            geometry = MultiPolygon([polygon.convex_hull
+                                     for polygon in geometry.geoms])
+        else:
+            geometry = geometry.convex_hull
+
+    tolerance = INITIAL_TOLERANCE
+    simplified = geometry
+    while count_vertices(simplified) > max_vertices and tolerance < 10:
+        simplified = geometry.simplify(tolerance, preserve_topology=True)
+        tolerance *= 2
+
+    if count_vertices(simplified) > max_vertices:
+        if isinstance(geometry, MultiPolygon):
+            return MultiPolygon([box(*polygon.bounds)
+                                 for polygon in geometry.geoms])
+        return box(*geometry.bounds)
+    return simplified
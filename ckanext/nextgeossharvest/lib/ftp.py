@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Pooled FTP connections and directory listings with sizes.
+
+Logging in to an FTP server takes several round trips, so the connections
+are kept open and reused across gathers. Directories are listed with MLSD,
+which returns the names, sizes and modification times of all the files in
+one call, or with LIST on servers that don't support MLSD.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from ftplib import FTP, all_errors, error_perm, error_temp
+from multiprocessing.pool import ThreadPool
+
+
+log = logging.getLogger(__name__)
+
+FtpEntry = namedtuple('FtpEntry', ['name', 'size', 'modify'])
+
+MONTHS = {month: i + 1 for i, month in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+     'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+
+
+def parse_mlsd_line(line, kind='file'):
+    """
+    Return the FtpEntry for a line of an MLSD listing, e.g.
+    `type=file;size=1024;modify=20180301120000; name.nc`, or None if it's
+    not a file (or not a directory if `kind` is 'dir').
+    """
+    facts, _, name = line.partition(' ')
+    facts = dict(fact.split('=', 1) for fact in facts.split(';')
+                 if '=' in fact)
+    facts = {key.lower(): value for key, value in facts.items()}
+    if facts.get('type', 'file').lower() != kind or not name:
+        return None
+    size = facts.get('size')
+    modify = facts.get('modify')
+    return FtpEntry(name,
+                    int(size) if size and size.isdigit() else None,
+                    datetime.strptime(modify[:14], '%Y%m%d%H%M%S')
+                    if modify else None)
+
+
+def parse_list_line(line, now=None, kind='file'):
+    """
+    Return the FtpEntry for a line of a Unix-style LIST listing, e.g.
+    `-rw-r--r-- 1 ftp ftp 1024 Mar 01 12:00 name.nc`, or None if it's not a
+    file (or not a directory if `kind` is 'dir').
+
+    LIST only includes the time of recent files and the year of older ones,
+    so recent files are assumed to be from the last 12 months.
+    """
+    parts = line.split(None, 8)
+    if len(parts) < 9 or not parts[0].startswith('d' if kind == 'dir' else '-'):  # noqa: E501
+        return None
+    size, month, day, time_or_year, name = parts[4:9]
+    try:
+        month = MONTHS[month.lower()[:3]]
+        day = int(day)
+        if ':' in time_or_year:
+            now = now or datetime.utcnow()
+            hour, minute = [int(x) for x in time_or_year.split(':')]
+            modify = datetime(now.year, month, day, hour, minute)
+            if modify > now:
+                modify = modify.replace(year=now.year - 1)
+        else:
+            modify = datetime(int(time_or_year), month, day)
+    except (KeyError, ValueError):
+        modify = None
+    return FtpEntry(name, int(size) if size.isdigit() else None, modify)
+
+
+class FtpConnectionPool(object):
+    """
+    A thread-safe pool of logged-in connections to an FTP server.
+
+    At most `max_connections` connections are open at the same time; the
+    threads that need another one wait until one is released.
+    """
+
+    def __init__(self, domain, user, passwd, max_connections=4,
+                 timeout=60):
+        self.domain = domain
+        self.user = user
+        self.passwd = passwd
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.max_connections = max_connections
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.mlsd = True
+
+    def _connect(self):
+        log.debug('Connecting to {}'.format(self.domain))
+        return FTP(self.domain, self.user, self.passwd, timeout=self.timeout)
+
+    def _acquire(self):
+        self.slots.acquire()
+        try:
+            while True:
+                with self.lock:
+                    ftp = self.idle.pop() if self.idle else None
+                if ftp is None:
+                    return self._connect()
+                # The server may have closed idle connections.
+                try:
+                    ftp.voidcmd('NOOP')
+                    return ftp
+                except all_errors:
+                    self._close(ftp)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def _release(self, ftp):
+        if ftp is not None:
+            with self.lock:
+                self.idle.append(ftp)
+        self.slots.release()
+
+    def _close(self, ftp):
+        try:
+            ftp.quit()
+        except all_errors:
+            ftp.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Yield a connection from the pool. Connections that raise an error
+        are closed instead of being returned to the pool.
+        """
+        ftp = self._acquire()
+        try:
+            yield ftp
+        except Exception:
+            self._close(ftp)
+            ftp = None
+            raise
+        finally:
+            self._release(ftp)
+
+    def list_directory(self, path, kind='file'):
+        """
+        Return the FtpEntry of each file in a directory, or of each
+        subdirectory if `kind` is 'dir'.
+        """
+        with self.connection() as ftp:
+            if self.mlsd:
+                lines = []
+                try:
+                    ftp.retrlines('MLSD {}'.format(path), lines.append)
+                    return [entry for entry
+                            in (parse_mlsd_line(line, kind=kind)
+                                for line in lines)
+                            if entry]
+                except error_perm as e:
+                    if not str(e).startswith('50'):
+                        raise
+                    log.debug('{} does not support MLSD'.format(self.domain))
+                    self.mlsd = False
+            lines = []
+            ftp.retrlines('LIST {}'.format(path), lines.append)
+            return [entry for entry
+                    in (parse_list_line(line, kind=kind) for line in lines)
+                    if entry]
+
+    def close(self):
+        """Close the idle connections."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for ftp in idle:
+            self._close(ftp)
+
+
+def pipelined_sizes(ftp, paths, chunk_size=50):
+    """
+    Return a list of (size, reply) tuples with the size of each file, or
+    None and the error reply if the size isn't available.
+
+    The SIZE commands of each chunk are all sent before the replies are
+    read, so checking a chunk of files costs a single round trip.
+    """
+    ftp.voidcmd('TYPE I')
+    results = []
+    for i in range(0, len(paths), chunk_size):
+        chunk = paths[i:i + chunk_size]
+        for path in chunk:
+            ftp.putcmd('SIZE {}'.format(path))
+        for path in chunk:
+            try:
+                reply = ftp.getresp()
+            except (error_perm, error_temp) as e:
+                results.append((None, str(e)))
+                continue
+            size = reply[4:].strip()
+            results.append((int(size) if size.isdigit() else None, reply))
+    return results
+
+
+def crawl(pool, paths, list_directory=None):
+    """
+    List several directories concurrently over the connections of a pool
+    and return the entries of each directory, in the same order as `paths`.
+
+    `list_directory` defaults to pool.list_directory(); any function that
+    takes a path can be used instead (e.g. FtpSnapshots.list_new()).
+    """
+    list_directory = list_directory or pool.list_directory
+    paths = list(paths)
+    if len(paths) < 2:
+        return [list_directory(path) for path in paths]
+
+    threads = ThreadPool(min(pool.max_connections, len(paths)))
+    try:
+        return threads.map(list_directory, paths)
+    finally:
+        threads.close()
+        threads.join()
+
+
+# Pools are shared by all the harvesters of a process that use the same
+# settings.
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(domain, user, passwd, max_connections=4, timeout=60):
+    """
+    Return the connection pool for a server, user, number of connections
+    and timeout.
+    """
+    key = (domain, user, passwd, max_connections, timeout)
+    with pools_lock:
+        if key not in pools:
+            pools[key] = FtpConnectionPool(domain, user, passwd,
+                                           max_connections, timeout)
+        return pools[key]
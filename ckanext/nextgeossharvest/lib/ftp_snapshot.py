@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import posixpath
+import threading
+from datetime import datetime
+from ftplib import all_errors
+
+from sqlalchemy import and_, select
+
+from ckan.model import Session
+
+from ckanext.nextgeossharvest.model import ftp_snapshot_table
+
+
+log = logging.getLogger(__name__)
+
+
+def listing_hash(sizes):
+    """Return a hash of a dictionary of file sizes by name."""
+    lines = '\n'.join('{}|{}'.format(name, size)
+                      for name, size in sorted(sizes.items()))
+    return hashlib.sha1(lines.encode('utf-8')).hexdigest()
+
+
+class FtpSnapshots(object):
+    """
+    The last listing of each FTP directory crawled by a harvest source.
+
+    list_new() only returns the files that were added or changed since the
+    last snapshot of a directory. Directories whose modification time (from
+    the listing of their parent) hasn't changed aren't listed at all, as
+    long as all of their files were recorded.
+
+    The snapshots are loaded when the object is created and the new ones are
+    only written by save(), so list_new() can be called from several threads
+    and the snapshots can be saved once the harvest objects are created.
+    """
+
+    def __init__(self, source_id):
+        self.source_id = source_id
+        table = ftp_snapshot_table
+        rows = Session.execute(select([table])
+                               .where(table.c.source_id == source_id))
+        self.snapshots = {(row['domain'], row['path']): row for row in rows}
+        self.pending = {}
+        self.parents = {}
+        self.lock = threading.Lock()
+
+    def _get_dir_modify(self, pool, path):
+        """
+        Return the modification time of a directory from the listing of its
+        parent, or None if it's not available.
+        """
+        parent, name = posixpath.split(path)
+        if not name:
+            return None
+        key = (pool.domain, parent)
+        with self.lock:
+            directories = self.parents.get(key)
+        if directories is None:
+            try:
+                directories = {entry.name: entry.modify for entry
+                               in pool.list_directory(parent, kind='dir')}
+            except all_errors as e:
+                log.debug('Cannot list {}: {}'.format(parent, e))
+                directories = {}
+            with self.lock:
+                self.parents[key] = directories
+        return directories.get(name)
+
+    def list_new(self, pool, path, accept=None):
+        """
+        Return the FtpEntry of each file of a directory that was added or
+        changed since the last snapshot.
+
+        Only the files whose name is accepted by `accept`, if given, are
+        returned and recorded in the snapshot. The others (e.g. files out of
+        the date range of the gather) are returned by a later call that
+        accepts them. A directory is only skipped without listing it, or
+        because its listing hasn't changed, once all of its files have been
+        recorded.
+        """
+        path = '/' + path.strip('/')
+        snapshot = self.snapshots.get((pool.domain, path))
+        dir_modify = self._get_dir_modify(pool, path)
+        if snapshot is not None and dir_modify is not None and \
+                snapshot['dir_modify'] == dir_modify:
+            log.debug('{}{} has not changed'.format(pool.domain, path))
+            return []
+
+        entries = pool.list_directory(path)
+        sizes = {entry.name: entry.size for entry in entries}
+        digest = listing_hash(sizes)
+        if snapshot is not None and snapshot['listing_hash'] == digest:
+            return []
+
+        old_sizes = json.loads(snapshot['entries']) if snapshot else {}
+        new_entries = [entry for entry in entries
+                       if entry.name not in old_sizes or
+                       old_sizes[entry.name] != entry.size]
+        if accept is not None:
+            new_entries = [entry for entry in new_entries
+                           if accept(entry.name)]
+
+        recorded = {name: size for name, size in old_sizes.items()
+                    if name in sizes}
+        recorded.update((entry.name, entry.size) for entry in new_entries)
+        if recorded != sizes:
+            # The listing isn't fully recorded yet, so the directory must be
+            # listed again by the next gather.
+            digest = dir_modify = None
+        with self.lock:
+            self.pending[(pool.domain, path)] = (recorded, digest, dir_modify)
+        return new_entries
+
+    def save(self):
+        """Store the listings made since the snapshots were loaded."""
+        if not self.pending:
+            return
+        table = ftp_snapshot_table
+        now = datetime.utcnow()
+        for (domain, path), (sizes, digest, dir_modify) in self.pending.items():  # noqa: E501
+            Session.execute(table.delete()
+                            .where(and_(table.c.source_id == self.source_id,
+                                        table.c.domain == domain,
+                                        table.c.path == path)))
+            Session.execute(table.insert(),
+                            {'source_id': self.source_id, 'domain': domain,
+                             'path': path, 'entries': json.dumps(sizes),
+                             'listing_hash': digest,
+                             'dir_modify': dir_modify, 'updated': now})
+        Session.commit()
+        self.pending = {}
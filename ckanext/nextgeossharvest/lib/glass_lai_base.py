@@ -7,6 +7,8 @@ from ckanext.harvest.harvesters.base import HarvesterBase
 from ckanext.harvest.model import HarvestObjectExtra as HOExtra
 from ckanext.harvest.model import HarvestObject
 
+from ckanext.nextgeossharvest.lib.candidates import expected_dates
+
 
 class GLASS_LAI_Base(HarvesterBase):
 
@@ -14,19 +16,9 @@ class GLASS_LAI_Base(HarvesterBase):
 
         url_base = 'ftp://ftp.glcf.umd.edu/glcf/GLASS/LAI/AVHRR/'
 
-        years = ['1982', '1983', '1984', '1985', '1986', '1987', '1988',
-                 '1989', '1990', '1991', '1992', '1993', '1994', '1995',
-                 '1996', '1997', '1998', '1999', '2000', '2001', '2002',
-                 '2003', '2004', '2005', '2006', '2007', '2008', '2009',
-                 '2010', '2011', '2012', '2013', '2014', '2015']
-
-        eight_days = ['001', '009', '017', '025', '033', '041', '049',
-                      '057', '065', '073', '081', '089', '097', '105',
-                      '113', '121', '129', '137', '145', '153', '161',
-                      '169', '177', '185', '193', '201', '209', '217',
-                      '225', '233', '241', '249', '257', '265', '273',
-                      '281', '289', '297', '305', '313', '321', '329',
-                      '337', '345', '353', '361']
+        # 8-day composites from 1982 to 2015
+        dates = expected_dates(datetime.datetime(1982, 1, 1),
+                               datetime.datetime(2016, 1, 1), '8-day')
 
         spatial_template = '{{"type":"Polygon", "coordinates":[{}]}}'
         spatial = spatial_template.format([[-180, 90], [180, 90], [180, -90], [-180, -90], [-180, 90]])  # noqa: E501
@@ -35,20 +27,20 @@ class GLASS_LAI_Base(HarvesterBase):
 
         glass_lai_avhrr_products = []
 
-        for i in years:
-            for j in eight_days:
-                start_date = datetime.datetime(int(i), 1, 1, 0, 0, 0) + datetime.timedelta(int(j) - 1)  # noqa: E501
-                if (start_date == datetime.datetime(int(i), 12, 26, 0, 0, 0)) or (start_date == datetime.datetime(int(i), 12, 27, 0, 0, 0)):  # noqa: E501
-                    end_date = datetime.datetime(int(i), 12, 31, 23, 59, 59)
-                else:
-                    end_date = datetime.datetime(int(i), 1, 1, 23, 59, 59) + datetime.timedelta(int(j) + 6)  # noqa: E501
-                filename = 'GLASS01B02.V04.A' + i + j + '.2017269.hdf'
-                filename_no_ext = filename.replace('.hdf', '')
-                identifier = filename.replace('.hdf', '').replace('.', '_')
-                file_url = url_base + i + '/' + filename
-                thumbnail_url = url_base + i + '/' + filename_no_ext + '.LAI.jpg'  # noqa: E501
-                metadata_url = url_base + i + '/' + filename + '.xml'
-                glass_lai_avhrr_products.append([title, description, start_date, end_date, spatial, filename, identifier, file_url, thumbnail_url, metadata_url, [{'name': 'LAI'}, {'name': 'leaf area index'}, {'name': 'AVHRR'}, {'name': 'GLASS'}, {'name': 'global'}, {'name': 'GLCF'}]])  # noqa: E501
+        for start_date in dates:
+            i = start_date.strftime('%Y')
+            j = start_date.strftime('%j')
+            if (start_date == datetime.datetime(int(i), 12, 26, 0, 0, 0)) or (start_date == datetime.datetime(int(i), 12, 27, 0, 0, 0)):  # noqa: E501
+                end_date = datetime.datetime(int(i), 12, 31, 23, 59, 59)
+            else:
+                end_date = datetime.datetime(int(i), 1, 1, 23, 59, 59) + datetime.timedelta(int(j) + 6)  # noqa: E501
+            filename = 'GLASS01B02.V04.A' + i + j + '.2017269.hdf'
+            filename_no_ext = filename.replace('.hdf', '')
+            identifier = filename.replace('.hdf', '').replace('.', '_')
+            file_url = url_base + i + '/' + filename
+            thumbnail_url = url_base + i + '/' + filename_no_ext + '.LAI.jpg'  # noqa: E501
+            metadata_url = url_base + i + '/' + filename + '.xml'
+            glass_lai_avhrr_products.append([title, description, start_date, end_date, spatial, filename, identifier, file_url, thumbnail_url, metadata_url, [{'name': 'LAI'}, {'name': 'leaf area index'}, {'name': 'AVHRR'}, {'name': 'GLASS'}, {'name': 'global'}, {'name': 'GLCF'}]])  # noqa: E501
 
         return glass_lai_avhrr_products
 
@@ -56,17 +48,9 @@ class GLASS_LAI_Base(HarvesterBase):
 
         url_base = 'ftp://ftp.glcf.umd.edu/glcf/GLASS/LAI/MODIS/0.05D/'
 
-        years = ['2001', '2002', '2003', '2004', '2005', '2006', '2007',
-                 '2008', '2009', '2010', '2011', '2012', '2013', '2014',
-                 '2015']
-
-        eight_days = ['001', '009', '017', '025', '033', '041', '049',
-                      '057', '065', '073', '081', '089', '097', '105',
-                      '113', '121', '129', '137', '145', '153', '161',
-                      '169', '177', '185', '193', '201', '209', '217',
-                      '225', '233', '241', '249', '257', '265', '273',
-                      '281', '289', '297', '305', '313', '321', '329',
-                      '337', '345', '353', '361']
+        # 8-day composites from 2001 to 2015
+        dates = expected_dates(datetime.datetime(2001, 1, 1),
+                               datetime.datetime(2016, 1, 1), '8-day')
 
         spatial_template = '{{"type":"Polygon", "coordinates":[{}]}}'
         spatial = spatial_template.format([[-180, 90], [180, 90], [180, -90], [-180, -90], [-180, 90]])  # noqa: E501
@@ -75,27 +59,27 @@ class GLASS_LAI_Base(HarvesterBase):
 
         glass_lai_modis_products = []
 
-        for i in years:
-            for j in eight_days:
-                start_date = datetime.datetime(int(i), 1, 1, 0, 0, 0) + datetime.timedelta(int(j) - 1)  # noqa: E501
-                if (start_date == datetime.datetime(int(i), 12, 26, 0, 0, 0)) or (start_date == datetime.datetime(int(i), 12, 27, 0, 0, 0)):  # noqa: E501
-                    end_date = datetime.datetime(int(i), 12, 31, 23, 59, 59)
-                else:
-                    end_date = datetime.datetime(int(i), 1, 1, 23, 59, 59) + datetime.timedelta(int(j) + 6)  # noqa: E501
-                if i == '2015':
-                    filename = 'GLASS01B01.V04.A' + i + j + '.2016343.hdf'
-                    file_url = url_base + i + '/' + filename
-                    thumbnail_url = url_base + i + '/' + filename.replace('.hdf', '.jpg')  # noqa: E501
-                    identifier = filename.replace('.hdf', '').replace('.', '_')
-                    metadata_url = url_base + i + '/' + filename.replace('.2016343.hdf', '.2016341.hdf.xml')  # noqa: E501
-                else:
-                    filename = 'GLASS01B01.V04.A' + i + j + '.2016236.hdf'
-                    filename_no_ext = filename.replace('.hdf', '')
-                    identifier = filename.replace('.hdf', '').replace('.', '_')
-                    file_url = url_base + i + '/' + filename
-                    thumbnail_url = url_base + i + '/' + filename_no_ext + '.jpg'  # noqa: E501
-                    metadata_url = url_base + i + '/' + filename + '.xml'
-                glass_lai_modis_products.append([title, description, start_date, end_date, spatial, filename, identifier, file_url, thumbnail_url, metadata_url, [{'name': 'LAI'}, {'name': 'leaf area index'}, {'name': 'MODIS'}, {'name': 'GLASS'}, {'name': 'global'}, {'name': 'GLCF'}]])  # noqa: E501
+        for start_date in dates:
+            i = start_date.strftime('%Y')
+            j = start_date.strftime('%j')
+            if (start_date == datetime.datetime(int(i), 12, 26, 0, 0, 0)) or (start_date == datetime.datetime(int(i), 12, 27, 0, 0, 0)):  # noqa: E501
+                end_date = datetime.datetime(int(i), 12, 31, 23, 59, 59)
+            else:
+                end_date = datetime.datetime(int(i), 1, 1, 23, 59, 59) + datetime.timedelta(int(j) + 6)  # noqa: E501
+            if i == '2015':
+                filename = 'GLASS01B01.V04.A' + i + j + '.2016343.hdf'
+                file_url = url_base + i + '/' + filename
+                thumbnail_url = url_base + i + '/' + filename.replace('.hdf', '.jpg')  # noqa: E501
+                identifier = filename.replace('.hdf', '').replace('.', '_')
+                metadata_url = url_base + i + '/' + filename.replace('.2016343.hdf', '.2016341.hdf.xml')  # noqa: E501
+            else:
+                filename = 'GLASS01B01.V04.A' + i + j + '.2016236.hdf'
+                filename_no_ext = filename.replace('.hdf', '')
+                identifier = filename.replace('.hdf', '').replace('.', '_')
+                file_url = url_base + i + '/' + filename
+                thumbnail_url = url_base + i + '/' + filename_no_ext + '.jpg'  # noqa: E501
+                metadata_url = url_base + i + '/' + filename + '.xml'
+            glass_lai_modis_products.append([title, description, start_date, end_date, spatial, filename, identifier, file_url, thumbnail_url, metadata_url, [{'name': 'LAI'}, {'name': 'leaf area index'}, {'name': 'MODIS'}, {'name': 'GLASS'}, {'name': 'global'}, {'name': 'GLCF'}]])  # noqa: E501
 
         return glass_lai_modis_products
 
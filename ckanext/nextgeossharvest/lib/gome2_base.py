@@ -14,12 +14,17 @@ from ckanext.harvest.harvesters.base import HarvesterBase
 from ckanext.harvest.model import HarvestObjectExtra as HOExtra
 from ckanext.harvest.model import HarvestObject
 
+from ckanext.nextgeossharvest.lib.candidates import missing_candidates
+
 
 log = logging.getLogger(__name__)
 
 
 class GOME2Base(HarvesterBase):
 
+    COVERAGES = ['GOME2_O3', 'GOME2_NO2', 'GOME2_SO2', 'GOME2_SO2mass',
+                 'GOME2_TropNO2']
+
     def _create_harvest_object(self, content_dict):
 
         extras = [HOExtra(key='status',
@@ -39,17 +44,18 @@ class GOME2Base(HarvesterBase):
 
     def _create_harvest_objects(self):
         """Create harvest objects for all dates in the date range."""
-        coverages = ['GOME2_O3', 'GOME2_NO2', 'GOME2_SO2', 'GOME2_SO2mass',
-                     'GOME2_TropNO2']
-
         ids = []
 
-        for coverage in coverages:
+        for coverage in self.COVERAGES:
 
-            content_dicts = self._content_dict_generator(coverage)
+            # Filter out the products that were already harvested with one
+            # query before checking the source.
+            content_dicts = missing_candidates(
+                self._content_dict_generator(coverage),
+                identifier=lambda x: x['identifier'])
             ho_ids = [self._create_harvest_object(content_dict)
                       for content_dict in content_dicts
-                      if not self._missing_or_harvested(coverage, content_dict)]  # noqa: E501
+                      if not self._missing_on_source(coverage, content_dict)]  # noqa: E501
             ids.extend(ho_ids)
 
         return ids
@@ -65,15 +71,12 @@ class GOME2Base(HarvesterBase):
                                   'date_string': date_string})
         return content_dicts
 
-    def _missing_or_harvested(self, coverage, content_dict):
+    def _missing_on_source(self, coverage, content_dict):
         """
-        Check if a product is missing on the source server or if it's already
-        been harvested. Return False if neither is the case.
+        Check if a product that hasn't been harvested yet is missing on the
+        source server. Return False if it isn't.
         """
-        if self._was_harvested(content_dict['identifier']):
-            log.debug('{} will not be updated.'.format(content_dict['identifier']))  # noqa: E501
-            return True
-        elif self._is_missing(coverage, content_dict['date_string']):
+        if self._is_missing(coverage, content_dict['date_string']):
             log.debug('{} is missing on the original Data Source so it will not be harvested.'.format(content_dict['identifier']))  # noqa: E501
             return True
         else:
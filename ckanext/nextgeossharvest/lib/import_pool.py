@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ckan import model
+from ckan import plugins as p
+from ckan.model import Session
+
+from ckanext.harvest.interfaces import IHarvester
+from ckanext.harvest.model import HarvestObject
+from ckanext.harvest.queue import fetch_and_import_stages
+
+from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
+
+
+log = logging.getLogger(__name__)
+
+
+# The harvest_object table is used as a work queue. Each worker claims a
+# batch of waiting objects and flags them as being fetched in the same
+# statement. SKIP LOCKED (PostgreSQL 9.5 or later) means that workers never
+# wait for each other's rows. Only the objects of the NextGEOSS harvesters
+# are claimed, as the other harvesters still publish their objects to the
+# fetch queue. RETURNING doesn't keep the order of the subquery, so the
+# claimed objects are sorted again.
+CLAIM_OBJECTS = '''
+    WITH claimed AS (
+        UPDATE harvest_object SET state = 'FETCH'
+        WHERE id IN (
+            SELECT id FROM harvest_object
+            WHERE state = 'WAITING' AND {}
+            AND harvest_source_id IN (
+                SELECT id FROM harvest_source WHERE type IN :source_types)
+            ORDER BY gathered
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, gathered
+    )
+    SELECT id FROM claimed ORDER BY gathered
+'''
+
+JOB_FILTER = 'harvest_job_id = :job_id'
+
+RUNNING_JOBS_FILTER = '''harvest_job_id IN (
+                SELECT id FROM harvest_job WHERE status = 'Running')'''
+
+
+# A worker stops after this many consecutive errors claiming objects, e.g.
+# when the database is unreachable.
+MAX_CLAIM_ERRORS = 5
+
+
+def claim_objects(job_id, limit, source_types):
+    """
+    Claim up to `limit` waiting harvest objects of sources of the given
+    types and return their IDs.
+
+    If `job_id` is None, objects are claimed from all running jobs.
+    """
+    if not source_types:
+        return []
+    params = {'limit': limit, 'source_types': tuple(source_types)}
+    if job_id:
+        statement = text(CLAIM_OBJECTS.format(JOB_FILTER))
+        params['job_id'] = job_id
+    else:
+        statement = text(CLAIM_OBJECTS.format(RUNNING_JOBS_FILTER))
+    object_ids = [row[0] for row in Session.execute(statement, params)]
+    Session.commit()
+    return object_ids
+
+
+def get_harvesters():
+    """Return the harvester plugins keyed by source type."""
+    return {harvester.info()['name']: harvester
+            for harvester in p.PluginImplementations(IHarvester)}
+
+
+def get_source_types(harvesters):
+    """
+    Return the source types of the NextGEOSS harvesters, whose objects are
+    imported by the pool (see NextGEOSSHarvester._get_ids_to_publish()).
+    """
+    return sorted(name for name, harvester in harvesters.items()
+                  if isinstance(harvester, NextGEOSSHarvester))
+
+
+def import_object(object_id, harvesters):
+    """
+    Run the fetch and import stages for a single harvest object.
+
+    Errors that the harvester doesn't handle itself are saved on the
+    object with _save_object_error(), like the errors from the import stage,
+    so they show up in the job report.
+    """
+    obj = HarvestObject.get(object_id)
+    if not obj:
+        log.error('Harvest object does not exist: {}'.format(object_id))
+        return False
+
+    harvester = harvesters.get(obj.source.type)
+    if not harvester:
+        log.error('No harvester could be found for source type {}'
+                  .format(obj.source.type))
+        obj.state = 'ERROR'
+        obj.save()
+        return False
+
+    try:
+        fetch_and_import_stages(harvester, obj)
+    except Exception as e:
+        save_import_error(harvester, object_id, e)
+        return False
+
+    return obj.state == 'COMPLETE'
+
+
+def save_import_error(harvester, object_id, e):
+    """
+    Roll back and save an error that the harvester didn't handle itself on
+    a harvest object.
+    """
+    log.exception('Error importing harvest object {}'.format(object_id))
+    Session.rollback()
+    obj = HarvestObject.get(object_id)
+    harvester._save_object_error('Error importing object {}: {}'
+                                 .format(object_id, e), obj, 'Import')
+    obj.state = 'ERROR'
+    obj.report_status = 'errored'
+    obj.save()
+
+
+def set_report_status(obj):
+    """Set the report status of an imported object."""
+    if obj.current is False:
+        obj.report_status = 'deleted'
+    elif len(Session.query(HarvestObject.id)
+             .filter_by(package_id=obj.package_id)
+             .limit(2).all()) == 2:
+        obj.report_status = 'updated'
+    else:
+        obj.report_status = 'added'
+
+
+def import_objects(harvester, objects):
+    """
+    Run the fetch stage for each object of a batch and the import stage for
+    all the fetched objects at once, with the import_objects() method of the
+    harvester. Return the number of objects imported.
+
+    The states and report statuses are set like fetch_and_import_stages()
+    sets them for a single object.
+    """
+    imported = 0
+    fetched = []
+    for obj in objects:
+        object_id = obj.id
+        try:
+            obj.fetch_started = datetime.utcnow()
+            obj.state = 'FETCH'
+            obj.save()
+            result = harvester.fetch_stage(obj)
+            obj.fetch_finished = datetime.utcnow()
+            if result is True:
+                obj.import_started = datetime.utcnow()
+                obj.state = 'IMPORT'
+                fetched.append(object_id)
+            elif result == 'unchanged':
+                obj.state = 'COMPLETE'
+                obj.report_status = 'not modified'
+                imported += 1
+            else:
+                obj.state = 'ERROR'
+                obj.report_status = 'errored'
+            obj.save()
+        except Exception as e:
+            save_import_error(harvester, object_id, e)
+
+    if not fetched:
+        return imported
+
+    try:
+        results = harvester.import_objects([HarvestObject.get(fetched_id)
+                                            for fetched_id in fetched])
+    except Exception as e:
+        for object_id in fetched:
+            save_import_error(harvester, object_id, e)
+        return imported
+
+    for object_id, result in zip(fetched, results):
+        obj = HarvestObject.get(object_id)
+        obj.import_finished = datetime.utcnow()
+        if not result:
+            obj.state = 'ERROR'
+            obj.report_status = 'errored'
+        else:
+            obj.state = 'COMPLETE'
+            if result == 'unchanged':
+                obj.report_status = 'not modified'
+            else:
+                set_report_status(obj)
+            imported += 1
+        obj.save()
+
+    return imported
+
+
+def import_batch(object_ids, harvesters):
+    """
+    Import a batch of claimed harvest objects and return the number of
+    objects imported.
+
+    The objects of harvesters that can import several objects at once (the
+    ones with an import_objects() method, like ITagEnricher) are imported
+    together. The other objects are imported one at a time.
+    """
+    imported = 0
+    batches = {}
+    for object_id in object_ids:
+        obj = HarvestObject.get(object_id)
+        harvester = harvesters.get(obj.source.type) if obj else None
+        if hasattr(harvester, 'import_objects'):
+            batches.setdefault(obj.source.type, []).append(obj)
+        elif import_object(object_id, harvesters):
+            imported += 1
+
+    for source_type, objects in sorted(batches.items()):
+        imported += import_objects(harvesters[source_type], objects)
+
+    return imported
+
+
+def reset_connections():
+    """
+    Drop the database connections inherited from the parent process.
+
+    Connections can't be shared between processes, so each worker needs to
+    open its own. HTTP connections are not shared either, as each worker
+    has its own copy of the harvesters.
+    """
+    Session.remove()
+    model.meta.engine.dispose()
+
+
+def run_worker(job_id, batch_size, consumer, poll_interval):
+    """Claim and import harvest objects until there are none left."""
+    reset_connections()
+    harvesters = get_harvesters()
+    source_types = get_source_types(harvesters)
+    pid = os.getpid()
+    imported = 0
+    errors = 0
+
+    claim_errors = 0
+    while True:
+        try:
+            object_ids = claim_objects(job_id, batch_size, source_types)
+            claim_errors = 0
+        except Exception:
+            log.exception('Worker {}: error claiming harvest objects'
+                          .format(pid))
+            Session.rollback()
+            claim_errors += 1
+            if claim_errors >= MAX_CLAIM_ERRORS:
+                log.error('Worker {}: giving up after {} errors in a row'
+                          .format(pid, claim_errors))
+                break
+            time.sleep(poll_interval)
+            continue
+
+        if not object_ids:
+            if not consumer:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        batch_imported = import_batch(object_ids, harvesters)
+        imported += batch_imported
+        errors += len(object_ids) - batch_imported
+
+        log.info('Worker {}: {} objects imported, {} errors'
+                 .format(pid, imported, errors))
+
+    log.info('Worker {} finished: {} objects imported, {} errors'
+             .format(pid, imported, errors))
+
+
+class ImportPool(object):
+    """
+    Import the objects of a harvest job with several worker processes.
+
+    Each worker has its own database session and HTTP connections and claims
+    batches of waiting objects from the harvest_object table. In consumer
+    mode, the workers keep claiming objects from all running jobs.
+    """
+
+    def __init__(self, workers=4, batch_size=10, poll_interval=5):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def run(self, job_id=None, consumer=False):
+        if not job_id and not consumer:
+            raise ValueError('A job ID is required outside consumer mode')
+
+        # Make sure that the workers don't inherit open connections.
+        reset_connections()
+
+        processes = []
+        for _ in range(self.workers):
+            process = multiprocessing.Process(target=run_worker,
+                                              args=(job_id,
+                                                    self.batch_size,
+                                                    consumer,
+                                                    self.poll_interval))
+            process.start()
+            processes.append(process)
+
+        for process in processes:
+            process.join()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, select, text
+
+from ckan.model import Session
+
+from ckanext.nextgeossharvest.model import itag_cache_table
+
+
+log = logging.getLogger(__name__)
+
+# Expired entries with the same keys are replaced. Concurrent gather stages
+# may store the same footprint, so the last response wins instead of
+# failing on the primary key.
+UPSERT_RESPONSE = text('''
+    INSERT INTO nextgeoss_itag_cache (key, response, created, last_used)
+    VALUES (:key, :response, :created, :last_used)
+    ON CONFLICT (key) DO UPDATE SET response = EXCLUDED.response,
+    created = EXCLUDED.created, last_used = EXCLUDED.last_used
+''')
+
+
+def canonical_footprint(spatial, precision=4):
+    """
+    Return a canonical WKT representation of a GeoJSON polygon footprint.
+
+    Coordinates are rounded to `precision` decimals, repeated vertices are
+    dropped and the ring is oriented counter-clockwise, starting from its
+    smallest vertex, so that the same footprint always gets the same
+    representation no matter how the source wrote it.
+    """
+    if not isinstance(spatial, dict):
+        spatial = json.loads(spatial)
+    ring = []
+    for coords in spatial['coordinates'][0]:
+        vertex = (round(coords[0], precision), round(coords[1], precision))
+        if not ring or vertex != ring[-1]:
+            ring.append(vertex)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+
+    # Shoelace formula: a negative area means the ring is clockwise.
+    area = sum(x1 * y2 - x2 * y1
+               for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+    if area < 0:
+        ring.reverse()
+    start = ring.index(min(ring))
+    ring = ring[start:] + ring[:start] + [ring[start]]
+
+    vertices = ', '.join('{0:.{2}f} {1:.{2}f}'.format(x, y, precision)
+                         for x, y in ring)
+    return 'POLYGON (({}))'.format(vertices)
+
+
+def cache_key(spatial, taggers, precision=4):
+    """Return the cache key for a footprint and a list of taggers."""
+    footprint = canonical_footprint(spatial, precision)
+    return hashlib.sha1('{}|{}'.format(taggers, footprint)).hexdigest()
+
+
+class ITagCache(object):
+    """
+    Persistent cache of iTag responses.
+
+    Entries expire `ttl_days` after they were created and only the
+    `max_entries` most recently used entries are kept.
+    """
+
+    def __init__(self, ttl_days=30, max_entries=100000):
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+
+    def get_many(self, keys):
+        """Return a dictionary of the cached responses for a list of keys."""
+        keys = list(set(keys))
+        if not keys:
+            return {}
+        now = datetime.utcnow()
+        table = itag_cache_table
+        query = select([table.c.key, table.c.response]) \
+            .where(and_(table.c.key.in_(keys),
+                        table.c.created > now - self.ttl))
+        responses = dict(Session.execute(query).fetchall())
+
+        if responses:
+            Session.execute(table.update()
+                            .where(table.c.key.in_(list(responses)))
+                            .values(last_used=now))
+            Session.commit()
+        log.debug('iTag cache: {} hits, {} misses'
+                  .format(len(responses), len(keys) - len(responses)))
+
+        return responses
+
+    def put_many(self, responses):
+        """Store a dictionary of responses by key."""
+        if not responses:
+            return
+        now = datetime.utcnow()
+        Session.execute(UPSERT_RESPONSE,
+                        [{'key': key, 'response': response,
+                          'created': now, 'last_used': now}
+                         for key, response in responses.items()])
+        Session.commit()
+
+    def evict(self):
+        """Delete the expired entries and the least recently used ones."""
+        now = datetime.utcnow()
+        table = itag_cache_table
+        Session.execute(table.delete()
+                        .where(table.c.created <= now - self.ttl))
+        # Keep the max_entries most recently used entries.
+        cutoff = Session.execute(select([table.c.last_used])
+                                 .order_by(table.c.last_used.desc())
+                                 .offset(self.max_entries)
+                                 .limit(1)).scalar()
+        if cutoff:
+            Session.execute(table.delete()
+                            .where(table.c.last_used <= cutoff))
+        Session.commit()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Local alternative to iTag.
+
+LocalTagger tags footprints with the continents, countries, regions,
+rivers and land cover classes that they intersect, using reference polygon
+datasets stored as GeoJSON files in a local directory:
+
+    continents.geojson  features with a `name` property
+    countries.geojson   features with `name` and `continent` properties
+    regions.geojson     features with `name` and `country` properties
+    rivers.geojson      features with a `name` property
+    landcover.geojson   features with a `name` property (the class)
+
+Missing files are skipped. The output has the same shape as iTag's
+responses, so it can be used by ITagEnricher without any other changes.
+"""
+
+import json
+import logging
+import os
+import threading
+
+from shapely.geometry import shape
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from ckanext.nextgeossharvest.lib.footprint import to_geometry
+
+
+log = logging.getLogger(__name__)
+
+LAYERS = ['continents', 'countries', 'regions', 'rivers', 'landcover']
+
+# Taggers are loaded once per process and reference directory.
+taggers = {}
+taggers_lock = threading.Lock()
+
+
+def get_tagger(reference_dir):
+    """Return the LocalTagger for a reference directory."""
+    with taggers_lock:
+        if reference_dir not in taggers:
+            taggers[reference_dir] = LocalTagger(reference_dir)
+        return taggers[reference_dir]
+
+
+class ReferenceLayer(object):
+    """
+    The features of a reference dataset in an STRtree spatial index.
+
+    The geometries are prepared when they're first matched, as the same
+    geometries are tested against many footprints. The tree returns
+    geometries, so the features are looked up by the WKB of their geometry
+    (several features may share the same geometry).
+    """
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            collection = json.load(f)
+
+        self.geometries = []
+        self.properties = []
+        self.indexes = {}
+        for feature in collection['features']:
+            if not feature.get('geometry'):
+                continue
+            geometry = shape(feature['geometry'])
+            if geometry.is_empty:
+                continue
+            self.indexes.setdefault(geometry.wkb, []).append(
+                len(self.geometries))
+            self.geometries.append(geometry)
+            self.properties.append(feature.get('properties') or {})
+        self.tree = STRtree(self.geometries) if self.geometries else None
+        self.prepared = {}
+        self.lock = threading.Lock()
+
+    def _prepared(self, index):
+        prepared = self.prepared.get(index)
+        if prepared is None:
+            with self.lock:
+                prepared = self.prepared.setdefault(
+                    index, prep(self.geometries[index]))
+        return prepared
+
+    def intersecting(self, footprint):
+        """
+        Return a list of (properties, geometry) tuples for the features that
+        intersect the footprint.
+        """
+        matches = []
+        if self.tree is None:
+            return matches
+        seen = set()
+        for geometry in self.tree.query(footprint):
+            wkb = geometry.wkb
+            if wkb in seen:
+                continue
+            seen.add(wkb)
+            for index in self.indexes[wkb]:
+                if self._prepared(index).intersects(footprint):
+                    matches.append((self.properties[index],
+                                    self.geometries[index]))
+        return matches
+
+
+class LocalTagger(object):
+
+    def __init__(self, reference_dir):
+        self.layers = {}
+        for name in LAYERS:
+            path = os.path.join(reference_dir, '{}.geojson'.format(name))
+            if os.path.exists(path):
+                log.debug('Loading reference layer {}'.format(path))
+                self.layers[name] = ReferenceLayer(path)
+            else:
+                log.warning('Missing reference layer {}'.format(path))
+
+    def _names(self, layer, footprint):
+        if layer not in self.layers:
+            return []
+        return [properties for properties, _
+                in self.layers[layer].intersecting(footprint)
+                if properties.get('name')]
+
+    def _political(self, footprint):
+        """
+        Return the continents, countries and regions as a tree.
+
+        Countries and regions whose parent wasn't matched are grouped under
+        an entry without a name, so that they still become tags.
+        """
+        regions = {}
+        for properties in self._names('regions', footprint):
+            regions.setdefault(properties.get('country'), []).append(
+                {'name': properties['name']})
+
+        countries = {}
+        for properties in self._names('countries', footprint):
+            countries.setdefault(properties.get('continent'), []).append(
+                {'name': properties['name'],
+                 'regions': regions.pop(properties['name'], [])})
+
+        continents = [{'name': properties['name'],
+                       'countries': countries.pop(properties['name'], [])}
+                      for properties in self._names('continents', footprint)]
+
+        orphans = [country for country_list in countries.values()
+                   for country in country_list]
+        orphan_regions = [region for region_list in regions.values()
+                          for region in region_list]
+        if orphan_regions:
+            orphans.append({'regions': orphan_regions})
+        if orphans:
+            continents.append({'countries': orphans})
+
+        return {'continents': continents}
+
+    def _land_cover(self, footprint):
+        """
+        Return the share of the footprint covered by each land cover class,
+        as a percentage.
+        """
+        if 'landcover' not in self.layers or not footprint.area:
+            return {'landUse': []}
+
+        areas = {}
+        for properties, geometry in self.layers['landcover'].intersecting(footprint):  # noqa: E501
+            name = properties.get('name')
+            if name:
+                area = geometry.intersection(footprint).area
+                areas[name] = areas.get(name, 0) + area
+
+        land_use = [{'name': land_class,
+                     'pcover': round(100 * class_area / footprint.area, 2)}
+                    for land_class, class_area in areas.items()]
+        land_use.sort(key=lambda x: x['pcover'], reverse=True)
+
+        return {'landUse': land_use}
+
+    def tag(self, spatial):
+        """
+        Return the tags for a GeoJSON footprint in iTag's format.
+
+        Footprints that cross the antimeridian are split first, as in
+        simplify_footprint(), so that they don't match everything in between.
+        """
+        footprint = to_geometry(spatial)
+        if not footprint.is_valid:
+            footprint = footprint.buffer(0)
+
+        rivers = [{'name': properties['name']}
+                  for properties in self._names('rivers', footprint)]
+
+        return {
+            'content': {
+                'political': self._political(footprint),
+                'hydrology': {'rivers': rivers},
+                'landCover': self._land_cover(footprint),
+            }
+        }
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+def metalink_key(entry_id, updated):
+    """
+    Return the cache key of the metalink of an OpenSearch entry.
+
+    The key includes the entry's `updated` value, so a metalink is fetched
+    again whenever its entry changes.
+    """
+    return hashlib.sha1(u'{}|{}'.format(entry_id, updated)
+                        .encode('utf-8')).hexdigest()
+
+
+class MetalinkCache(object):
+    """
+    On-disk cache of parsed metalinks.
+
+    Each metalink is stored as a JSON file with the list of its files. The
+    entries that haven't been used for `max_age_days` are deleted by
+    evict(), followed by the least recently used ones until the cache is
+    smaller than `max_size_mb`.
+
+    Entries are written to a temporary file and renamed, so the cache can
+    be used by several threads and processes at the same time.
+    """
+
+    def __init__(self, directory, max_age_days=30, max_size_mb=500):
+        self.directory = directory
+        self.max_age = max_age_days * 24 * 3600
+        self.max_size = max_size_mb * 1024 * 1024
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, entry_id, updated):
+        """Return the cached files of a metalink, or None."""
+        path = self._path(metalink_key(entry_id, updated))
+        try:
+            with open(path, 'r') as f:
+                files = json.load(f)
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            log.warning('Ignoring corrupt metalink cache entry {}'
+                        .format(path))
+            return None
+        return files
+
+    def put(self, entry_id, updated, files):
+        """Store the files of a metalink."""
+        path = self._path(metalink_key(entry_id, updated))
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(files, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def evict(self):
+        """Delete the old entries and the least recently used ones."""
+        now = time.time()
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                age = now - stat.st_mtime
+                if not name.endswith('.json'):
+                    # Leftovers of interrupted writes.
+                    if age > 3600:
+                        self._remove(path)
+                elif age > self.max_age:
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+            removed += 1
+        log.debug('Metalink cache: {} entries, {} bytes'
+                  .format(len(entries) - removed, total_size))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import json
 import logging
 import os
+import socket
+import struct
+import time
 import uuid
+from ftplib import all_errors
 from string import Template
-from datetime import datetime
+from datetime import datetime, timedelta
+from urlparse import urlparse
 import requests
 from requests.auth import HTTPBasicAuth
 import requests_ftp
 from requests.exceptions import ConnectTimeout, ReadTimeout
 
+from sqlalchemy import desc, func
 from sqlalchemy.sql import update, bindparam
 import shapely.wkt
 from shapely.errors import ReadingError, WKTReadingError
@@ -25,10 +32,24 @@ from ckan.lib.navl.validators import not_empty
 
 from ckanext.harvest.harvesters.base import HarvesterBase
 
+from ckanext.nextgeossharvest.lib.ftp import get_pool, pipelined_sizes
+
 
 log = logging.getLogger(__name__)
 
 
+def dataset_lock_key(name):
+    """
+    Return a stable signed 64-bit advisory lock key for a dataset name.
+
+    Python's hash() is not guaranteed to be the same across processes and
+    platforms, so we use the first eight bytes of the MD5 digest instead.
+    """
+    if isinstance(name, unicode):  # noqa: F821
+        name = name.encode('utf-8')
+    return struct.unpack('>q', hashlib.md5(name).digest()[:8])[0]
+
+
 class NextGEOSSHarvester(HarvesterBase):
     """
     Base class for all NextGEOSS harvesters including helper methods and
@@ -101,6 +122,99 @@ class NextGEOSSHarvester(HarvesterBase):
         harvest_object.current = True
         harvest_object.save()
 
+    def _get_imported_harvest_objects_by_source(self, source_id):
+        """Return a query for the objects of a source that were imported."""
+        from ckanext.harvest.model import HarvestObject
+        return Session.query(HarvestObject).filter(
+            HarvestObject.harvest_source_id == source_id,
+            HarvestObject.import_finished != None)  # noqa: E711
+
+    def _get_ids_to_publish(self, ids):
+        """
+        Return the IDs of the gathered objects that the gather consumer
+        publishes to the fetch queue.
+
+        If `ckanext.nextgeossharvest.import_pool` is true, the objects are
+        only imported by the import pool, so none are published and a fetch
+        consumer can never fetch or import an object a second time.
+        """
+        if p.toolkit.asbool(config.get('ckanext.nextgeossharvest.import_pool',
+                                       False)):
+            log.info('{} objects left for the import pool'.format(len(ids)))
+            return []
+        return ids
+
+    def _get_restart_day(self, source_id, key):
+        """
+        Return the day (as stored in the `key` extra of the objects) from
+        which a source resumes harvesting, or None.
+
+        If the previous job of the source was interrupted, i.e. some of its
+        objects are still waiting to be fetched or imported, it's the
+        earliest of their days, so a job that covered several days resumes
+        where it stopped. Otherwise it's the last day that was imported.
+        Objects that failed (state ERROR) aren't retried, so they don't hold
+        back the following jobs.
+        """
+        from ckanext.harvest.model import HarvestJob, HarvestObject
+        from ckanext.harvest.model import HarvestObjectExtra as HOExtra
+        previous_job_id = Session.query(HarvestJob.id).filter(
+            HarvestJob.source_id == source_id,
+            HarvestJob.id != self.job.id) \
+            .order_by(desc(HarvestJob.created)).limit(1).scalar()
+        if previous_job_id is not None:
+            unfinished_day = Session.query(func.min(HOExtra.value)) \
+                .join(HarvestObject,
+                      HarvestObject.id == HOExtra.harvest_object_id) \
+                .filter(HOExtra.key == key,
+                        HarvestObject.harvest_job_id == previous_job_id,
+                        HarvestObject.state.in_(['WAITING', 'FETCH',
+                                                 'IMPORT'])) \
+                .scalar()
+            if unfinished_day is not None:
+                return unfinished_day
+        return self._get_imported_harvest_objects_by_source(source_id) \
+            .join(HOExtra, HarvestObject.id == HOExtra.harvest_object_id) \
+            .filter(HOExtra.key == key) \
+            .with_entities(func.max(HOExtra.value)).scalar()
+
+    def _get_catch_up_end_date(self, start_date, end_date, objects_per_day):
+        """
+        Return the end of the window of a catch-up job that starts on
+        start_date.
+
+        The window covers as many days of the backlog up to end_date as fit
+        in `max_objects_per_job` objects, and at least one day. If the number
+        of objects per day isn't known, it's one day.
+        """
+        if objects_per_day is None:
+            days = 1
+        else:
+            max_objects = self.source_config.get('max_objects_per_job', 1000)
+            days = max(1, max_objects // max(1, objects_per_day))
+        return max(start_date + timedelta(days=1),
+                   min(end_date, start_date + timedelta(days=days)))
+
+    def _get_imported_guids(self, source_id, guids, chunk_size=1000):
+        """
+        Return the set of guids from a list that objects of the source have
+        already imported.
+
+        Only the guid column is queried, `chunk_size` guids at a time, which
+        uses the index on harvest_object (harvest_source_id, guid).
+        """
+        from ckanext.harvest.model import HarvestObject
+        guids = list(guids)
+        imported = set()
+        for i in range(0, len(guids), chunk_size):
+            chunk = guids[i:i + chunk_size]
+            query = Session.query(HarvestObject.guid).filter(
+                HarvestObject.harvest_source_id == source_id,
+                HarvestObject.import_finished != None,  # noqa: E711
+                HarvestObject.guid.in_(chunk))
+            imported.update(guid for guid, in query)
+        return imported
+
     def _create_package_dict(self, parsed_content):
         """
         Create a package dictionary using the parsed content.
@@ -117,11 +231,52 @@ class NextGEOSSHarvester(HarvesterBase):
         package_dict['private'] = self.source_config.get('make_private', False)
         return package_dict
 
+    def _lock_dataset_name(self, name):
+        """
+        Take a transaction-level Postgres advisory lock keyed by a hash of
+        the dataset name.
+
+        The lock is released when the transaction that creates or updates
+        the dataset is committed (or rolled back), so mirror harvesters that
+        import the same product at the same time (e.g. SciHub, NOA and
+        CODE-DE) are serialized per product instead of racing each other.
+        Other databases (e.g. SQLite) don't support advisory locks, so we
+        skip the lock there.
+        """
+        if Session.bind.dialect.name != 'postgresql':
+            return
+        Session.execute('SELECT pg_advisory_xact_lock(:key)',
+                        {'key': dataset_lock_key(name)})
+
     def _create_or_update_dataset(self, harvest_object, status):
         """
         Create a data dictionary and then create or update a dataset.
+
+        The dataset name is locked before we check whether the dataset
+        exists, so if another harvester created it in the meantime we extend
+        the existing dataset instead of failing on the name and retrying.
         """
         parsed_content = self._parse_content(harvest_object.content)
+        name = parsed_content['name']
+
+        # Serialize concurrent imports of the same product and check if it
+        # exists only once we hold the lock. This has to happen before the
+        # package dict is created, as the resources of an existing dataset
+        # are merged with the new ones.
+        self._lock_dataset_name(name)
+        old_dataset = Session.query(Package) \
+            .filter(Package.name == name).first()
+        if old_dataset:
+            if status == 'new':
+                log.debug('{} was created by another harvester, extending it'
+                          .format(name))
+            # Don't save the harvest object here, as committing would
+            # release the lock. It's saved in _refresh_harvest_objects().
+            harvest_object.package = old_dataset
+            status = 'change'
+        else:
+            status = 'new'
+
         package_dict = self._create_package_dict(parsed_content)
 
         # Add the harvester ID to the extras so that CKAN can find the
@@ -135,7 +290,6 @@ class NextGEOSSHarvester(HarvesterBase):
         # extras. Do not change resources from other harvesters unless forced.
         if status == 'change':
             log.debug('Updating {}'.format(package_dict['name']))
-            old_dataset = harvest_object.package
             old_pkg_dict = self._get_package_dict(old_dataset)
             package_dict['id'] = old_dataset.id
             package_dict['owner_org'] = old_dataset.owner_org
@@ -145,7 +299,7 @@ class NextGEOSSHarvester(HarvesterBase):
                                                          package_dict['extras'])  # noqa: E501
             package_schema = logic.schema.default_update_package_schema()
             action = 'package_update'
-        elif status == 'new':
+        else:
             log.debug('Creating new dataset for {}'
                       .format(package_dict['name']))
             # Tags, extras, and resources are all new, so we add whatever we
@@ -175,28 +329,16 @@ class NextGEOSSHarvester(HarvesterBase):
         # IMPROVE: I think ckan.logic.ValidationError is the only Exception we
         # really need to worry about. #########################################
         except Exception as e:
-            print e
-            # Name/URL already in use may just mean that another harvester
-            # created the dataset in the meantime. Retry with status 'change'.
+            # Release the lock and discard the failed transaction.
+            Session.rollback()
             if status == 'new':
-                # Check if there's an existing package now
-                old_package = Session.query(Package) \
-                    .filter(Package.name == package_dict['name']).first()
-                if old_package:
-                    harvest_object.package = old_package
-                    harvest_object.save()
-                    return self._create_or_update_dataset(harvest_object,
-                                                          'change')
-                else:
-                    self._save_object_error('Creation error for {}: {}'
-                                            .format(package_dict['name'], e.message),  # noqa: E501
-                                            harvest_object, 'Import')
-                    return None
+                message = 'Creation error for {}: {}'
             else:
-                self._save_object_error('Error updating {}: {}'
-                                        .format(package_dict['name'], e.message),  # noqa: E501
-                                        harvest_object, 'Import')
-                return None
+                message = 'Error updating {}: {}'
+            self._save_object_error(message.format(package_dict['name'],
+                                                   e.message),
+                                    harvest_object, 'Import')
+            return None
 
         return package
 
@@ -354,6 +496,64 @@ class NextGEOSSHarvester(HarvesterBase):
                                                      status_code, elapsed))
         return size
 
+    def _crawl_urls_ftp_batch(self, urls, provider):
+        """
+        Check if files are present on FTP servers and return a dictionary of
+        their sizes by URL (None if a file is missing).
+
+        The URLs are grouped by host and checked over one logged-in session
+        per host, with the SIZE commands pipelined. The latency of each host
+        is logged once.
+        """
+        # Bypass the real method for testing, like _crawl_urls_ftp().
+        test_ftp_status = self.source_config.get('test_ftp_status')
+        if test_ftp_status == 'ok':
+            return {url: 10000 for url in urls}
+        elif test_ftp_status == 'error':
+            return {url: None for url in urls}
+
+        timeout = self.source_config['timeout']
+        username = self.source_config['username']
+        password = self.source_config['password']
+
+        urls_by_host = {}
+        for url in urls:
+            urls_by_host.setdefault(urlparse(url).netloc, []).append(url)
+
+        sizes = {}
+        log_message = '{:<12} | {} | {} | {}s'
+        for host, host_urls in urls_by_host.items():
+            timestamp = str(datetime.utcnow())
+            start = time.time()
+            results = []
+            try:
+                pool = get_pool(host, username, password, timeout=timeout)
+                with pool.connection() as ftp:
+                    results = pipelined_sizes(ftp, [urlparse(url).path
+                                                    for url in host_urls])
+                status_code = 213
+                elapsed = round(time.time() - start, 3)
+            except socket.timeout as e:
+                self._save_gather_error('Request timed out: {}'.format(e), self.job)  # noqa: E501
+                status_code = 408
+                elapsed = 9999
+            except all_errors as e:
+                self._save_gather_error('FTP error on {}: {}'.format(host, e), self.job)  # noqa: E501
+                status_code = str(e)[:3] if str(e)[:3].isdigit() else 421
+                elapsed = 9999
+
+            for url in host_urls:
+                sizes[url] = None
+            for url, (size, reply) in zip(host_urls, results):
+                sizes[url] = size
+                if size is None:
+                    self._save_gather_error(
+                        '{} error: {}'.format(reply[:3], reply[4:]), self.job)
+
+            self.provider_logger.info(log_message.format(provider, timestamp,
+                                                         status_code, elapsed))  # noqa: E501
+        return sizes
+
     def import_stage(self, harvest_object):
         log = logging.getLogger(__name__ + '.import')
         log.debug('Import stage for harvest object with GUID {}'
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import ast
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ckan.lib import search
+from ckan.model import Session
+
+from ckanext.nextgeossharvest.model import NOA_EXPIRATION_DATE
+from ckanext.nextgeossharvest.model import NOA_RESOURCE_TYPES
+
+
+log = logging.getLogger(__name__)
+
+
+# Uses the idx_resource_noa_expiration_date index (see model.py).
+EXPIRED_RESOURCES = '''
+    SELECT package_id, id FROM resource
+    WHERE state = 'active' AND resource_type IN {}
+    AND {} < :today
+    ORDER BY package_id
+'''.format(NOA_RESOURCE_TYPES, NOA_EXPIRATION_DATE)
+
+DELETE_RESOURCES = text('''
+    UPDATE resource SET state = 'deleted', last_modified = :now
+    WHERE id IN :resource_ids
+''')
+
+# _get_resources() sorts the resources of a dataset by their order, so the
+# remaining resources are renumbered in the same order.
+REORDER_RESOURCES = text('''
+    UPDATE resource SET position = ordered.position
+    FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY package_id
+            ORDER BY (NULLIF(extras, '')::json->>'order')::int, position
+        ) - 1 AS position
+        FROM resource
+        WHERE state = 'active' AND package_id IN :package_ids
+    ) ordered
+    WHERE resource.id = ordered.id
+    AND resource.position IS DISTINCT FROM ordered.position
+''')
+
+DELETE_EXTRAS = text('''
+    UPDATE package_extra SET state = 'deleted'
+    WHERE state = 'active' AND key LIKE 'noa\\_%'
+    AND package_id IN :package_ids
+''')
+
+DATASET_EXTRAS = text('''
+    SELECT id, value FROM package_extra
+    WHERE state = 'active' AND key = 'dataset_extra'
+    AND package_id IN :package_ids
+''')
+
+UPDATE_DATASET_EXTRA = text('''
+    UPDATE package_extra SET value = :value WHERE id = :id
+''')
+
+TOUCH_PACKAGES = text('''
+    UPDATE package SET metadata_modified = :now
+    WHERE id IN :package_ids
+''')
+
+
+def remove_noa_fields(dataset_extra):
+    """
+    Remove the noa_* fields (and the thumbnail, if it's the NOA thumbnail)
+    from the serialized list of extras created by _get_extras().
+
+    Return None if there's nothing to remove.
+    """
+    try:
+        extras = ast.literal_eval(dataset_extra)
+    except (ValueError, SyntaxError):
+        return None
+
+    noa_thumbnail = None
+    for extra in extras:
+        if extra.get('key') == 'noa_thumbnail':
+            noa_thumbnail = extra.get('value')
+
+    kept = [extra for extra in extras
+            if not extra.get('key', '').startswith('noa_') and
+            not (extra.get('key') == 'thumbnail' and
+                 noa_thumbnail and extra.get('value') == noa_thumbnail)]
+    if len(kept) == len(extras):
+        return None
+    return str(kept)
+
+
+class NOAExpirySweeper(object):
+    """
+    Remove the NOA resources whose links have expired, along with the NOA
+    metadata, from the datasets that have them.
+
+    The expired resources are found with a single query and the datasets
+    are updated in batches directly in the database, with one search index
+    update per batch.
+
+    As the updates bypass the action API, they create no revisions and no
+    activity stream entries: the revision tables keep the NOA resources
+    and extras as they were before the sweep.
+    """
+
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+
+    def find_expired(self, today=None):
+        """Return a dictionary of expired resource IDs by package ID."""
+        today = today or datetime.utcnow().strftime('%Y-%m-%d')
+        expired = {}
+        rows = Session.execute(text(EXPIRED_RESOURCES), {'today': today})
+        for package_id, resource_id in rows:
+            expired.setdefault(package_id, []).append(resource_id)
+        return expired
+
+    def sweep_batch(self, expired):
+        """Update a batch of datasets and reindex them."""
+        now = datetime.utcnow()
+        package_ids = tuple(expired)
+        resource_ids = tuple(resource_id
+                             for resource_ids in expired.values()
+                             for resource_id in resource_ids)
+
+        # psycopg2 adapts tuples to lists of values for the IN clauses.
+        Session.execute(DELETE_RESOURCES, {'resource_ids': resource_ids,
+                                           'now': now})
+        Session.execute(REORDER_RESOURCES, {'package_ids': package_ids})
+        Session.execute(DELETE_EXTRAS, {'package_ids': package_ids})
+        rows = Session.execute(DATASET_EXTRAS, {'package_ids': package_ids})
+        for extra_id, value in rows.fetchall():
+            new_value = remove_noa_fields(value)
+            if new_value is not None:
+                Session.execute(UPDATE_DATASET_EXTRA, {'id': extra_id,
+                                                       'value': new_value})
+        Session.execute(TOUCH_PACKAGES, {'package_ids': package_ids,
+                                         'now': now})
+        Session.commit()
+
+        search.rebuild(package_ids=list(package_ids), defer_commit=True)
+        search.commit()
+
+        return len(resource_ids)
+
+    def run(self, today=None):
+        expired = self.find_expired(today)
+        log.info('Found expired NOA resources in {} datasets'
+                 .format(len(expired)))
+
+        package_ids = sorted(expired)
+        removed = 0
+        for start in range(0, len(package_ids), self.batch_size):
+            batch = {package_id: expired[package_id] for package_id
+                     in package_ids[start:start + self.batch_size]}
+            removed += self.sweep_batch(batch)
+            log.info('Removed {} expired NOA resources from {} datasets'
+                     .format(removed, start + len(batch)))
+
+        return removed
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Decoder for the Sentinel product naming convention.
+
+Product identifiers encode the mission, the unit, the instrument, the
+processing level, the product type, the sensing times, the orbit and a
+product ID. decode_identifier() extracts all of them with a single compiled
+regular expression per mission and the collection info and tags for each
+type of product come from the COLLECTIONS table.
+"""
+
+import re
+
+
+SENTINEL_1 = re.compile(r'''
+    ^(?P<mission>S1)(?P<unit>[AB])_
+    (?P<mode>[A-Z0-9]{2})_
+    (?P<product_type>RAW|SLC|GRD|OCN)(?P<resolution>[FHM_])_
+    (?P<level>[0-2])(?P<product_class>[SA])(?P<polarisation>[A-Z]{2})_
+    (?P<start>\d{8}T\d{6})_(?P<stop>\d{8}T\d{6})_
+    (?P<orbit>\d{6})_(?P<datatake>[0-9A-F]{6})_(?P<product_id>[0-9A-F]{4})
+''', re.VERBOSE | re.IGNORECASE)
+
+# Naming convention used since December 2016.
+SENTINEL_2 = re.compile(r'''
+    ^(?P<mission>S2)(?P<unit>[AB])_
+    (?P<instrument>MSI)(?P<level>L1C|L2A)P?_
+    (?P<start>\d{8}T\d{6})_
+    N(?P<processing_baseline>\d{4})_
+    R(?P<relative_orbit>\d{3})_
+    T(?P<tile>[0-9A-Z]{5})_
+    (?P<product_id>\d{8}T\d{6})
+''', re.VERBOSE | re.IGNORECASE)
+
+# Naming convention used before December 2016.
+SENTINEL_2_LEGACY = re.compile(r'''
+    ^(?P<mission>S2)(?P<unit>[AB])_OPER_PRD_
+    (?P<instrument>MSI)(?P<level>L1C|L2A)P?_
+    (?P<site>[0-9A-Z_]{4})_
+    (?P<product_id>\d{8}T\d{6})_
+    R(?P<relative_orbit>\d{3})_
+    V(?P<start>\d{8}T\d{6})_(?P<stop>\d{8}T\d{6})
+''', re.VERBOSE | re.IGNORECASE)
+
+# The instance ID is only structured like this for stripes (most products).
+SENTINEL_3 = re.compile(r'''
+    ^(?P<mission>S3)(?P<unit>[AB_])_
+    (?P<instrument>[A-Z]{2})_
+    (?P<level>[0-2_])_
+    (?P<product_type>[0-9A-Z_]{6})_
+    (?P<start>\d{8}T\d{6})_(?P<stop>\d{8}T\d{6})_
+    (?P<creation>\d{8}T\d{6})_
+    (?:(?P<duration>\d{4})_(?P<cycle>\d{3})_(?P<relative_orbit>\d{3})_
+       (?P<frame>[0-9_]{4})_
+       (?P<centre>[0-9A-Z]{3})_(?P<platform>[OFDR])_
+       (?P<timeliness>[A-Z_]{2})_(?P<processing_baseline>[0-9A-Z_]{3}))?
+''', re.VERBOSE | re.IGNORECASE)
+
+PATTERNS = {
+    'S1': [SENTINEL_1],
+    'S2': [SENTINEL_2, SENTINEL_2_LEGACY],
+    'S3': [SENTINEL_3],
+}
+
+FAMILY_TAGS = {
+    'S1': ['Sentinel-1'],
+    'S2': ['Sentinel-2', 'MSI'],
+    'S3': ['Sentinel-3'],
+}
+
+SRAL_DESCRIPTION = 'SENTINEL-3 is the first Earth Observation Altimetry mission to provide 100% SAR altimetry coverage where LRM is maintained as a back-up operating mode. '  # noqa: E501
+OLCI_L1_DESCRIPTION = 'SENTINEL-3 OLCI Level-1 product provides radiances for each pixel in the instrument grid, each view and each OLCI channel, plus annotation data associated to OLCI pixels. The output of this product is during EO processing mode for {}.'  # noqa: E501
+OLCI_L2_DESCRIPTION = 'SENTINEL-3 OLCI level-2 land product provides land and atmospheric geophysical parameters computed for {}.'  # noqa: E501
+
+# Collection info and product tags keyed by mission and product key (see
+# _product_key()).
+COLLECTIONS = {
+    ('S1', 'SLC'): {
+        'collection_id': 'SENTINEL1_L1_SLC',
+        'collection_name': 'Sentinel-1 Level-1 (SLC)',
+        'collection_description': 'The Sentinel-1 Level-1 Single Look Complex (SLC) products consist of focused SAR data geo-referenced using orbit and attitude data from the satellite and provided in zero-Doppler slant-range geometry. The products include a single look in each dimension using the full TX signal bandwidth and consist of complex samples preserving the phase information.',  # noqa: E501
+        'tags': ['SLC'],
+    },
+    ('S1', 'GRD'): {
+        'collection_id': 'SENTINEL1_L1_GRD',
+        'collection_name': 'Sentinel-1 Level-1 (GRD)',
+        'collection_description': 'The Sentinel-1 Level-1 Ground Range Detected (GRD) products consist of focused SAR data that has been detected, multi-looked and projected to ground range using an Earth ellipsoid model. Phase information is lost. The resulting product has approximately square resolution pixels and square pixel spacing with reduced speckle at the cost of reduced geometric resolution.',  # noqa: E501
+        'tags': ['GRD'],
+    },
+    ('S1', 'OCN'): {
+        'collection_id': 'SENTINEL1_L2_OCN',
+        'collection_name': 'Sentinel-1 Level-2 (OCN)',
+        'collection_description': 'The Sentinel-1 Level-2 OCN products include components for Ocean Swell spectra (OSW) providing continuity with ERS and ASAR WV and two new components: Ocean Wind Fields (OWI) and Surface Radial Velocities (RVL). The OSW is a two-dimensional ocean surface swell spectrum and includes an estimate of the wind speed and direction per swell spectrum. The OWI is a ground range gridded estimate of the surface wind speed and direction at 10 m above the surface derived from internally generated Level-1 GRD images of SM, IW or EW modes. The RVL is a ground range gridded difference between the measured Level-2 Doppler grid and the Level-1 calculated geometrical Doppler.',  # noqa: E501
+        'tags': ['OCN'],
+    },
+    ('S1', 'RAW'): {
+        'collection_id': 'SENTINEL1_L0_RAW',
+        'collection_name': 'Sentinel-1 Level-0 (RAW)',
+        'collection_description': 'The Sentinel-1 Level-0 products consist of the sequence of Flexible Dynamic Block Adaptive Quantization (FDBAQ) compressed unfocused SAR raw data. For the data to be usable, it will need to be decompressed and processed using focusing software.',  # noqa: E501
+        'tags': ['RAW'],
+    },
+    ('S2', 'L1C'): {
+        'collection_id': 'SENTINEL2_L1C',
+        'collection_name': 'Sentinel-2 Level-1C',
+        'collection_description': u'The Sentinel-2 Level-1C products are Top-of-atmosphere reflectances in cartographic geometry. These products are systematically generated and the data volume is 500MB for each 100x100 km².',  # noqa: E501
+        'tags': ['Level-1C'],
+    },
+    ('S2', 'L2A'): {
+        'collection_id': 'SENTINEL2_L2A',
+        'collection_name': 'Sentinel-2 Level-2A',
+        'collection_description': u'The Sentinel-2 Level-2A products are Bottom-of-atmosphere reflectances in cartographic geometry (prototype product). These products are generated using Sentinel-2 Toolbox and the data volume is 600MB for each 100x100 km².',  # noqa: E501
+        'tags': ['Level-2A'],
+    },
+    ('S3', 'OL_EFR'): {
+        'collection_id': 'SENTINEL3_OLCI_L1_EFR',
+        'collection_name': 'Sentinel-3 OLCI Level-1 Full Resolution',
+        'collection_description': OLCI_L1_DESCRIPTION.format('Full Resolution'),  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'OL_ERR'): {
+        'collection_id': 'SENTINEL3_OLCI_L1_ERR',
+        'collection_name': 'Sentinel-3 OLCI Level-1 Reduced Resolution',
+        'collection_description': OLCI_L1_DESCRIPTION.format('Reduced Resolution'),  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'OL_LFR'): {
+        'collection_id': 'SENTINEL3_OLCI_L2_LFR',
+        'collection_name': 'Sentinel-3 OLCI Level-2 Land Full Resolution',
+        'collection_description': OLCI_L2_DESCRIPTION.format('full Resolution'),  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'OL_LRR'): {
+        'collection_id': 'SENTINEL3_OLCI_L2_LRR',
+        'collection_name': 'Sentinel-3 OLCI Level-2 Land Reduced Resolution',
+        'collection_description': OLCI_L2_DESCRIPTION.format('reduced Resolution'),  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'SL_RBT'): {
+        'collection_id': 'SENTINEL3_SLSTR_L1_RBT',
+        'collection_name': 'Sentinel-3 SLSTR Level-1 Radiances and Brightness Temperatures',  # noqa: E501
+        'collection_description': 'SENTINEL-3 SLSTR Level-1 product provides radiances and brightness temperatures for each pixel in a regular image grid, each view and each SLSTR channel, plus annotations data associated with SLSTR pixels.',  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'SL_LST'): {
+        'collection_id': 'SENTINEL3_SLSTR_L2_LST',
+        'collection_name': 'Sentinel-3 SLSTR Level-2 Land Surface Temperature',  # noqa: E501
+        'collection_description': 'SENTINEL-3 SLSTR Level-2 LST product provides land surface parameters generated on the wide 1 km measurement grid.',  # noqa: E501
+        'tags': [],
+    },
+    ('S3', 'SR_CAL'): {
+        'collection_id': 'SENTINEL3_SRAL_L1_CAL',
+        'collection_name': 'Sentinel-3 SRAL Level-1 Calibration',
+        'collection_description': SRAL_DESCRIPTION + 'This is a Level 1 Calibration product.',  # noqa: E501
+        'tags': ['Calibration', 'Level-1', 'SAR', 'Altimeter'],
+    },
+    ('S3', 'SR_SRA'): {
+        'collection_id': 'SENTINEL3_SRAL_L1_SRA',
+        'collection_name': 'Sentinel-3 SRAL Level-1 SRA',
+        'collection_description': SRAL_DESCRIPTION + 'This is a Level 1 SRA product.',  # noqa: E501
+        'tags': ['SRA', 'Level-1', 'SAR', 'Altimeter'],
+    },
+    ('S3', 'SR_LAN'): {
+        'collection_id': 'SENTINEL3_SRAL_L2_LAN',
+        'collection_name': 'Sentinel-3 SRAL Level-2 Land',
+        'collection_description': SRAL_DESCRIPTION + 'This is a product of Level 2 processing and geographical coverage over land.',  # noqa: E501
+        'tags': ['Land', 'Level-2', 'SAR', 'Altimeter'],
+    },
+    ('S3', 'SR_WAT'): {
+        'collection_id': 'SENTINEL3_SRAL_L2_WAT',
+        'collection_name': 'Sentinel-3 SRAL Level-2 Water',
+        'collection_description': SRAL_DESCRIPTION + 'This is a product of Level 2 processing and geographical coverage over water.',  # noqa: E501
+        'tags': ['Water', 'Level-2', 'SAR', 'Altimeter'],
+    },
+}
+
+# Used for the products that aren't in COLLECTIONS, e.g. because their
+# identifiers don't follow the naming convention.
+UNKNOWN_COLLECTION = {
+    'collection_id': 'SENTINEL_UNKNOWN',
+    'collection_name': 'Sentinel (unknown product type)',
+    'collection_description': 'Sentinel products whose product type could not be determined from their identifiers.',  # noqa: E501
+    'tags': [],
+}
+
+
+def _relative_orbit_s1(unit, orbit):
+    """Sentinel-1 A and B have a 175-orbit cycle with different offsets."""
+    offset = 73 if unit == 'A' else 27
+    return (orbit - offset) % 175 + 1
+
+
+def _product_key(family, fields):
+    """Return the key of the product's entry in COLLECTIONS."""
+    if family == 'S1':
+        return fields['product_type']
+    elif family == 'S2':
+        return fields['level']
+    else:
+        # e.g. SRA___, SRA_A_ and SRA_BS are all SRAL Level-1 SRA products
+        return '{}_{}'.format(fields['instrument'], fields['product_type'][:3])
+
+
+def decode_identifier(identifier):
+    """
+    Decode a Sentinel product identifier and return a dictionary with its
+    components, or None if it doesn't follow the naming convention.
+
+    The dictionary always contains the family (S1, S2 or S3), mission (e.g.
+    S1A), unit, product key and sensing start time; the orbit, relative
+    orbit and processing baseline are included if the identifier encodes
+    them.
+    """
+    family = identifier[:2].upper()
+    for pattern in PATTERNS.get(family, []):
+        match = pattern.match(identifier)
+        if match:
+            break
+    else:
+        return None
+
+    fields = {key: value.upper() for key, value
+              in match.groupdict().items() if value is not None}
+    product = {
+        'family': family,
+        'mission': fields['mission'] + fields['unit'],
+        'unit': fields['unit'],
+        'instrument': fields.get('instrument'),
+        'level': fields.get('level'),
+        'product_type': fields.get('product_type'),
+        'product_key': _product_key(family, fields),
+        'start': fields['start'],
+        'stop': fields.get('stop'),
+        'product_id': fields.get('product_id'),
+        'orbit': None,
+        'relative_orbit': None,
+        'processing_baseline': None,
+        'tile': fields.get('tile'),
+    }
+
+    if 'orbit' in fields:
+        product['orbit'] = int(fields['orbit'])
+        product['relative_orbit'] = _relative_orbit_s1(fields['unit'],
+                                                       product['orbit'])
+    elif 'relative_orbit' in fields:
+        product['relative_orbit'] = int(fields['relative_orbit'])
+
+    baseline = fields.get('processing_baseline')
+    if baseline and family == 'S2':
+        # N0204 is processing baseline 02.04
+        product['processing_baseline'] = '{}.{}'.format(baseline[:2],
+                                                        baseline[2:])
+    elif baseline:
+        product['processing_baseline'] = baseline
+
+    return product
+
+
+def get_collection(product):
+    """Return the COLLECTIONS entry for a decoded product or None."""
+    if not product:
+        return None
+    return COLLECTIONS.get((product['family'], product['product_key']))
+
+
+def get_tags(identifier, product):
+    """
+    Return the tag names for a product: the mission family tags plus the
+    tags of its collection, if we know it.
+    """
+    family = identifier[:2].upper()
+    tags = list(FAMILY_TAGS.get(family, []))
+    collection = get_collection(product)
+    if collection:
+        tags.extend(collection['tags'])
+    return tags
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Limit the number of requests per second across threads.
+
+    Each call to wait() reserves the next free slot and sleeps until it
+    starts, so requests are spread evenly instead of being sent in bursts.
+    """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
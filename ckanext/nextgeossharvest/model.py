@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from sqlalchemy import Column, Table, text, types
+
+from ckan.model import Session
+from ckan.model import meta
+
+
+log = logging.getLogger(__name__)
+
+
+# Expression that extracts the expiration date from the names of NOA
+# resources, e.g. 'Product Download from NOA (valid until 2018-03-01)'.
+# The queries must use the exact same expression to use the index.
+NOA_EXPIRATION_DATE = "substring(name from 'valid until ([0-9-]{10})')"
+
+NOA_RESOURCE_TYPES = "('noa_product', 'noa_manifest', 'noa_thumbnail')"
+
+# Indexes (name, statement) that the harvesters rely on.
+INDEXES = [
+    ('idx_resource_noa_expiration_date',
+     '''CREATE INDEX idx_resource_noa_expiration_date
+        ON resource ({})
+        WHERE state = 'active' AND resource_type IN {}'''
+     .format(NOA_EXPIRATION_DATE, NOA_RESOURCE_TYPES)),
+    ('idx_harvest_object_source_guid',
+     '''CREATE INDEX idx_harvest_object_source_guid
+        ON harvest_object (harvest_source_id, guid)'''),
+    ('idx_harvest_object_extra_restart_day',
+     """CREATE INDEX idx_harvest_object_extra_restart_day
+        ON harvest_object_extra (value, harvest_object_id)
+        WHERE key = 'restart_day'"""),
+    ('idx_harvest_object_extra_content_ref',
+     """CREATE INDEX idx_harvest_object_extra_content_ref
+        ON harvest_object_extra (value)
+        WHERE key = 'content_ref'"""),
+]
+
+
+# Responses from iTag keyed by a hash of the canonical footprint and the
+# taggers (see lib/itag_cache.py).
+itag_cache_table = Table(
+    'nextgeoss_itag_cache', meta.metadata,
+    Column('key', types.UnicodeText, primary_key=True),
+    Column('response', types.UnicodeText, nullable=False),
+    Column('created', types.DateTime, nullable=False),
+    Column('last_used', types.DateTime, nullable=False, index=True),
+)
+
+# The last listing of each FTP directory crawled by a harvest source (see
+# lib/ftp_snapshot.py).
+ftp_snapshot_table = Table(
+    'nextgeoss_ftp_snapshot', meta.metadata,
+    Column('source_id', types.UnicodeText, primary_key=True),
+    Column('domain', types.UnicodeText, primary_key=True),
+    Column('path', types.UnicodeText, primary_key=True),
+    Column('entries', types.UnicodeText, nullable=False),
+    Column('listing_hash', types.UnicodeText, nullable=False),
+    Column('dir_modify', types.DateTime),
+    Column('updated', types.DateTime, nullable=False),
+)
+
+# Contents shared by several harvest objects, keyed by their SHA-1 (see
+# lib/content_blob.py).
+content_blob_table = Table(
+    'nextgeoss_content_blob', meta.metadata,
+    Column('key', types.UnicodeText, primary_key=True),
+    Column('content', types.UnicodeText, nullable=False),
+    Column('created', types.DateTime, nullable=False),
+)
+
+TABLES = [
+    itag_cache_table,
+    ftp_snapshot_table,
+    content_blob_table,
+]
+
+
+def index_exists(name):
+    statement = text('SELECT 1 FROM pg_indexes WHERE indexname = :name')
+    return Session.execute(statement, {'name': name}).first() is not None
+
+
+def setup():
+    """
+    Create the tables and indexes used by the NextGEOSS harvesters if
+    needed.
+    """
+    for table in TABLES:
+        if not table.exists(bind=meta.engine):
+            log.info('Creating table {}'.format(table.name))
+            table.create(bind=meta.engine)
+
+    for name, statement in INDEXES:
+        if index_exists(name):
+            log.debug('Index {} already exists'.format(name))
+            continue
+        log.info('Creating index {}'.format(name))
+        Session.execute(statement)
+    Session.commit()
@@ -0,0 +1,37 @@
+"""
+Microbenchmark for CMEMSBase._parse_content().
+
+Parses synthetic harvest object contents of each of the seven CMEMS
+harvester types and prints the objects per second. Run it with:
+
+    python -m ckanext.nextgeossharvest.tests.benchmark_cmems_parser
+"""
+
+import timeit
+
+from ckanext.nextgeossharvest.lib.cmems_base import CMEMSBase
+from ckanext.nextgeossharvest.tests.cmems_contents import IDENTIFIERS
+from ckanext.nextgeossharvest.tests.cmems_contents import make_contents
+
+
+REPEAT = 5
+
+
+def objects_per_second(harvester, contents):
+    seconds = timeit.timeit(
+        lambda: [harvester._parse_content(content) for content in contents],
+        number=REPEAT)
+    return len(contents) * REPEAT / seconds
+
+
+def main():
+    for harvester_type in sorted(IDENTIFIERS):
+        harvester = CMEMSBase()
+        harvester.source_config = {'harvester_type': harvester_type}
+        contents = make_contents(harvester_type)
+        print '{:<10} {:>10.0f} objects/s'.format(
+            harvester_type, objects_per_second(harvester, contents))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Microbenchmark for the Sentinel entry parsers in esa_base.py.
+
+Compares the entries per second of the original BeautifulSoup parser and
+the lxml parser on the entries of the test feeds. Run it with:
+
+    python -m ckanext.nextgeossharvest.tests.benchmark_esa_parser
+"""
+
+import timeit
+
+from ckanext.nextgeossharvest.lib.esa_base import SentinelHarvester
+from ckanext.nextgeossharvest.tests.esa_soup_parser import extract_entry_soup
+from ckanext.nextgeossharvest.tests.esa_soup_parser import load_entries
+
+
+FEEDS = [
+    ('feeds/sentinel-1-results-feed.xml', 'entry'),
+    ('l2a_500_entries.xml', 'atom:entry'),
+]
+
+REPEAT = 20
+
+
+def entries_per_second(parse, entries):
+    seconds = timeit.timeit(lambda: [parse(entry) for entry in entries],
+                            number=REPEAT)
+    return len(entries) * REPEAT / seconds
+
+
+def main():
+    harvester = SentinelHarvester()
+    for path, tag in FEEDS:
+        entries = load_entries(path, tag)
+        before = entries_per_second(extract_entry_soup, entries)
+        after = entries_per_second(harvester._extract_entry, entries)
+        print '{}: {} entries'.format(path, len(entries))
+        print '    BeautifulSoup: {:>10.0f} entries/s'.format(before)
+        print '    lxml:          {:>10.0f} entries/s ({:.1f}x)'.format(
+            after, after / before)
+
+
+if __name__ == '__main__':
+    main()
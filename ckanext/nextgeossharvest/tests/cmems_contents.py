@@ -0,0 +1,36 @@
+"""
+Synthetic harvest object contents of the CMEMS harvester types, used by
+test_cmems_base.py and benchmark_cmems_parser.py.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+
+IDENTIFIERS = {
+    'sst': '{date:%Y%m%d}120000-UKMO-L4_GHRSST-SSTfnd-OSTIA-GLOB',
+    'sic_north': 'ice_conc_nh_ease-125_multi_{date:%Y%m%d}1200',
+    'sic_south': 'ice_conc_sh_ease-125_multi_{date:%Y%m%d}1200',
+    'ocn': '{forecast:%Y%m%d}_dm-metno-MODEL-topaz4-ARC-b{date:%Y%m%d}',
+    'slv': 'nrt_global_allsat_phy_l4_{forecast:%Y%m%d}_{date:%Y%m%d}',
+    'gpaf': 'mercatorpsy4v3r1_gl12_hrly_{forecast:%Y%m%d}_R{date:%Y%m%d}',
+    'mog': 'dataset-uv-nrt-hourly_{forecast:%Y%m%d}T0000Z_P{date:%Y%m%d}T0000Z',  # noqa: E501
+}
+
+
+def make_contents(harvester_type, days=365):
+    """Return the contents of the harvest objects of a year of products."""
+    contents = []
+    for i in range(days):
+        date = datetime(2018, 1, 1) + timedelta(days=i)
+        forecast = date + timedelta(days=i % 10 - 1)
+        identifier = IDENTIFIERS[harvester_type].format(date=date,
+                                                        forecast=forecast)
+        contents.append(json.dumps({
+            'identifier': identifier,
+            'ftp_link': 'ftp://example.com/{}.nc'.format(identifier),
+            'size': 1024,
+            'start_date': date,
+            'forecast_date': forecast if harvester_type == 'ocn' else None,
+        }, default=str))
+    return contents
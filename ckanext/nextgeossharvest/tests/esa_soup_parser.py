@@ -0,0 +1,69 @@
+"""
+The original BeautifulSoup parser of the Sentinel entries.
+
+SentinelHarvester._extract_entry() replaced it with lxml. It's much
+slower, so it's only kept here, to check that both parsers return the
+same dictionary and to compare their speed (see benchmark_esa_parser.py).
+"""
+
+import os
+
+from bs4 import BeautifulSoup as Soup
+
+from ckanext.nextgeossharvest.lib.esa_base import NAME_ELEMENTS
+from ckanext.nextgeossharvest.lib.esa_base import NORMALIZED_NAMES
+
+
+def load_entries(path, tag):
+    """Return the entries of a feed serialized like the ESA harvester."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(directory, path), 'r') as f:
+        soup = Soup(f, 'lxml')
+    return [entry.encode() for entry in soup.find_all(tag)]
+
+
+def normalize_names(item_node):
+    """
+    Return a dictionary of metadata fields with normalized names.
+
+    The Sentinel entries are composed of metadata elements with names
+    corresponding to the contents of NAME_ELEMENTS and title, link,
+    etc. elements. We can just extract all the metadata elements at
+    once and rename them in one go.
+
+    Note that elements like `ingestiondate`, which are included in the
+    scihub results, will not be added to item as they are not part of the
+    list of elements added in the original version.
+    """
+    item = {}
+
+    for subitem_node in item_node.findChildren():
+        if subitem_node.name in NAME_ELEMENTS:
+            key = NORMALIZED_NAMES.get(subitem_node.get('name'))
+            if key:
+                item[key] = subitem_node.text
+
+    return item
+
+
+def extract_entry_soup(content):
+    """
+    Return the same dictionary as SentinelHarvester._extract_entry() using
+    BeautifulSoup.
+    """
+    soup = Soup(content, 'lxml')
+
+    entry = normalize_names(soup)
+
+    enclosure = soup.find('link', rel=None)
+    alternative = soup.find('link', rel='alternative')
+    thumbnail = soup.find('link', rel='icon')
+    ingestion_date = soup.find('date', {'name': 'ingestiondate'})
+    summary = soup.find('summary')
+    entry['enclosure'] = enclosure['href'] if enclosure else None
+    entry['alternative'] = alternative['href'] if alternative else None
+    entry['thumbnail'] = thumbnail['href'] if thumbnail else None
+    entry['ingestiondate'] = ingestion_date.text if ingestion_date else None  # noqa: E501
+    entry['summary'] = summary.text if summary else None
+
+    return entry
@@ -0,0 +1,66 @@
+"""Tests for candidates.py."""
+
+from datetime import datetime
+
+import mock
+
+from ckanext.nextgeossharvest.lib import candidates
+from ckanext.nextgeossharvest.lib.candidates import batches
+from ckanext.nextgeossharvest.lib.candidates import expected_dates
+from ckanext.nextgeossharvest.lib.candidates import missing_candidates
+from ckanext.nextgeossharvest.lib.candidates import with_forecasts
+
+
+class TestExpectedDates(object):
+    """Tests for the cadences."""
+
+    def test_daily(self):
+        dates = list(expected_dates(datetime(2018, 2, 27),
+                                    datetime(2018, 3, 2)))
+
+        assert dates == [datetime(2018, 2, 27), datetime(2018, 2, 28),
+                         datetime(2018, 3, 1)]
+
+    def test_eight_day_resets_every_year(self):
+        dates = list(expected_dates(datetime(2015, 12, 1),
+                                    datetime(2016, 1, 10), '8-day'))
+
+        assert [date.strftime('%Y%j') for date in dates] == \
+            ['2015337', '2015345', '2015353', '2015361', '2016001', '2016009']
+
+    def test_eight_day_full_year(self):
+        dates = list(expected_dates(datetime(2001, 1, 1),
+                                    datetime(2002, 1, 1), '8-day'))
+
+        assert len(dates) == 46
+
+    def test_forecasts(self):
+        products = list(with_forecasts([datetime(2018, 1, 1)], range(3)))
+
+        assert products == [(datetime(2018, 1, 1), datetime(2018, 1, 1)),
+                            (datetime(2018, 1, 1), datetime(2018, 1, 2)),
+                            (datetime(2018, 1, 1), datetime(2018, 1, 3))]
+
+
+class TestMissingCandidates(object):
+    """Tests for the missing_candidates() function."""
+
+    @mock.patch.object(candidates, 'existing_names')
+    def test_batches(self, existing_names):
+        existing_names.side_effect = lambda names: {'b', 'e'} & set(names)
+        identifiers = (x for x in ['A', 'B', 'C', 'D', 'E'])
+
+        missing = list(missing_candidates(identifiers, batch_size=2))
+
+        assert missing == ['A', 'C', 'D']
+        assert existing_names.call_count == 3
+
+
+class TestBatches(object):
+    """Tests for the batches() function."""
+
+    def test_batches(self):
+        items = (x for x in range(5))
+
+        assert list(batches(items, 2)) == [[0, 1], [2, 3], [4]]
+        assert list(batches([], 2)) == []
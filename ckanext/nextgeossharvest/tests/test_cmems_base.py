@@ -0,0 +1,57 @@
+"""Tests for cmems_base.py."""
+
+from ckanext.nextgeossharvest.lib.cmems_base import CMEMSBase
+from ckanext.nextgeossharvest.lib.cmems_descriptors import DESCRIPTORS
+from ckanext.nextgeossharvest.tests.cmems_contents import IDENTIFIERS
+from ckanext.nextgeossharvest.tests.cmems_contents import make_contents
+
+
+def parse(harvester_type, day=0):
+    harvester = CMEMSBase()
+    harvester.source_config = {'harvester_type': harvester_type}
+    content = make_contents(harvester_type, days=day + 1)[day]
+    metadata = harvester._parse_content(content)
+    return metadata, harvester._get_resources(metadata)
+
+
+class TestParseContent(object):
+    """Tests for the _parse_content() method."""
+
+    def test_all_types(self):
+        assert set(IDENTIFIERS) == set(DESCRIPTORS)
+        for harvester_type in IDENTIFIERS:
+            metadata, resources = parse(harvester_type)
+
+            assert metadata['name'] == metadata['identifier'].lower()
+            assert metadata['collection_name'] == metadata['title']
+            assert metadata['tags'][0] == {'name': 'CMEMS'}
+            assert metadata['timerange_start'] == metadata['StartTime']
+            assert metadata['timerange_end'] == metadata['StopTime']
+            assert resources[0]['size'] == 1024
+
+    def test_sea_ice(self):
+        metadata, resources = parse('sic_north', day=59)
+
+        assert metadata['StartTime'] == '2018-03-01T00:00:00.000Z'
+        assert metadata['StopTime'] == '2018-03-02T00:00:00.000Z'
+        assert metadata['downloadLinkEase'] == 'ftp://example.com/ice_conc_nh_ease-125_multi_201803011200.nc'  # noqa: E501
+        assert metadata['downloadLinkPolstere'] == 'ftp://mftp.cmems.met.no/Core/SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS/2018/03/ice_conc_nh_polstere-100_multi_201803011200.nc'  # noqa: E501
+        assert metadata['thumbnail'].endswith('&bbox=-180,0,180,90&WIDTH=800&HEIGHT=800&styles=boxfill/rainbow&format=image/png&time=2018-03-01T12:00:00.000Z')  # noqa: E501
+        assert metadata['spatial'] == '{"type":"Polygon", "coordinates":[[[-180, 90], [180, 90], [180, 0], [-180, 0], [-180, 90]]]}'  # noqa: E501
+        assert len(resources) == 3
+
+    def test_forecast(self):
+        metadata, _ = parse('ocn', day=3)
+
+        assert metadata['BulletinDate'] == '2018-01-04'
+        assert metadata['ForecastDate'] == '2018-01-06'
+        assert metadata['thumbnail'].endswith('&time=2018-01-04')
+
+    def test_dates_from_identifier(self):
+        metadata, _ = parse('gpaf', day=3)
+
+        assert metadata['FieldDate'] == '2018-01-06'
+        assert metadata['BulletinDate'] == '2018-01-04'
+        assert metadata['StartTime'] == '2018-01-06T00:30:00.000Z'
+        assert metadata['StopTime'] == '2018-01-06T23:30:00.000Z'
+        assert metadata['thumbnail'].endswith('&time=2018-01-06T00:30:00.000Z/2018-01-06T23:30:00.000Z')  # noqa: E501
@@ -0,0 +1,82 @@
+"""Tests for cmems.py."""
+
+from datetime import datetime
+
+import mock
+
+from ckanext.nextgeossharvest.harvesters.cmems import create_ftp_source
+from ckanext.nextgeossharvest.harvesters.cmems import crawl_sources
+from ckanext.nextgeossharvest.lib.ftp import FtpEntry
+from ckanext.nextgeossharvest.lib.ftp_snapshot import FtpSnapshots
+
+
+class FakePool(object):
+    """Lists directories from a dictionary of file names by path."""
+
+    max_connections = 2
+    domain = 'mftp.cmems.met.no'
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.listed = []
+
+    def list_directory(self, path, kind='file'):
+        if kind == 'dir':
+            return []
+        self.listed.append(path)
+        return [FtpEntry(name, 1024, None)
+                for name in self.listings.get(path, [])]
+
+
+class TestCrawlSources(object):
+    """Tests for the crawl_sources() function."""
+
+    def test_types_on_same_server(self):
+        north = '/Core/SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS'  # noqa: E501
+        south = '/Core/SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/METNO-GLO-SEAICE_CONC-SOUTH-L4-NRT-OBS'  # noqa: E501
+        pool = FakePool({
+            north + '/2018/03': ['ice_conc_nh_ease-125_multi_201803011200.nc',
+                                 'ice_conc_nh_ease-125_multi_201803201200.nc'],  # noqa: E501
+            south + '/2018/02': ['ice_conc_sh_ease-125_multi_201802281200.nc'],  # noqa: E501
+            south + '/2018/03': ['ice_conc_sh_ease-125_multi_201803011200.nc',
+                                 'README.txt'],
+        })
+        ftp_sources = [('sic_north', create_ftp_source('sic_north')),
+                       ('sic_south', create_ftp_source('sic_south'))]
+        date_ranges = {
+            'sic_north': (datetime(2018, 3, 1), datetime(2018, 3, 10)),
+            'sic_south': (datetime(2018, 2, 28), datetime(2018, 3, 10)),
+        }
+
+        ftp_urls = crawl_sources(pool, ftp_sources, date_ranges)
+
+        assert ftp_urls == {
+            'sic_north': {'ftp://mftp.cmems.met.no' + north + '/2018/03/ice_conc_nh_ease-125_multi_201803011200.nc': 1024},  # noqa: E501
+            'sic_south': {'ftp://mftp.cmems.met.no' + south + '/2018/02/ice_conc_sh_ease-125_multi_201802281200.nc': 1024,  # noqa: E501
+                          'ftp://mftp.cmems.met.no' + south + '/2018/03/ice_conc_sh_ease-125_multi_201803011200.nc': 1024},  # noqa: E501
+        }
+        assert sorted(pool.listed) == [north + '/2018/03',
+                                       south + '/2018/02',
+                                       south + '/2018/03']
+
+    def test_snapshots_only_record_harvested_files(self):
+        north = '/Core/SEAICE_GLO_SEAICE_L4_NRT_OBSERVATIONS_011_001/METNO-GLO-SEAICE_CONC-NORTH-L4-NRT-OBS'  # noqa: E501
+        pool = FakePool({
+            north + '/2018/03': ['ice_conc_nh_ease-125_multi_201803011200.nc',
+                                 'ice_conc_nh_ease-125_multi_201803201200.nc'],  # noqa: E501
+        })
+        with mock.patch('ckanext.nextgeossharvest.lib.ftp_snapshot.Session') as session:  # noqa: E501
+            session.execute.return_value = []
+            snapshots = FtpSnapshots('source')
+        date_ranges = {'sic_north': (datetime(2018, 3, 1),
+                                     datetime(2018, 3, 10))}
+
+        ftp_urls = crawl_sources(pool, [('sic_north',
+                                         create_ftp_source('sic_north'))],
+                                 date_ranges, snapshots)
+
+        assert len(ftp_urls['sic_north']) == 1
+        sizes, digest, _ = snapshots.pending[(pool.domain, north + '/2018/03')]
+        # The file of March 20th is listed again by the next gather.
+        assert sizes == {'ice_conc_nh_ease-125_multi_201803011200.nc': 1024}
+        assert digest is None
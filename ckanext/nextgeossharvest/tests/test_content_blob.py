@@ -0,0 +1,83 @@
+"""Tests for content_blob.py."""
+
+from datetime import datetime, timedelta
+
+from ckan import model
+from ckan.model import Session
+import ckan.tests.helpers as helpers
+
+from ckanext.harvest.model import HarvestJob, HarvestObject, HarvestSource
+
+from ckanext.nextgeossharvest import model as nextgeoss_model
+from ckanext.nextgeossharvest.harvesters.probav import PROBAVHarvester
+from ckanext.nextgeossharvest.lib.content_blob import blob_key
+from ckanext.nextgeossharvest.lib.content_blob import delete_unreferenced_blobs  # noqa: E501
+from ckanext.nextgeossharvest.lib.content_blob import get_blob
+from ckanext.nextgeossharvest.lib.content_blob import store_blob
+from ckanext.nextgeossharvest.model import content_blob_table
+
+
+class TestContentBlob(object):
+    """Tests for the content blob functions."""
+
+    def setup(self):
+        helpers.reset_db()
+        nextgeoss_model.setup()
+        Session.execute(content_blob_table.delete())
+        Session.commit()
+        source = HarvestSource(url='http://www.example.com/probav',
+                               type='proba-v')
+        self.job = HarvestJob(source=source)
+        model.Session.add_all([source, self.job])
+        model.Session.commit()
+
+    def age(self, key, days):
+        Session.execute(content_blob_table.update()
+                        .where(content_blob_table.c.key == key)
+                        .values(created=datetime.utcnow() -
+                                timedelta(days=days)))
+        Session.commit()
+
+    def gather(self, content, file_names):
+        harvester = PROBAVHarvester()
+        harvester.job = self.job
+        files = [{'name': name, 'url': 'http://www.example.com/' + name}
+                 for name in file_names]
+        entries = harvester._create_L3_harvest_objects(
+            [('urn:a', '2018-01-11T00:00:00Z', '2018-01-10', content,
+              files)])
+        return [harvester._gather_entry(entry) for entry in entries]
+
+    def test_store_and_get(self):
+        key = store_blob(u'<entry>\xe9</entry>')
+
+        assert key == blob_key(u'<entry>\xe9</entry>')
+        assert store_blob('<entry>\xc3\xa9</entry>') == key
+        assert get_blob(key) == u'<entry>\xe9</entry>'
+        assert Session.execute(content_blob_table.count()).scalar() == 1
+        assert get_blob('missing') is None
+
+    def test_only_old_unreferenced_blobs_are_deleted(self):
+        old = store_blob('<entry>old</entry>')
+        recent = store_blob('<entry>recent</entry>')
+        self.age(old, 2)
+
+        assert delete_unreferenced_blobs() == 1
+        assert get_blob(old) is None
+        assert get_blob(recent) == '<entry>recent</entry>'
+
+    def test_gathered_blobs_are_kept_until_their_objects_are_deleted(self):
+        object_ids = self.gather('<entry>L3</entry>', ['X00Y00', 'X01Y00'])
+        key = blob_key('<entry>L3</entry>')
+        self.age(key, 2)
+
+        assert len(object_ids) == 2
+        assert delete_unreferenced_blobs() == 0
+        assert get_blob(key) == '<entry>L3</entry>'
+
+        for object_id in object_ids:
+            model.Session.delete(HarvestObject.get(object_id))
+        model.Session.commit()
+
+        assert delete_unreferenced_blobs() == 1
+        assert get_blob(key) is None
@@ -5,10 +5,14 @@ import os
 from bs4 import BeautifulSoup as Soup
 
 from ckanext.nextgeossharvest.lib.esa_base import SentinelHarvester
+from ckanext.nextgeossharvest.lib.sentinel_products import decode_identifier
+from ckanext.nextgeossharvest.tests.esa_soup_parser import extract_entry_soup
+from ckanext.nextgeossharvest.tests.esa_soup_parser import load_entries
+from ckanext.nextgeossharvest.tests.esa_soup_parser import normalize_names
 
 
 class TestNormalizeNames(object):
-    """Tests for the _normalize_names() method."""
+    """Tests for the normalize_names() function of the original parser."""
 
     def test_normalize_sentinel_1(self):
         directory = os.path.dirname(os.path.abspath(__file__))
@@ -17,7 +21,7 @@ class TestNormalizeNames(object):
             soup = Soup(f, 'lxml')
 
         test_entry = soup.find_all('entry')[0]
-        test_item = SentinelHarvester()._normalize_names(test_entry)
+        test_item = normalize_names(test_entry)
 
         expected_item = {
             'StartTime': '2018-01-31T10:47:13.362Z',
@@ -40,3 +44,96 @@ class TestNormalizeNames(object):
         }
 
         assert test_item == expected_item
+
+
+class TestDecodeIdentifier(object):
+    """Tests for the Sentinel product identifier decoder."""
+
+    def test_decode_sentinel_1(self):
+        identifier = 'S1B_EW_GRDH_1SDH_20180131T104713_20180131T104813_009414_010EA4_BD6D'  # noqa: E501
+        product = decode_identifier(identifier)
+
+        assert product['mission'] == 'S1B'
+        assert product['product_key'] == 'GRD'
+        assert product['start'] == '20180131T104713'
+        assert product['orbit'] == 9414
+        assert product['relative_orbit'] == 113
+        assert product['product_id'] == 'BD6D'
+
+    def test_decode_sentinel_2(self):
+        identifier = 'S2A_MSIL1C_20170105T013442_N0204_R031_T53NMJ_20170105T013443'  # noqa: E501
+        product = decode_identifier(identifier)
+
+        assert product['mission'] == 'S2A'
+        assert product['product_key'] == 'L1C'
+        assert product['relative_orbit'] == 31
+        assert product['processing_baseline'] == '02.04'
+        assert product['tile'] == '53NMJ'
+
+    def test_decode_sentinel_3(self):
+        identifier = 'S3A_SR_2_LAN____20180101T000000_20180101T000300_20180102T120000_0179_026_187_1800_LN3_O_NT_002'  # noqa: E501
+        product = decode_identifier(identifier)
+
+        assert product['mission'] == 'S3A'
+        assert product['product_key'] == 'SR_LAN'
+        assert product['relative_orbit'] == 187
+        assert product['processing_baseline'] == '002'
+
+    def test_unknown_identifier(self):
+        assert decode_identifier('LC08_L1TP_139045_20170304') is None
+
+    def test_collection_and_tags(self):
+        item = {'identifier': 'S3B_SR_1_SRA_A__20180101T000000_20180101T000300_20180102T120000_0179_026_187_1800_LN3_O_NT_002'}  # noqa: E501
+        harvester = SentinelHarvester()
+
+        item = harvester._add_collection(item)
+        tags = harvester._get_tags_for_dataset(item)
+
+        assert item['collection_id'] == 'SENTINEL3_SRAL_L1_SRA'
+        assert [tag['name'] for tag in tags] == ['Sentinel-3', 'SRA', 'Level-1', 'SAR', 'Altimeter']  # noqa: E501
+
+
+class TestExtractEntry(object):
+    """
+    Tests that the lxml parser returns the same dictionary as the original
+    BeautifulSoup parser.
+    """
+
+    def _assert_same_entries(self, entries):
+        harvester = SentinelHarvester()
+        assert entries
+        for entry in entries:
+            expected = extract_entry_soup(entry)
+            assert harvester._extract_entry(entry) == expected
+            assert harvester._extract_entry(entry.decode('utf-8')) == expected  # noqa: E501
+
+    def test_sentinel_1_feed(self):
+        entries = load_entries('feeds/sentinel-1-results-feed.xml', 'entry')
+        self._assert_same_entries(entries)
+
+        entry = SentinelHarvester()._extract_entry(entries[0])
+        assert entry['identifier'] == 'S1B_EW_GRDH_1SDH_20180131T104713_20180131T104813_009414_010EA4_BD6D'  # noqa: E501
+        assert entry['enclosure'].startswith('https://scihub')
+        assert entry['ingestiondate'] is not None
+
+    def test_l2a_feed(self):
+        entries = load_entries('l2a_500_entries.xml', 'atom:entry')
+        self._assert_same_entries(entries)
+
+
+class TestAddCollection(object):
+    """Tests for the _add_collection() method."""
+
+    def test_add_collection(self):
+        item = {'identifier': 'S2A_MSIL2A_20170105T013442_N0204_R031_T53NMJ_20170105T013443'}  # noqa: E501
+        item = SentinelHarvester()._add_collection(item)
+
+        assert item['collection_id'] == 'SENTINEL2_L2A'
+
+    def test_unknown_collection(self):
+        item = {'identifier': 'S1A_IW_GRDH_1SDV_20180101T000000'}
+        item = SentinelHarvester()._add_collection(item)
+
+        assert decode_identifier(item['identifier']) is None
+        assert item['collection_id'] == 'SENTINEL_UNKNOWN'
+        assert item['collection_name'] == 'Sentinel (unknown product type)'
@@ -0,0 +1,52 @@
+"""Tests for footprint.py."""
+
+import math
+
+from shapely.geometry import MultiPolygon, Polygon
+
+from ckanext.nextgeossharvest.lib.footprint import count_vertices
+from ckanext.nextgeossharvest.lib.footprint import simplify_footprint
+
+
+def swath(vertices):
+    """Return a curved GeoJSON footprint with the given number of vertices."""
+    top = [(10 + 10.0 * i / vertices, 50 + math.sin(i / 10.0))
+           for i in range(vertices)]
+    bottom = [(x, y - 5) for x, y in reversed(top)]
+    ring = top + bottom + [top[0]]
+    return {'type': 'Polygon', 'coordinates': [[list(x) for x in ring]]}
+
+
+class TestSimplifyFootprint(object):
+    """Tests for the simplify_footprint() function."""
+
+    def test_simplify_fits_budget(self):
+        spatial = swath(500)
+        simplified = simplify_footprint(spatial, 'simplify', 50)
+
+        assert isinstance(simplified, Polygon)
+        assert count_vertices(simplified) <= 50
+        original = Polygon(spatial['coordinates'][0])
+        assert abs(simplified.area - original.area) / original.area < 0.05
+
+    def test_hull_contains_footprint(self):
+        spatial = swath(500)
+        hull = simplify_footprint(spatial, 'hull', 1000)
+
+        assert hull.contains(Polygon(spatial['coordinates'][0]).buffer(-1e-9))  # noqa: E501
+
+    def test_small_footprint_unchanged(self):
+        spatial = {'type': 'Polygon', 'coordinates': [[[10.0, 49.0], [11.0, 49.0], [11.0, 50.0], [10.0, 50.0], [10.0, 49.0]]]}  # noqa: E501
+
+        assert simplify_footprint(spatial).equals(Polygon(spatial['coordinates'][0]))  # noqa: E501
+
+    def test_antimeridian_split(self):
+        spatial = '{"type": "Polygon", "coordinates": [[[179.0, 10.0], [-179.0, 10.0], [-179.0, 11.0], [179.0, 11.0], [179.0, 10.0]]]}'  # noqa: E501
+        simplified = simplify_footprint(spatial)
+
+        assert isinstance(simplified, MultiPolygon)
+        assert len(simplified.geoms) == 2
+        assert abs(simplified.area - 2.0) < 1e-9
+        for polygon in simplified.geoms:
+            min_x, _, max_x, _ = polygon.bounds
+            assert -180 <= min_x and max_x <= 180
@@ -0,0 +1,97 @@
+"""Tests for ftp.py."""
+
+from datetime import datetime
+from ftplib import error_perm
+
+from ckanext.nextgeossharvest.lib.ftp import FtpEntry
+from ckanext.nextgeossharvest.lib.ftp import get_pool
+from ckanext.nextgeossharvest.lib.ftp import parse_list_line
+from ckanext.nextgeossharvest.lib.ftp import parse_mlsd_line
+from ckanext.nextgeossharvest.lib.ftp import pipelined_sizes
+
+
+class FakeFTP(object):
+    """Replies to SIZE commands in order, like a pipelining server."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.commands = []
+        self.replies = []
+
+    def voidcmd(self, command):
+        pass
+
+    def putcmd(self, command):
+        self.commands.append(command)
+        self.replies.append(command.split(' ', 1)[1])
+
+    def getresp(self):
+        path = self.replies.pop(0)
+        if path not in self.sizes:
+            raise error_perm('550 {}: No such file'.format(path))
+        return '213 {}'.format(self.sizes[path])
+
+
+class TestParseListings(object):
+    """Tests for the MLSD and LIST parsers."""
+
+    def test_mlsd_file(self):
+        line = 'type=file;size=10245;modify=20180301120503.250;UNIX.mode=0644; ice_conc_nh_ease-125_multi_201803011200.nc'  # noqa: E501
+
+        assert parse_mlsd_line(line) == FtpEntry('ice_conc_nh_ease-125_multi_201803011200.nc', 10245, datetime(2018, 3, 1, 12, 5, 3))  # noqa: E501
+
+    def test_mlsd_directories_skipped(self):
+        for line in ['type=cdir;modify=20180301120503; .',
+                     'type=pdir;modify=20180301120503; ..',
+                     'Type=dir;Modify=20180301120503; 2018']:
+            assert parse_mlsd_line(line) is None
+
+    def test_list_file(self):
+        line = '-rw-r--r--    1 ftp      ftp        204800 Nov 30  2017 mercatorpsy4v3r1_gl12_hrly_20171130_R20171129.nc'  # noqa: E501
+
+        assert parse_list_line(line) == FtpEntry('mercatorpsy4v3r1_gl12_hrly_20171130_R20171129.nc', 204800, datetime(2017, 11, 30))  # noqa: E501
+
+    def test_list_recent_file(self):
+        line = '-rw-r--r--    1 ftp      ftp        1024 Dec 31 23:10 name with spaces.nc'  # noqa: E501
+        entry = parse_list_line(line, now=datetime(2018, 3, 1))
+
+        assert entry.name == 'name with spaces.nc'
+        assert entry.modify == datetime(2017, 12, 31, 23, 10)
+
+    def test_list_directories_skipped(self):
+        line = 'drwxr-xr-x    2 ftp      ftp          4096 Mar 01 12:00 03'
+
+        assert parse_list_line(line) is None
+
+
+class TestPipelinedSizes(object):
+    """Tests for the pipelined_sizes() function."""
+
+    def test_sizes_in_order(self):
+        ftp = FakeFTP({'/a.nc': 1024, '/c.nc': 2048})
+        results = pipelined_sizes(ftp, ['/a.nc', '/b.nc', '/c.nc'],
+                                  chunk_size=2)
+
+        assert [size for size, _ in results] == [1024, None, 2048]
+        assert results[1][1].startswith('550')
+        assert ftp.commands == ['SIZE /a.nc', 'SIZE /b.nc', 'SIZE /c.nc']
+
+
+class TestGetPool(object):
+    """Tests for the get_pool() function."""
+
+    def test_pool_is_shared(self):
+        pool = get_pool('ftp.example.com', 'user', 'passwd')
+
+        assert get_pool('ftp.example.com', 'user', 'passwd') is pool
+
+    def test_pool_settings(self):
+        pool = get_pool('ftp.example.com', 'user', 'passwd',
+                        max_connections=2, timeout=30)
+        other = get_pool('ftp.example.com', 'user', 'passwd',
+                         max_connections=8, timeout=30)
+
+        assert pool.max_connections == 2
+        assert other.max_connections == 8
+        assert get_pool('ftp.example.com', 'user', 'passwd',
+                        max_connections=2, timeout=10).timeout == 10
@@ -0,0 +1,76 @@
+"""Tests for ftp_snapshot.py."""
+
+import json
+
+import mock
+
+from ckanext.nextgeossharvest.lib.ftp import FtpEntry
+from ckanext.nextgeossharvest.lib.ftp_snapshot import FtpSnapshots
+
+
+class FakePool(object):
+    """Lists a directory from a dictionary of file sizes by name."""
+
+    domain = 'ftp.example.com'
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.modify = '20180301000000'
+
+    def list_directory(self, path, kind='file'):
+        if kind == 'dir':
+            return [FtpEntry('2018', None, self.modify)]
+        return [FtpEntry(name, size, None)
+                for name, size in sorted(self.sizes.items())]
+
+
+class TestListNew(object):
+    """Tests for the list_new() method."""
+
+    def setup(self):
+        with mock.patch('ckanext.nextgeossharvest.lib.ftp_snapshot.Session') as session:  # noqa: E501
+            session.execute.return_value = []
+            self.snapshots = FtpSnapshots('source')
+
+    def save(self):
+        """Load the pending listings as the snapshots of the next gather."""
+        for (domain, path), (sizes, digest, dir_modify) in \
+                self.snapshots.pending.items():
+            self.snapshots.snapshots[(domain, path)] = {
+                'entries': json.dumps(sizes), 'listing_hash': digest,
+                'dir_modify': dir_modify}
+        self.snapshots.pending = {}
+        self.snapshots.parents = {}
+
+    def list_new(self, pool, accept=None):
+        entries = self.snapshots.list_new(pool, '/2018', accept)
+        return sorted(entry.name for entry in entries)
+
+    def test_new_and_changed_files(self):
+        pool = FakePool({'a.nc': 1, 'b.nc': 1})
+        assert self.list_new(pool) == ['a.nc', 'b.nc']
+        self.save()
+
+        pool.sizes.update({'b.nc': 2, 'c.nc': 1})
+        pool.modify = '20180302000000'
+        assert self.list_new(pool) == ['b.nc', 'c.nc']
+        self.save()
+
+        assert self.list_new(pool) == []
+
+    def test_files_not_accepted_are_listed_again(self):
+        pool = FakePool({'a.nc': 1, 'b.nc': 1})
+        assert self.list_new(pool, lambda name: name == 'a.nc') == ['a.nc']
+        self.save()
+
+        # The directory hasn't changed, but b.nc wasn't recorded.
+        assert self.list_new(pool, lambda name: name == 'a.nc') == []
+        self.save()
+        assert self.list_new(pool) == ['b.nc']
+        self.save()
+
+        # Every file is recorded, so the directory is skipped.
+        with mock.patch.object(pool, 'list_directory',
+                               wraps=pool.list_directory) as list_directory:
+            assert self.list_new(pool) == []
+        assert list_directory.call_count == 1
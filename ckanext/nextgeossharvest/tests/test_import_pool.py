@@ -0,0 +1,271 @@
+"""Tests for import_pool.py."""
+
+from datetime import datetime
+
+import mock
+
+from ckan import model
+import ckan.tests.helpers as helpers
+
+from ckanext.harvest.model import HarvestJob, HarvestObject, HarvestSource
+
+from ckanext.nextgeossharvest.lib import import_pool
+from ckanext.nextgeossharvest.lib.import_pool import MAX_CLAIM_ERRORS
+from ckanext.nextgeossharvest.lib.import_pool import claim_objects
+from ckanext.nextgeossharvest.lib.import_pool import get_source_types
+from ckanext.nextgeossharvest.lib.import_pool import import_batch
+from ckanext.nextgeossharvest.lib.import_pool import import_object
+from ckanext.nextgeossharvest.lib.import_pool import import_objects
+from ckanext.nextgeossharvest.lib.import_pool import run_worker
+from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
+
+
+class TestClaimObjects(object):
+    """Tests for the claim_objects() function."""
+
+    def setup(self):
+        helpers.reset_db()
+        self.source = HarvestSource(url='http://www.example.com/esa',
+                                    type='esasentinel')
+        self.job = self.add_job(self.source, 'Running')
+
+    def add_job(self, source, status):
+        job = HarvestJob(source=source, status=status)
+        model.Session.add_all([source, job])
+        model.Session.commit()
+        return job
+
+    def add_object(self, job, state='WAITING', minute=0):
+        obj = HarvestObject(guid='guid', job=job, source=job.source,
+                            state=state,
+                            gathered=datetime(2018, 1, 1, 0, minute))
+        model.Session.add(obj)
+        model.Session.commit()
+        return obj.id
+
+    def state(self, object_id):
+        model.Session.expire_all()
+        return HarvestObject.get(object_id).state
+
+    def test_claim_waiting_objects_of_job(self):
+        second = self.add_object(self.job, minute=2)
+        first = self.add_object(self.job, minute=1)
+        self.add_object(self.job, state='COMPLETE')
+        self.add_object(self.add_job(self.source, 'Running'))
+
+        assert claim_objects(self.job.id, 10, ['esasentinel']) == \
+            [first, second]
+        assert self.state(first) == 'FETCH'
+
+    def test_claimed_objects_are_not_claimed_again(self):
+        first = self.add_object(self.job, minute=1)
+        second = self.add_object(self.job, minute=2)
+
+        assert claim_objects(self.job.id, 1, ['esasentinel']) == [first]
+        assert claim_objects(self.job.id, 1, ['esasentinel']) == [second]
+        assert claim_objects(self.job.id, 1, ['esasentinel']) == []
+
+    def test_running_jobs(self):
+        waiting = self.add_object(self.job)
+        self.add_object(self.add_job(self.source, 'Finished'))
+
+        assert claim_objects(None, 10, ['esasentinel']) == [waiting]
+
+    def test_other_harvesters_are_skipped(self):
+        other_source = HarvestSource(url='http://www.example.com/csw',
+                                     type='csw')
+        other = self.add_object(self.add_job(other_source, 'Running'))
+
+        assert claim_objects(None, 10, ['esasentinel']) == []
+        assert self.state(other) == 'WAITING'
+        assert claim_objects(None, 10, []) == []
+
+
+class TestGetSourceTypes(object):
+    """Tests for the get_source_types() function."""
+
+    def test_only_nextgeoss_harvesters(self):
+        harvesters = {'esasentinel': NextGEOSSHarvester(),
+                      'csw': mock.Mock()}
+
+        assert get_source_types(harvesters) == ['esasentinel']
+
+
+class TestImportObject(object):
+    """Tests for the import_object() function."""
+
+    def setup(self):
+        self.obj = mock.Mock(state='WAITING')
+        self.obj.source.type = 'esasentinel'
+        self.harvester = mock.Mock()
+        self.harvesters = {'esasentinel': self.harvester}
+        patches = [
+            mock.patch.object(import_pool, 'HarvestObject'),
+            mock.patch.object(import_pool, 'Session'),
+            mock.patch.object(import_pool, 'fetch_and_import_stages'),
+        ]
+        harvest_object, self.session, self.stages = [patch.start()
+                                                     for patch in patches]
+        self.patches = patches
+        harvest_object.get.return_value = self.obj
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_import(self):
+        def complete(harvester, obj):
+            obj.state = 'COMPLETE'
+        self.stages.side_effect = complete
+
+        assert import_object('id', self.harvesters) is True
+        self.stages.assert_called_once_with(self.harvester, self.obj)
+
+    def test_unknown_source_type(self):
+        self.obj.source.type = 'csw'
+
+        assert import_object('id', self.harvesters) is False
+        assert self.obj.state == 'ERROR'
+        self.stages.assert_not_called()
+
+    def test_error(self):
+        self.stages.side_effect = Exception('broken')
+
+        assert import_object('id', self.harvesters) is False
+        self.session.rollback.assert_called_once_with()
+        self.harvester._save_object_error.assert_called_once_with(
+            'Error importing object id: broken', self.obj, 'Import')
+        assert self.obj.state == 'ERROR'
+        assert self.obj.report_status == 'errored'
+
+
+class TestImportObjects(object):
+    """Tests for the import_objects() function."""
+
+    def setup(self):
+        self.objects = {object_id: mock.Mock(id=object_id, state='FETCH',
+                                             current=True)
+                        for object_id in ['a', 'b', 'c']}
+        self.harvester = mock.Mock()
+        self.harvester.fetch_stage.side_effect = \
+            lambda obj: obj.id != 'b'
+        self.harvester.import_objects.side_effect = \
+            lambda objects: [True] * len(objects)
+        patches = [
+            mock.patch.object(import_pool, 'HarvestObject'),
+            mock.patch.object(import_pool, 'Session'),
+        ]
+        harvest_object, self.session = [patch.start() for patch in patches]
+        self.patches = patches
+        harvest_object.get.side_effect = lambda object_id: \
+            self.objects[object_id]
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_fetched_objects_are_imported_together(self):
+        objects = [self.objects[object_id] for object_id in ['a', 'b', 'c']]
+
+        assert import_objects(self.harvester, objects) == 2
+
+        self.harvester.import_objects.assert_called_once_with(
+            [self.objects['a'], self.objects['c']])
+        assert [obj.state for obj in objects] == \
+            ['COMPLETE', 'ERROR', 'COMPLETE']
+        assert self.objects['b'].report_status == 'errored'
+
+    def test_import_error(self):
+        self.harvester.import_objects.side_effect = Exception('broken')
+        objects = [self.objects['a'], self.objects['c']]
+
+        assert import_objects(self.harvester, objects) == 0
+
+        assert [obj.state for obj in objects] == ['ERROR', 'ERROR']
+        self.harvester._save_object_error.assert_any_call(
+            'Error importing object c: broken', self.objects['c'], 'Import')
+
+
+class TestImportBatch(object):
+    """Tests for the import_batch() function."""
+
+    def setup(self):
+        self.batch_harvester = mock.Mock(spec=['import_objects'])
+        self.harvesters = {'itag_enricher': self.batch_harvester,
+                           'esasentinel': mock.Mock(spec=['import_stage'])}
+        self.objects = {}
+        for object_id, source_type in [('a', 'itag_enricher'),
+                                       ('b', 'esasentinel'),
+                                       ('c', 'itag_enricher')]:
+            self.objects[object_id] = mock.Mock(id=object_id)
+            self.objects[object_id].source.type = source_type
+        patches = [
+            mock.patch.object(import_pool, 'HarvestObject'),
+            mock.patch.object(import_pool, 'import_object',
+                              return_value=True),
+            mock.patch.object(import_pool, 'import_objects', return_value=1),
+        ]
+        harvest_object, self.import_object, self.import_objects = \
+            [patch.start() for patch in patches]
+        self.patches = patches
+        harvest_object.get.side_effect = lambda object_id: \
+            self.objects[object_id]
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_batch_harvesters_import_together(self):
+        assert import_batch(['a', 'b', 'c'], self.harvesters) == 2
+
+        self.import_objects.assert_called_once_with(
+            self.batch_harvester, [self.objects['a'], self.objects['c']])
+        self.import_object.assert_called_once_with('b', self.harvesters)
+
+
+class TestRunWorker(object):
+    """Tests for the run_worker() function."""
+
+    def setup(self):
+        patches = [
+            mock.patch.object(import_pool, 'reset_connections'),
+            mock.patch.object(import_pool, 'get_harvesters',
+                              return_value={'esasentinel':
+                                            NextGEOSSHarvester()}),
+            mock.patch.object(import_pool, 'claim_objects'),
+            mock.patch.object(import_pool, 'import_batch'),
+            mock.patch.object(import_pool, 'Session'),
+            mock.patch.object(import_pool.time, 'sleep'),
+        ]
+        mocks = [patch.start() for patch in patches]
+        self.patches = patches
+        self.claim_objects, self.import_batch = mocks[2:4]
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_import_until_no_objects_are_left(self):
+        self.claim_objects.side_effect = [['a', 'b'], ['c'], []]
+
+        run_worker('job', 2, False, 5)
+
+        assert self.import_batch.call_args_list == [
+            mock.call(['a', 'b'], mock.ANY), mock.call(['c'], mock.ANY)]
+        self.claim_objects.assert_called_with('job', 2, ['esasentinel'])
+
+    def test_retry_claim_errors(self):
+        self.claim_objects.side_effect = [Exception('down'), ['a'], []]
+
+        run_worker('job', 2, False, 5)
+
+        assert self.claim_objects.call_count == 3
+        self.import_batch.assert_called_once_with(['a'], mock.ANY)
+
+    def test_give_up_after_consecutive_claim_errors(self):
+        self.claim_objects.side_effect = Exception('down')
+
+        run_worker(None, 2, True, 5)
+
+        assert self.claim_objects.call_count == MAX_CLAIM_ERRORS
+        self.import_batch.assert_not_called()
@@ -0,0 +1,102 @@
+"""Tests for itag_cache.py."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from ckan.model import Session
+import ckan.tests.helpers as helpers
+
+from ckanext.nextgeossharvest import model as nextgeoss_model
+from ckanext.nextgeossharvest.lib.itag_cache import ITagCache
+from ckanext.nextgeossharvest.lib.itag_cache import cache_key
+from ckanext.nextgeossharvest.lib.itag_cache import canonical_footprint
+from ckanext.nextgeossharvest.model import itag_cache_table
+
+
+class TestCanonicalFootprint(object):
+    """Tests for the canonical_footprint() function."""
+
+    def test_same_footprint_same_representation(self):
+        clockwise = {'type': 'Polygon', 'coordinates': [[[10.000001, 50.0], [11.0, 50.0], [11.0, 49.0], [10.0, 49.0], [10.000001, 50.0]]]}  # noqa: E501
+        rotated = {'type': 'Polygon', 'coordinates': [[[11.0, 49.0], [11.0, 50.0], [10.0, 50.0], [10.0, 49.0], [10.0, 49.0], [11.0, 49.0]]]}  # noqa: E501
+
+        assert canonical_footprint(clockwise) == canonical_footprint(rotated)
+        assert canonical_footprint(rotated) == 'POLYGON ((10.0000 49.0000, 11.0000 49.0000, 11.0000 50.0000, 10.0000 50.0000, 10.0000 49.0000))'  # noqa: E501
+
+    def test_cache_key(self):
+        spatial = '{"type": "Polygon", "coordinates": [[[10.0, 49.0], [11.0, 49.0], [11.0, 50.0], [10.0, 49.0]]]}'  # noqa: E501
+
+        assert cache_key(spatial, 'Political') == cache_key(spatial, 'Political')  # noqa: E501
+        assert cache_key(spatial, 'Political') != cache_key(spatial, 'Geology')  # noqa: E501
+
+
+class TestITagCache(object):
+    """Tests for the ITagCache class."""
+
+    def setup(self):
+        helpers.reset_db()
+        nextgeoss_model.setup()
+        self.cache = ITagCache(ttl_days=30, max_entries=2)
+
+    def make_older(self, key, **days):
+        """Move the created and/or last_used times of an entry back."""
+        table = itag_cache_table
+        entry = Session.execute(select([table])
+                                .where(table.c.key == key)).first()
+        values = {column: entry[column] - timedelta(days=age)
+                  for column, age in days.items()}
+        Session.execute(table.update().where(table.c.key == key)
+                        .values(**values))
+        Session.commit()
+
+    def keys(self):
+        return {key for key, in Session.execute(
+            select([itag_cache_table.c.key])).fetchall()}
+
+    def test_put_and_get(self):
+        self.cache.put_many({'a': 'response a', 'b': 'response b'})
+
+        assert self.cache.get_many(['a', 'b', 'c', 'a']) == \
+            {'a': 'response a', 'b': 'response b'}
+        assert self.cache.get_many([]) == {}
+
+    def test_get_marks_entries_as_used(self):
+        self.cache.put_many({'a': 'response a'})
+        self.make_older('a', last_used=10)
+
+        self.cache.get_many(['a'])
+
+        last_used = Session.execute(select([itag_cache_table.c.last_used])).scalar()  # noqa: E501
+        assert last_used > datetime.utcnow() - timedelta(days=1)
+
+    def test_expired_entries_are_not_used(self):
+        self.cache.put_many({'a': 'response a', 'b': 'response b'})
+        self.make_older('a', created=31)
+
+        assert self.cache.get_many(['a', 'b']) == {'b': 'response b'}
+        self.cache.evict()
+        assert self.keys() == {'b'}
+
+    def test_repeated_put_replaces_entry(self):
+        self.cache.put_many({'a': 'old response'})
+        self.make_older('a', created=31, last_used=31)
+
+        self.cache.put_many({'a': 'new response'})
+        self.cache.put_many({'a': 'new response'})
+
+        assert self.cache.get_many(['a']) == {'a': 'new response'}
+        self.cache.evict()
+        assert self.keys() == {'a'}
+
+    def test_evict_least_recently_used(self):
+        self.cache.put_many({'a': 'response a', 'b': 'response b',
+                             'c': 'response c'})
+        self.make_older('a', last_used=3)
+        self.make_older('b', last_used=2)
+        self.make_older('c', last_used=1)
+        self.cache.get_many(['a'])
+
+        self.cache.evict()
+
+        assert self.keys() == {'a', 'c'}
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Tests for itag.py."""
+
+import json
+
+import mock
+from sqlalchemy import text
+
+from ckan import model
+import ckan.tests.helpers as helpers
+
+from ckanext.harvest.model import HarvestJob, HarvestObject, HarvestSource
+from ckanext.harvest.model import HarvestObjectExtra as HOExtra
+
+from ckanext.nextgeossharvest.harvesters import itag
+from ckanext.nextgeossharvest.harvesters.itag import ITagEnricher
+
+
+def make_footprint(x):
+    return json.dumps({'type': 'Polygon',
+                       'coordinates': [[[x, 0.0], [x + 1, 0.0], [x + 1, 1.0],
+                                        [x, 0.0]]]})
+
+
+FIRST = make_footprint(0.0)
+SECOND = make_footprint(2.0)
+BROKEN = make_footprint(4.0)
+
+
+class TestFetchAll(object):
+    """Tests for the ITagEnricher._fetch_all() method."""
+
+    def setup(self):
+        self.harvester = ITagEnricher()
+        self.harvester.source_config = {'base_url': 'http://itag.example.com',
+                                        'fetch_workers': 2,
+                                        'requests_per_second': 1000}
+        self.responses = {}
+        for footprint in [FIRST, SECOND]:
+            query = self.harvester._make_itag_query(footprint)
+            self.responses[query] = mock.Mock(status_code=200,
+                                              text='tags of ' + footprint)
+        query = self.harvester._make_itag_query(BROKEN)
+        self.responses[query] = mock.Mock(status_code=500, text='Down')
+
+        self.session_patch = mock.patch.object(itag, 'get_session')
+        self.session = self.session_patch.start().return_value
+        self.session.get.side_effect = \
+            lambda query, timeout: self.responses[query]
+
+    def teardown(self):
+        self.session_patch.stop()
+
+    def make_object(self, footprint):
+        return mock.Mock(content=None,
+                         extras=[HOExtra(key='spatial', value=footprint)])
+
+    def fetch_errors(self, obj):
+        return [extra.value for extra in obj.extras
+                if extra.key == 'fetch_error']
+
+    def test_responses_are_stored_on_their_objects(self):
+        objects = [self.make_object(footprint)
+                   for footprint in [SECOND, FIRST, SECOND]]
+
+        self.harvester._fetch_all(objects)
+
+        assert [obj.content for obj in objects] == \
+            ['tags of ' + SECOND, 'tags of ' + FIRST, 'tags of ' + SECOND]
+        # Each footprint is only queried once.
+        assert self.session.get.call_count == 2
+        for obj in objects:
+            obj.save.assert_called_once_with()
+
+    def test_errors_only_fail_their_objects(self):
+        first, broken, malformed = [self.make_object(footprint) for footprint
+                                    in [FIRST, BROKEN, 'not a footprint']]
+
+        self.harvester._fetch_all([first, broken, malformed])
+
+        assert first.content == 'tags of ' + FIRST
+        assert self.fetch_errors(first) == []
+        assert broken.content is None
+        assert self.fetch_errors(broken) == ['500 error on request: Down']
+        assert malformed.content is None
+        errors = self.fetch_errors(malformed)
+        assert len(errors) == 1
+        assert errors[0].startswith('Error preparing footprint: ')
+        assert self.session.get.call_count == 2
+
+
+class TestImportObjects(object):
+    """Tests for the ITagEnricher.import_objects() method."""
+
+    def setup(self):
+        helpers.reset_db()
+        self.tagged = helpers.call_action(
+            'package_create', name='tagged', tags=[{'name': 'Europe'}],
+            extras=[{'key': 'Land Cover', 'value': 'old'}])['id']
+        self.untagged = helpers.call_action('package_create',
+                                            name='untagged')['id']
+        source = HarvestSource(url='http://itag.example.com',
+                               type='itag_enricher',
+                               config='{"import_mode": "targeted"}')
+        self.job = HarvestJob(source=source)
+        model.Session.add_all([source, self.job])
+        model.Session.commit()
+        self.search_patch = mock.patch.object(itag, 'search')
+        self.search = self.search_patch.start()
+
+    def teardown(self):
+        self.search_patch.stop()
+
+    def make_object(self, guid, countries):
+        content = {'political': {'continents': [
+            {'name': 'Europe',
+             'countries': [{'name': name} for name in countries]}]},
+            'landCover': {'landUse': [{'name': 'Forest', 'pcover': 75.0}]}}
+        obj = HarvestObject(guid=guid, job=self.job, source=self.job.source,
+                            content=json.dumps({'content': content}))
+        obj.save()
+        return obj
+
+    def tags(self, package_id):
+        rows = model.Session.execute(text(
+            "SELECT tag.name FROM package_tag "
+            "JOIN tag ON tag.id = package_tag.tag_id "
+            "WHERE package_tag.package_id = :id "
+            "AND package_tag.state = 'active'"), {'id': package_id})
+        return sorted(name for name, in rows)
+
+    def extras(self, package_id):
+        rows = model.Session.execute(text(
+            "SELECT key, value FROM package_extra "
+            "WHERE package_id = :id AND state = 'active'"),
+            {'id': package_id})
+        return dict(tuple(row) for row in rows)
+
+    def test_import_batch(self):
+        long_name = u'Région ' * 20
+        objects = [self.make_object(self.tagged, [u"Côte d'Ivoire"]),
+                   self.make_object(self.untagged,
+                                    [u"Côte d'Ivoire", long_name]),
+                   self.make_object('deleted', ['France'])]
+        object_ids = [obj.id for obj in objects]
+
+        results = ITagEnricher().import_objects(objects)
+
+        assert results == [True, True, False]
+        assert self.tags(self.tagged) == ['Europe', 'Forest', 'cote-divoire']
+        assert self.tags(self.untagged) == \
+            ['Europe', 'Forest', 'cote-divoire', ('region-' * 20)[:100]]
+        # The new tags are only created once.
+        count = model.Session.execute(text(
+            "SELECT count(*) FROM tag WHERE name = 'cote-divoire'")).scalar()
+        assert count == 1
+
+        # Only the missing extras are added.
+        assert self.extras(self.tagged)['Land Cover'] == 'old'
+        assert self.extras(self.tagged)['itag'] == 'tagged'
+        assert self.extras(self.untagged)['itag'] == 'tagged'
+
+        self.search.rebuild.assert_called_once_with(
+            package_ids=sorted([self.tagged, self.untagged]),
+            defer_commit=True)
+        self.search.commit.assert_called_once_with()
+        model.Session.expire_all()
+        assert HarvestObject.get(object_ids[0]).package_id == self.tagged
+        assert HarvestObject.get(object_ids[0]).current is True
@@ -0,0 +1,83 @@
+"""Tests for itag_local.py."""
+
+import json
+import os
+import shutil
+import tempfile
+
+from ckanext.nextgeossharvest.lib.itag_local import LocalTagger
+
+
+def box(west, south, east, north):
+    return {'type': 'Polygon',
+            'coordinates': [[[west, south], [east, south], [east, north],
+                             [west, north], [west, south]]]}
+
+
+def write_layer(directory, name, features):
+    collection = {'type': 'FeatureCollection',
+                  'features': [{'type': 'Feature', 'properties': properties,
+                                'geometry': geometry}
+                               for properties, geometry in features]}
+    with open(os.path.join(directory, '{}.geojson'.format(name)), 'w') as f:
+        json.dump(collection, f)
+
+
+class TestLocalTagger(object):
+    """Tests for the LocalTagger class."""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        write_layer(self.directory, 'continents',
+                    [({'name': 'Europe'}, box(-10, 35, 40, 70))])
+        write_layer(self.directory, 'countries',
+                    [({'name': 'France', 'continent': 'Europe'}, box(-5, 42, 8, 51)),  # noqa: E501
+                     ({'name': 'Spain', 'continent': 'Europe'}, box(-10, 36, 3, 42))])  # noqa: E501
+        write_layer(self.directory, 'regions',
+                    [({'name': 'Bretagne', 'country': 'France'}, box(-5, 47, -1, 49))])  # noqa: E501
+        write_layer(self.directory, 'landcover',
+                    [({'name': 'Forest'}, box(-10, 35, 0, 70)),
+                     ({'name': 'Cropland'}, box(0, 35, 40, 70))])
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tag(self):
+        tagger = LocalTagger(self.directory)
+
+        content = tagger.tag(json.dumps(box(-3, 46, 1, 48)))['content']
+
+        assert content['political'] == {
+            'continents': [{'name': 'Europe', 'countries': [
+                {'name': 'France', 'regions': [{'name': 'Bretagne'}]}]}]}
+        assert content['landCover']['landUse'] == [
+            {'name': 'Forest', 'pcover': 75.0},
+            {'name': 'Cropland', 'pcover': 25.0}]
+        assert content['hydrology'] == {'rivers': []}
+
+    def test_features_with_the_same_geometry(self):
+        write_layer(self.directory, 'rivers',
+                    [({'name': 'Loire'}, box(-2, 47, 2, 47.5)),
+                     ({'name': 'Cher'}, box(-2, 47, 2, 47.5))])
+        tagger = LocalTagger(self.directory)
+
+        content = tagger.tag(json.dumps(box(-3, 46, 1, 48)))['content']
+
+        assert sorted(river['name'] for river
+                      in content['hydrology']['rivers']) == ['Cher', 'Loire']
+
+    def test_split_at_antimeridian(self):
+        write_layer(self.directory, 'countries',
+                    [({'name': 'Fiji', 'continent': 'Oceania'}, box(177, -19, 180, -16)),  # noqa: E501
+                     ({'name': 'Samoa', 'continent': 'Oceania'}, box(-173, -15, -171, -13)),  # noqa: E501
+                     ({'name': 'Brazil', 'continent': 'South America'}, box(-60, -20, -40, -10))])  # noqa: E501
+        tagger = LocalTagger(self.directory)
+        footprint = {'type': 'Polygon',
+                     'coordinates': [[[175, -20], [-170, -20], [-170, -10],
+                                      [175, -10], [175, -20]]]}
+
+        content = tagger.tag(json.dumps(footprint))['content']
+
+        countries = content['political']['continents'][0]['countries']
+        assert sorted(country['name'] for country in countries) == \
+            ['Fiji', 'Samoa']
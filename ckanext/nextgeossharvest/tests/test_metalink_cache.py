@@ -0,0 +1,64 @@
+"""Tests for metalink_cache.py."""
+
+import os
+import shutil
+import tempfile
+import time
+
+from ckanext.nextgeossharvest.lib.metalink_cache import MetalinkCache
+from ckanext.nextgeossharvest.lib.metalink_cache import metalink_key
+
+
+FILES = [{'name': 'PROBAV_S1_TOA_X00Y00_20180101_1KM_V101.HDF5',
+          'url': 'https://www.vito-eodata.be/PDF/dataaccess?fileIndex=1',
+          'size': 11900799}]
+
+
+class TestMetalinkCache(object):
+    """Tests for the MetalinkCache class."""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def age(self, cache, entry_id, updated, seconds):
+        path = cache._path(metalink_key(entry_id, updated))
+        timestamp = time.time() - seconds
+        os.utime(path, (timestamp, timestamp))
+
+    def test_get_put(self):
+        cache = MetalinkCache(self.directory)
+        cache.put('urn:a', '2018-01-01T00:00:00Z', FILES)
+
+        assert cache.get('urn:a', '2018-01-01T00:00:00Z') == FILES
+        assert cache.get('urn:a', '2018-01-02T00:00:00Z') is None
+        assert cache.get('urn:b', '2018-01-01T00:00:00Z') is None
+
+    def test_evict_old_entries(self):
+        cache = MetalinkCache(self.directory, max_age_days=1)
+        cache.put('urn:a', '1', FILES)
+        cache.put('urn:b', '1', FILES)
+        self.age(cache, 'urn:a', '1', 2 * 24 * 3600)
+
+        cache.evict()
+
+        assert cache.get('urn:a', '1') is None
+        assert cache.get('urn:b', '1') == FILES
+
+    def test_evict_least_recently_used(self):
+        cache = MetalinkCache(self.directory)
+        for i, entry_id in enumerate(['urn:a', 'urn:b', 'urn:c']):
+            cache.put(entry_id, '1', FILES)
+            self.age(cache, entry_id, '1', 100 - i)
+        size = os.path.getsize(cache._path(metalink_key('urn:a', '1')))
+        cache.max_size = 2 * size
+        # Using an entry makes it the most recently used one.
+        cache.get('urn:a', '1')
+
+        cache.evict()
+
+        assert cache.get('urn:b', '1') is None
+        assert cache.get('urn:a', '1') == FILES
+        assert cache.get('urn:c', '1') == FILES
@@ -1,8 +1,19 @@
 """Tests for nextgeoss_base.py."""
 
 import json
+from datetime import datetime
 
+import mock
+
+from ckan import model
+import ckan.tests.helpers as helpers
+
+from ckanext.harvest.model import HarvestJob, HarvestObject, HarvestSource
+from ckanext.harvest.model import HarvestObjectExtra as HOExtra
+
+from ckanext.nextgeossharvest.lib import nextgeoss_base
 from ckanext.nextgeossharvest.lib.nextgeoss_base import NextGEOSSHarvester
+from ckanext.nextgeossharvest.lib.nextgeoss_base import dataset_lock_key
 
 
 class TestConvertToGeoJSON(object):
@@ -25,3 +36,177 @@ class TestConvertToGeoJSON(object):
         geo_dict = json.loads(geojson)
         assert geo_dict['type'] == 'Polygon'
         assert geo_dict['coordinates'][0] == [[-12.947799, 27.343195], [-15.513319, 27.760723], [-15.19667, 29.384781], [-12.589683, 28.970003], [-12.947799, 27.343195]]  # noqa: E501
+
+
+class TestDatasetLockKey(object):
+    """Tests for the dataset_lock_key() function."""
+
+    def test_key_is_stable_signed_bigint(self):
+        name = 's1a_iw_grdh_1sdv_20180101t000000_20180101t000025_019964_021fb4_4b2c'  # noqa: E501
+        key = dataset_lock_key(name)
+
+        assert key == dataset_lock_key(unicode(name))  # noqa: F821
+        assert -2 ** 63 <= key < 2 ** 63
+
+    def test_different_names_get_different_keys(self):
+        assert dataset_lock_key('product_a') != dataset_lock_key('product_b')
+
+
+class TestCreateOrUpdateDataset(object):
+    """Tests for the _create_or_update_dataset() method."""
+
+    def setup(self):
+        self.harvester = NextGEOSSHarvester()
+        self.harvester.source_config = {}
+        self.harvester._parse_content = mock.Mock(
+            return_value={'name': 'product'})
+        self.harvester._create_package_dict = mock.Mock(
+            side_effect=lambda parsed_content: {
+                'name': 'product', 'tags': [{'name': 'new'}], 'extras': []})
+        self.harvester._get_package_dict = mock.Mock(
+            return_value={'tags': [{'name': 'itag'}], 'extras': []})
+        self.harvester._get_user_name = mock.Mock(return_value='harvest')
+        self.harvester._save_object_error = mock.Mock()
+        self.harvest_object = mock.Mock()
+
+        patches = [
+            mock.patch.object(nextgeoss_base, 'Session'),
+            mock.patch.object(nextgeoss_base, 'Package'),
+            mock.patch.object(nextgeoss_base, 'model'),
+            mock.patch.object(nextgeoss_base.logic, 'schema'),
+            mock.patch.object(nextgeoss_base.p.toolkit, 'get_action'),
+        ]
+        self.session, _, _, _, self.get_action = [patch.start()
+                                                  for patch in patches]
+        self.patches = patches
+        self.session.bind.dialect.name = 'postgresql'
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def existing_dataset(self, dataset):
+        query = self.session.query.return_value.filter.return_value
+        query.first.return_value = dataset
+
+    def test_create(self):
+        self.existing_dataset(None)
+
+        self.harvester._create_or_update_dataset(self.harvest_object, 'new')
+
+        self.get_action.assert_called_once_with('package_create')
+        self.session.execute.assert_called_once_with(
+            'SELECT pg_advisory_xact_lock(:key)',
+            {'key': dataset_lock_key('product')})
+
+    def test_second_create_becomes_update(self):
+        old_dataset = mock.Mock(id='old-id', owner_org='org')
+        self.existing_dataset(old_dataset)
+
+        self.harvester._create_or_update_dataset(self.harvest_object, 'new')
+
+        self.get_action.assert_called_once_with('package_update')
+        package_dict = self.get_action.return_value.call_args[0][1]
+        assert package_dict['id'] == 'old-id'
+        assert package_dict['tags'] == [{'name': 'itag'}, {'name': 'new'}]
+        assert self.harvest_object.package is old_dataset
+        self.session.commit.assert_not_called()
+
+    def test_error_rolls_back(self):
+        self.existing_dataset(None)
+        self.get_action.return_value.side_effect = Exception('invalid')
+
+        package = self.harvester._create_or_update_dataset(
+            self.harvest_object, 'new')
+
+        assert package is None
+        self.session.rollback.assert_called_once_with()
+        self.harvester._save_object_error.assert_called_once_with(
+            'Creation error for product: invalid', self.harvest_object,
+            'Import')
+
+
+class TestGetRestartDay(object):
+    """Tests for the _get_restart_day() method."""
+
+    def setup(self):
+        helpers.reset_db()
+        self.source = HarvestSource(url='http://www.example.com',
+                                    type='test')
+        self.previous_job = HarvestJob(source=self.source,
+                                       created=datetime(2018, 1, 1))
+        job = HarvestJob(source=self.source, created=datetime(2018, 1, 2))
+        model.Session.add_all([self.source, self.previous_job, job])
+        model.Session.commit()
+        self.harvester = NextGEOSSHarvester()
+        self.harvester.job = job
+
+    def add_object(self, day, state):
+        import_finished = datetime.now() if state == 'COMPLETE' else None
+        obj = HarvestObject(guid=day, job=self.previous_job,
+                            source=self.source, state=state,
+                            import_finished=import_finished,
+                            extras=[HOExtra(key='restart_day', value=day)])
+        model.Session.add(obj)
+        model.Session.commit()
+
+    def restart_day(self):
+        return self.harvester._get_restart_day(self.source.id, 'restart_day')
+
+    def test_no_objects(self):
+        assert self.restart_day() is None
+
+    def test_last_imported_day(self):
+        self.add_object('2018-01-03', 'COMPLETE')
+        self.add_object('2018-01-05', 'COMPLETE')
+        assert self.restart_day() == '2018-01-05'
+
+    def test_resume_interrupted_job(self):
+        self.add_object('2018-01-05', 'COMPLETE')
+        self.add_object('2018-01-04', 'FETCH')
+        self.add_object('2018-01-03', 'WAITING')
+        assert self.restart_day() == '2018-01-03'
+
+    def test_failed_objects_are_not_retried(self):
+        self.add_object('2018-01-05', 'COMPLETE')
+        self.add_object('2018-01-03', 'ERROR')
+        assert self.restart_day() == '2018-01-05'
+
+
+class TestGetCatchUpEndDate(object):
+    """Tests for the _get_catch_up_end_date() method."""
+
+    def end_date(self, end_date, objects_per_day):
+        harvester = NextGEOSSHarvester()
+        harvester.source_config = {'max_objects_per_job': 1000}
+        return harvester._get_catch_up_end_date(
+            datetime(2018, 1, 1), end_date, objects_per_day)
+
+    def test_window_fits_budget(self):
+        assert self.end_date(datetime(2018, 3, 1), 150) == \
+            datetime(2018, 1, 7)
+
+    def test_window_ends_with_backlog(self):
+        assert self.end_date(datetime(2018, 1, 3), 150) == \
+            datetime(2018, 1, 3)
+
+    def test_window_has_at_least_one_day(self):
+        assert self.end_date(datetime(2018, 3, 1), 5000) == \
+            datetime(2018, 1, 2)
+        assert self.end_date(datetime(2018, 1, 1), 150) == \
+            datetime(2018, 1, 2)
+        assert self.end_date(datetime(2018, 3, 1), None) == \
+            datetime(2018, 1, 2)
+
+
+class TestGetIdsToPublish(object):
+    """Tests for the _get_ids_to_publish() method."""
+
+    def test_fetch_consumer(self):
+        with mock.patch.dict(nextgeoss_base.config, {}):
+            assert NextGEOSSHarvester()._get_ids_to_publish(['a']) == ['a']
+
+    def test_import_pool(self):
+        with mock.patch.dict(nextgeoss_base.config,
+                             {'ckanext.nextgeossharvest.import_pool': 'true'}):
+            assert NextGEOSSHarvester()._get_ids_to_publish(['a']) == []
@@ -0,0 +1,116 @@
+"""Tests for noa_expiry.py."""
+
+import ast
+
+import mock
+from sqlalchemy import text
+
+from ckan import model
+import ckan.tests.helpers as helpers
+
+from ckanext.nextgeossharvest.lib import noa_expiry
+from ckanext.nextgeossharvest.lib.noa_expiry import NOAExpirySweeper
+from ckanext.nextgeossharvest.lib.noa_expiry import remove_noa_fields
+
+
+class TestRemoveNOAFields(object):
+    """Tests for the remove_noa_fields() function."""
+
+    def test_remove_noa_fields(self):
+        extras = [
+            {'key': 'identifier', 'value': 'S1A_IW_GRDH'},
+            {'key': 'noa_download_url', 'value': 'https://sentinels.space.noa.gr/a'},  # noqa: E501
+            {'key': 'noa_thumbnail', 'value': 'https://sentinels.space.noa.gr/t'},  # noqa: E501
+            {'key': 'thumbnail', 'value': 'https://sentinels.space.noa.gr/t'},  # noqa: E501
+            {'key': 'scihub_download_url', 'value': 'https://scihub.copernicus.eu/a'},  # noqa: E501
+        ]
+
+        result = ast.literal_eval(remove_noa_fields(str(extras)))
+
+        assert result == [
+            {'key': 'identifier', 'value': 'S1A_IW_GRDH'},
+            {'key': 'scihub_download_url', 'value': 'https://scihub.copernicus.eu/a'},  # noqa: E501
+        ]
+
+    def test_nothing_to_remove(self):
+        extras = [{'key': 'thumbnail', 'value': 'https://scihub.copernicus.eu/t'}]  # noqa: E501
+
+        assert remove_noa_fields(str(extras)) is None
+        assert remove_noa_fields('not a list of extras') is None
+
+
+class TestNOAExpirySweeper(object):
+    """Tests for the NOAExpirySweeper class."""
+
+    def setup(self):
+        helpers.reset_db()
+        self.expired = [self.create_dataset('expired-1', '2018-01-01'),
+                        self.create_dataset('expired-2', '2018-01-31')]
+        self.valid = self.create_dataset('valid', '2018-02-01')
+        self.search_patch = mock.patch.object(noa_expiry, 'search')
+        self.search = self.search_patch.start()
+
+    def teardown(self):
+        self.search_patch.stop()
+
+    def create_dataset(self, name, valid_until):
+        noa_url = 'https://sentinels.space.noa.gr/{}'.format(name)
+        resources = [
+            {'name': 'Product Download from SciHub',
+             'url': 'https://scihub.copernicus.eu/{}'.format(name),
+             'resource_type': 'scihub_product', 'order': 1},
+            {'name': 'Product Download from NOA (valid until {})'
+                     .format(valid_until),
+             'url': noa_url, 'resource_type': 'noa_product', 'order': 2},
+            {'name': 'Thumbnail Download from SciHub',
+             'url': 'https://scihub.copernicus.eu/{}/t'.format(name),
+             'resource_type': 'scihub_thumbnail', 'order': 6},
+        ]
+        dataset_extra = [{'key': 'identifier', 'value': name},
+                         {'key': 'noa_download_url', 'value': noa_url}]
+        extras = [{'key': 'dataset_extra', 'value': str(dataset_extra)},
+                  {'key': 'noa_expiration_date', 'value': valid_until}]
+        dataset = helpers.call_action('package_create', name=name,
+                                      resources=resources, extras=extras)
+        return dataset['id']
+
+    def resources(self, package_id):
+        rows = model.Session.execute(text(
+            "SELECT resource_type, position FROM resource "
+            "WHERE package_id = :id AND state = 'active' ORDER BY position"),
+            {'id': package_id})
+        return [tuple(row) for row in rows]
+
+    def extras(self, package_id):
+        rows = model.Session.execute(text(
+            "SELECT key, value FROM package_extra "
+            "WHERE package_id = :id AND state = 'active'"),
+            {'id': package_id})
+        return dict(tuple(row) for row in rows)
+
+    def test_sweep(self):
+        removed = NOAExpirySweeper(batch_size=1).run(today='2018-02-01')
+
+        assert removed == 2
+        for package_id in self.expired:
+            assert self.resources(package_id) == [('scihub_product', 0),
+                                                  ('scihub_thumbnail', 1)]
+            extras = self.extras(package_id)
+            assert 'noa_expiration_date' not in extras
+            assert 'noa_download_url' not in extras['dataset_extra']
+        assert len(self.resources(self.valid)) == 3
+        assert 'noa_expiration_date' in self.extras(self.valid)
+
+    def test_one_index_update_per_batch(self):
+        NOAExpirySweeper(batch_size=1).run(today='2018-02-01')
+
+        assert self.search.rebuild.call_args_list == [
+            mock.call(package_ids=[package_id], defer_commit=True)
+            for package_id in sorted(self.expired)]
+        assert self.search.commit.call_count == 2
+
+    def test_nothing_expired(self):
+        removed = NOAExpirySweeper().run(today='2018-01-01')
+
+        assert removed == 0
+        self.search.rebuild.assert_not_called()
@@ -0,0 +1,123 @@
+"""Tests for probav.py."""
+from datetime import datetime
+import os
+
+from bs4 import BeautifulSoup
+import mock
+from nose.tools import assert_raises
+
+from ckanext.nextgeossharvest.harvesters.probav import PROBAVHarvester
+
+
+class TestParseMetalink(object):
+    """Tests for the _parse_metalink() method."""
+
+    def __init__(self):
+        directory = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(directory, 'metalink.xml'), 'r') as f:
+            self.metalink = f.read()
+        self.harvester = PROBAVHarvester()
+
+    def test_hdf5_files(self):
+        files = self.harvester._parse_metalink(self.metalink)
+
+        assert len(files) == 196
+        assert files[0] == {
+            'name': 'PROBAV_S1_TOA_X00Y00_20180101_100M_V101.HDF5',
+            'url': 'https://www.vito-eodata.be/PDF/dataaccess?service=DSEO&request=GetProduct&version=1.0.0&collectionID=1000125&productID=267473044&ProductURI=urn:ogc:def:EOP:VITO:PROBAV_S1-TOA_100M_V001:PROBAV_S1-TOA_20180101_100M:V101&fileIndex=1',  # noqa: E501
+            'size': 11900799
+        }
+        assert all(f['name'].endswith('.HDF5') for f in files)
+
+
+class TestParseRestartDay(object):
+    """Tests for the _parse_restart_day() method."""
+
+    def test_last_day_of_interval(self):
+        entry = BeautifulSoup(
+            '<entry xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            '<dc:date>2018-01-01T00:00:00Z/2018-01-10T23:59:59Z</dc:date>'
+            '</entry>', 'lxml-xml')
+
+        assert PROBAVHarvester()._parse_restart_day(entry) == '2018-01-10'
+
+
+class TestGetOpensearchEntry(object):
+    """Tests for the _get_opensearch_entry() method."""
+
+    ENTRY = ('<entry xmlns:dc="http://purl.org/dc/elements/1.1/">'
+             '<dc:identifier>urn:a</dc:identifier></entry>')
+
+    def test_inline_content(self):
+        content = {'content': self.ENTRY}
+
+        entry = PROBAVHarvester()._get_opensearch_entry(content)
+
+        assert entry.find('dc:identifier').text == 'urn:a'
+
+    @mock.patch('ckanext.nextgeossharvest.harvesters.probav.get_blob')
+    def test_shared_content_is_parsed_once(self, get_blob):
+        get_blob.return_value = self.ENTRY
+        harvester = PROBAVHarvester()
+        tiles = [{'content_ref': 'abc', 'extras': {'file_name': name}}
+                 for name in ['X00Y00', 'X01Y00', 'X02Y00']]
+
+        entries = [harvester._get_opensearch_entry(t) for t in tiles]
+
+        get_blob.assert_called_once_with('abc')
+        assert entries[0] is entries[1] is entries[2]
+        assert entries[0].find('dc:identifier').text == 'urn:a'
+
+    @mock.patch('ckanext.nextgeossharvest.harvesters.probav.get_blob')
+    def test_missing_content(self, get_blob):
+        get_blob.return_value = None
+
+        assert_raises(ValueError, PROBAVHarvester()._get_opensearch_entry,
+                      {'content_ref': 'abc'})
+
+
+class TestCrawlCollection(object):
+    """Tests for the _crawl_collection() method."""
+
+    PAGE = ('<feed><entry xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            '<dc:identifier>urn:ogc:def:EOP:VITO:PROBAV_L2A_1KM_V001:'
+            'PROBAV_L2A_20180101_000000_1KM:V101</dc:identifier>'
+            '<updated>2018-01-02T00:00:00Z</updated>'
+            '<dc:date>2018-01-01T00:00:00Z/2018-01-01T00:59:59Z</dc:date>'
+            '</entry></feed>')
+
+    def crawl(self, pages):
+        harvester = PROBAVHarvester()
+        harvester.source_config = {}
+
+        def open_search_pages(url, limit=100, auth=None, limiter=None,
+                              errors=None):
+            for page in pages:
+                if page is None:
+                    errors.append('500 error: {}'.format(url))
+                    return
+                yield BeautifulSoup(page, 'lxml-xml')
+
+        with mock.patch.object(harvester, '_save_gather_error') as save, \
+                mock.patch.object(harvester, '_open_search_pages_from',
+                                  side_effect=open_search_pages):
+            result = harvester._crawl_collection(
+                None, None, datetime(2018, 1, 1), datetime(2018, 1, 2),
+                (False, 'PROBAV_L2A_1KM_V001'))
+        assert not save.called
+        return result
+
+    def test_entries(self):
+        is_l3, entries, errors = self.crawl([self.PAGE])
+
+        assert not is_l3
+        assert errors == []
+        assert len(entries) == 1
+        assert entries[0]['restart_day'] == '2018-01-01'
+
+    def test_errors_are_returned(self):
+        _, entries, errors = self.crawl([self.PAGE, None])
+
+        assert len(entries) == 1
+        assert len(errors) == 1
+        assert errors[0].startswith('500 error: ')
@@ -90,6 +90,8 @@ setup(
         plan4all=ckanext.nextgeossharvest.harvesters:Plan4AllHarvester
         itag=ckanext.nextgeossharvest.harvesters:ITagEnricher
 	      ebvs=ckanext.nextgeossharvest.harvesters:EBVSHarvester
+        [paste.paster_command]
+        nextgeoss=ckanext.nextgeossharvest.commands:NextGEOSSCommand
         [babel.extractors]
         ckan = ckan.lib.extract:extract_ckan
     ''',